@@ -0,0 +1,286 @@
+import asyncio
+import logging
+from collections import deque
+
+from buffer import BufferClosed
+from pacing import Pacer
+from payload import RandomChars
+
+logger = logging.getLogger(__name__)
+
+
+def _wakeup_next(waiters):
+    """唤醒队首第一个仍在等待的协程"""
+    while waiters:
+        waiter = waiters.popleft()
+        if not waiter.done():
+            waiter.set_result(None)
+            break
+
+
+class AsyncBuffer:
+    """
+    asyncio 版本的缓冲区，接口与 Buffer 对应，put/get 为协程。
+    只能在创建它的事件循环中使用；等待方挂起为 future，不占用线程。
+    支持 async for 逐个取出数据，缓冲区关闭并取空后迭代结束。
+    """
+    def __init__(self, size=10, id=0):
+        self.id = id
+        self.capacity = size
+        self.data = deque()
+        self.closed = False
+        self._putters = deque()
+        self._getters = deque()
+        logger.info(f"AsyncBuffer {self.id} initialized with size {size}")
+
+    def can_put(self):
+        return len(self.data) < self.capacity
+
+    def can_get(self):
+        return len(self.data) > 0
+
+    async def _wait(self, waiters, ready):
+        """挂起直到 ready() 为真或缓冲区被关闭"""
+        loop = asyncio.get_running_loop()
+        while not ready() and not self.closed:
+            waiter = loop.create_future()
+            waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # 被取消时把唤醒机会让给下一个等待者
+                waiter.cancel()
+                try:
+                    waiters.remove(waiter)
+                except ValueError:
+                    pass
+                if ready() and not waiter.cancelled():
+                    _wakeup_next(waiters)
+                raise
+
+    async def put(self, data, timeout=None):
+        """
+        放入数据。缓冲区满时最多等待 timeout 秒（None 表示一直等待），超时返回 None。
+        缓冲区关闭时抛出 BufferClosed。
+        """
+        if not self.can_put():
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._wait(self._putters, self.can_put)
+            except TimeoutError:
+                return None
+        if self.closed:
+            raise BufferClosed(f"AsyncBuffer {self.id} is closed")
+        self.data.append(data)
+        _wakeup_next(self._getters)
+        return data
+
+    async def get(self, timeout=None):
+        """
+        取出数据。缓冲区空时最多等待 timeout 秒（None 表示一直等待），超时返回 None。
+        缓冲区关闭后仍可取完剩余数据，取空后抛出 BufferClosed。
+        """
+        if not self.can_get():
+            try:
+                async with asyncio.timeout(timeout):
+                    await self._wait(self._getters, self.can_get)
+            except TimeoutError:
+                return None
+        if not self.data:
+            raise BufferClosed(f"AsyncBuffer {self.id} is closed")
+        data = self.data.popleft()
+        _wakeup_next(self._putters)
+        return data
+
+    def try_put(self, data):
+        """非阻塞放入，成功返回 True，缓冲区满返回 False"""
+        if self.closed:
+            raise BufferClosed(f"AsyncBuffer {self.id} is closed")
+        if not self.can_put():
+            return False
+        self.data.append(data)
+        _wakeup_next(self._getters)
+        return True
+
+    def try_get(self):
+        """非阻塞取出，缓冲区空时返回 None"""
+        if not self.data:
+            if self.closed:
+                raise BufferClosed(f"AsyncBuffer {self.id} is closed")
+            return None
+        data = self.data.popleft()
+        _wakeup_next(self._putters)
+        return data
+
+    async def put_many(self, items):
+        """批量放入数据，满时等待空位，返回放入的元素个数"""
+        items = list(items)
+        count = 0
+        while count < len(items):
+            await self._wait(self._putters, self.can_put)
+            if self.closed:
+                raise BufferClosed(f"AsyncBuffer {self.id} is closed")
+            batch = items[count:count + self.capacity - len(self.data)]
+            self.data.extend(batch)
+            count += len(batch)
+            for _ in range(len(batch)):
+                _wakeup_next(self._getters)
+        return count
+
+    async def get_many(self, max_n, timeout=None):
+        """批量取出最多 max_n 个数据，空时最多等待 timeout 秒，超时返回空列表"""
+        first = await self.get(timeout)
+        if first is None:
+            return []
+        items = [first]
+        while self.data and len(items) < max_n:
+            items.append(self.data.popleft())
+            _wakeup_next(self._putters)
+        return items
+
+    def close(self):
+        """关闭缓冲区并唤醒所有等待的协程"""
+        self.closed = True
+        for waiters in (self._putters, self._getters):
+            while waiters:
+                _wakeup_next(waiters)
+        logger.info(f"AsyncBuffer {self.id} closed")
+
+    def reopen(self):
+        self.closed = False
+
+    def resize(self, new_size):
+        """只修改容量上限；缩小时不丢弃数据，取到新容量以下后才恢复接收"""
+        if not isinstance(new_size, int) or new_size <= 0:
+            logger.warning(f"AsyncBuffer {self.id} resize: 无效的大小 {new_size}。必须是正整数。")
+            return False
+        self.capacity = new_size
+        for _ in range(max(self.capacity - len(self.data), 0)):
+            _wakeup_next(self._putters)
+        logger.info(f"AsyncBuffer {self.id} 已调整大小为 {new_size}。")
+        return True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get()
+        except BufferClosed:
+            raise StopAsyncIteration
+
+    def __str__(self):
+        return f"Buffer{self.id} {list(self.data)}"
+
+
+async def _paced(pacer):
+    """在事件循环中等待节拍器发放令牌，不占用线程"""
+    while not pacer.try_acquire():
+        await asyncio.sleep(pacer.delay())
+
+
+class AsyncProducer:
+    def __init__(self, buffer, put_freq=2, payload=None):
+        self.buffer = buffer
+        self.payload = payload or RandomChars()
+        self.put_freq = max(put_freq, 0.1)
+        self.put_pacer = Pacer(self.put_freq)
+        logger.info(f"AsyncProducer initialized for AsyncBuffer {self.buffer.id} with put_freq {self.put_freq}")
+
+    def set_put_freq(self, freq):
+        """设置生产者放入数据的频率"""
+        self.put_freq = freq if freq > 0 else 2
+        self.put_pacer.set_rate(self.put_freq)
+
+    async def put(self):
+        await _paced(self.put_pacer)
+        data = await self.buffer.put(self.payload.next())
+        self.put_pacer.done()
+        logger.debug("AsyncProducer put '%s' into AsyncBuffer %s", data, self.buffer.id)
+        return data
+
+    async def run(self, count=None):
+        """持续放入数据，直到放入 count 个或缓冲区被关闭"""
+        produced = 0
+        try:
+            while count is None or produced < count:
+                await self.put()
+                produced += 1
+        except BufferClosed:
+            pass
+        return produced
+
+
+class AsyncConsumer:
+    def __init__(self, buffer, get_freq=2, move_freq=2):
+        self.buffer = buffer
+        self.get_freq = max(get_freq, 0.1)
+        self.move_freq = max(move_freq, 0.1)
+        self.get_pacer = Pacer(self.get_freq)
+        self.move_pacer = Pacer(self.move_freq)
+        logger.info(f"AsyncConsumer initialized for AsyncBuffer {self.buffer.id} with get_freq {self.get_freq}, move_freq {self.move_freq}")
+
+    def set_get_freq(self, freq):
+        """设置消费者获取数据的频率"""
+        self.get_freq = freq if freq > 0 else 2
+        self.get_pacer.set_rate(self.get_freq)
+
+    def set_move_freq(self, freq):
+        """设置消费者移动数据的频率"""
+        self.move_freq = freq if freq > 0 else 2
+        self.move_pacer.set_rate(self.move_freq)
+
+    async def get(self):
+        await _paced(self.get_pacer)
+        data = await self.buffer.get()
+        self.get_pacer.done()
+        logger.debug("AsyncConsumer got '%s' from AsyncBuffer %s", data, self.buffer.id)
+        return data
+
+    async def move(self, source_buffer):
+        """
+        从 source_buffer 移动一个数据到本缓冲区。先等目标有空位再取数据，取出和放入之间没有 await，
+        数据不会停留在两个缓冲区之外；目标关闭时抛出 BufferClosed，数据留在源缓冲区中。
+        """
+        await _paced(self.move_pacer)
+        target = self.buffer
+        while True:
+            await target._wait(target._putters, target.can_put)
+            if target.closed:
+                raise BufferClosed(f"AsyncBuffer {target.id} is closed")
+            if source_buffer.can_get():
+                data = source_buffer.try_get()
+                target.try_put(data)
+                break
+            await source_buffer._wait(source_buffer._getters, source_buffer.can_get)
+            if not target.can_put():
+                # 等待源期间目标又满了，把这次唤醒让给源的其他读者
+                _wakeup_next(source_buffer._getters)
+            if not source_buffer.can_get() and source_buffer.closed:
+                raise BufferClosed(f"AsyncBuffer {source_buffer.id} is closed")
+        self.move_pacer.done()
+        logger.debug("AsyncConsumer moved '%s' from AsyncBuffer %s to AsyncBuffer %s",
+                     data, source_buffer.id, self.buffer.id)
+        return data
+
+    async def run_get(self, count=None):
+        """持续获取数据，直到获取 count 个或缓冲区关闭并取空"""
+        consumed = 0
+        try:
+            while count is None or consumed < count:
+                await self.get()
+                consumed += 1
+        except BufferClosed:
+            pass
+        return consumed
+
+    async def run_move(self, source_buffer, count=None):
+        """持续从 source_buffer 移动数据，直到移动 count 个或任一缓冲区关闭"""
+        moved = 0
+        try:
+            while count is None or moved < count:
+                await self.move(source_buffer)
+                moved += 1
+        except BufferClosed:
+            pass
+        return moved
@@ -0,0 +1,166 @@
+import time
+import logging
+from collections import deque, namedtuple
+
+from buffer import Consumer
+from pacing import Pacer
+from scheduler import Task
+
+logger = logging.getLogger(__name__)
+
+# 一次扩缩容记录：时间、缓冲区、调整前后的工作者数量、原因和当时的占用率
+ScalingEvent = namedtuple('ScalingEvent', 'time buffer_id old new reason occupancy')
+
+
+class _Worker:
+    """池中的一个获取工作者：一个 Consumer 和调度它的任务，记录完成数和服务时间"""
+    def __init__(self, consumer, name, on_result):
+        self.consumer = consumer
+        self.completed = 0
+        self.busy = 0.0
+        self.task = Task(name, self._get, consumer.get_pacer, on_result)
+
+    def _get(self):
+        start = time.monotonic()
+        data = self.consumer.try_get()
+        if data is not None:
+            self.busy += time.monotonic() - start
+            self.completed += 1
+        return data
+
+
+class ConsumerPool:
+    """
+    一个缓冲区的获取工作者池。每个工作者是 Executor 上的一个获取任务，
+    增减工作者只增减任务，不创建线程。缓冲区必须支持多个读者（不能是 SPSCBuffer）。
+    """
+    def __init__(self, buffer, executor, get_freq=2, min_workers=1, max_workers=8, on_result=None):
+        self.buffer = buffer
+        self.executor = executor
+        self.get_freq = get_freq
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.on_result = on_result
+        self.workers = []
+        self.started = 0
+        self.retired_completed = 0
+        self.retired_busy = 0.0
+        for _ in range(min_workers):
+            self.add_worker()
+
+    def __len__(self):
+        return len(self.workers)
+
+    def add_worker(self):
+        if len(self.workers) >= self.max_workers:
+            return False
+        consumer = Consumer(self.buffer, self.get_freq)
+        worker = _Worker(consumer, f"get-B{self.buffer.id}-{self.started}", self.on_result)
+        self.started += 1
+        self.workers.append(worker)
+        self.executor.submit(worker.task)
+        return True
+
+    def remove_worker(self):
+        if len(self.workers) <= self.min_workers:
+            return False
+        worker = self.workers.pop()
+        worker.task.cancel()
+        # 保留被移除工作者的累计量，池的总完成数保持单调
+        self.retired_completed += worker.completed
+        self.retired_busy += worker.busy
+        return True
+
+    def set_get_freq(self, freq):
+        """设置每个工作者的获取频率"""
+        self.get_freq = freq
+        for worker in self.workers:
+            worker.consumer.set_get_freq(freq)
+
+    def completed(self):
+        return self.retired_completed + sum(w.completed for w in self.workers)
+
+    def busy(self):
+        return self.retired_busy + sum(w.busy for w in self.workers)
+
+    def occupancy(self):
+        return len(self.buffer.data) / self.buffer.capacity
+
+
+class Autoscaler:
+    """
+    按占用率高低水位和测得的服务速率调整各池的工作者数量。
+    占用率达到 high 时加一个工作者；占用率不超过 low、且去掉一个工作者后剩余的服务能力
+    仍高于到达速率时减一个。两次调整之间至少间隔 cooldown 秒。
+    """
+    def __init__(self, pools, high=0.75, low=0.25, interval=1.0, cooldown=2.0, history=100):
+        self.pools = list(pools)
+        self.high = high
+        self.low = low
+        self.interval = interval
+        self.cooldown = cooldown
+        self.events = deque(maxlen=history)
+        self.scale_ups = 0
+        self.scale_downs = 0
+        now = time.monotonic()
+        self._samples = {id(pool): (now, pool.completed(), pool.busy(), len(pool.buffer.data))
+                         for pool in self.pools}
+        self._last_scaled = {id(pool): float('-inf') for pool in self.pools}
+        self._metrics = {}
+
+    def task(self):
+        """返回每 interval 秒评估一次的周期任务，提交到 Executor 上运行"""
+        return Task("autoscaler", self.evaluate, Pacer(1 / self.interval))
+
+    def _measure(self, pool, now):
+        last_time, last_completed, last_busy, last_size = self._samples[id(pool)]
+        completed, busy, size = pool.completed(), pool.busy(), len(pool.buffer.data)
+        self._samples[id(pool)] = (now, completed, busy, size)
+        elapsed = now - last_time
+        done = completed - last_completed
+        # 到达数 = 取走的数量 + 缓冲区增长的数量
+        arrival_rate = max(done + size - last_size, 0) / elapsed if elapsed > 0 else 0.0
+        service_time = (busy - last_busy) / done if done else 0.0
+        # 单个工作者的服务能力受节拍和服务时间两者限制
+        worker_rate = pool.get_freq if service_time == 0 else min(pool.get_freq, 1 / service_time)
+        return {
+            'workers': len(pool),
+            'occupancy': pool.occupancy(),
+            'arrival_rate': arrival_rate,
+            'service_rate': done / elapsed if elapsed > 0 else 0.0,
+            'service_time': service_time,
+            'worker_rate': worker_rate,
+        }
+
+    def evaluate(self):
+        now = time.monotonic()
+        for pool in self.pools:
+            metrics = self._measure(pool, now)
+            self._metrics[pool.buffer.id] = metrics
+            if now - self._last_scaled[id(pool)] < self.cooldown:
+                continue
+            old = len(pool)
+            occupancy = metrics['occupancy']
+            if occupancy >= self.high and pool.add_worker():
+                reason = f"占用率 {occupancy:.0%} 达到高水位 {self.high:.0%}"
+                self.scale_ups += 1
+            elif (occupancy <= self.low
+                  and metrics['arrival_rate'] < (old - 1) * metrics['worker_rate']
+                  and pool.remove_worker()):
+                reason = f"占用率 {occupancy:.0%} 低于低水位 {self.low:.0%}"
+                self.scale_downs += 1
+            else:
+                continue
+            self._last_scaled[id(pool)] = now
+            event = ScalingEvent(time.time(), pool.buffer.id, old, len(pool), reason, occupancy)
+            self.events.append(event)
+            logger.info(f"Buffer {pool.buffer.id} 获取工作者 {old} -> {len(pool)}：{reason}")
+        return True
+
+    def metrics(self):
+        """最近一次评估时各池的指标（按缓冲区 id），以及累计的扩缩容次数"""
+        return {
+            'pools': dict(self._metrics),
+            'scale_ups': self.scale_ups,
+            'scale_downs': self.scale_downs,
+        }
@@ -0,0 +1,105 @@
+import time
+import logging
+
+from pacing import Pacer
+from scheduler import Task
+
+logger = logging.getLogger(__name__)
+
+
+class AIMDController:
+    """加性增、乘性减：占用率高于目标时速率乘以 decrease，否则加上 increase"""
+    def __init__(self, target=0.5, increase=1.0, decrease=0.5, min_rate=0.1, max_rate=1000):
+        self.target = target
+        self.increase = increase
+        self.decrease = decrease
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+
+    def update(self, occupancy, drain_rate, rate, dt, target, capacity):
+        rate = rate * self.decrease if occupancy > target else rate + self.increase
+        return min(max(rate, self.min_rate), self.max_rate)
+
+
+class PIDController:
+    """
+    以下游取走速率为前馈，对占用数误差做 PID 修正：rate = drain_rate + kp*e + ki*∫e + kd*de/dt，
+    e 为目标占用数与当前占用数之差（个）。输出饱和时停止积分，避免积分饱和。
+    """
+    def __init__(self, target=0.5, kp=1.0, ki=0.2, kd=0.0, min_rate=0.1, max_rate=1000):
+        self.target = target
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.integral = 0.0
+        self.last_error = None
+
+    def update(self, occupancy, drain_rate, rate, dt, target, capacity):
+        error = (target - occupancy) * capacity
+        derivative = 0.0 if self.last_error is None or dt <= 0 else (error - self.last_error) / dt
+        self.last_error = error
+        integral = self.integral + error * dt
+        output = drain_rate + self.kp * error + self.ki * integral + self.kd * derivative
+        clamped = min(max(output, self.min_rate), self.max_rate)
+        if clamped == output:
+            self.integral = integral
+        return clamped
+
+
+class Backpressure:
+    """
+    闭环背压：每 interval 秒测量缓冲区的占用率和下游取走速率，由控制器计算新的 put_freq，
+    让缓冲区保持在目标占用率附近，生产者不再靠阻塞在满缓冲区上来感知拥塞。
+    max_latency（秒）不为 None 时按 Little 定律限制目标占用率：
+    排队时延约为 占用数 / 取走速率，目标占用数不超过 max_latency * 取走速率。
+    控制器算出的频率交给 on_rate(rate)，默认直接更新生产者（apply）；
+    拓扑中改为写入 live 配置，由 live 配置推送回生产者，界面看到的就是控制器当前的输出。
+    """
+    def __init__(self, producer, controller=None, interval=0.1, max_latency=None, smoothing=0.2, on_rate=None):
+        self.producer = producer
+        self.buffer = producer.buffer
+        self.controller = controller or PIDController()
+        self.interval = interval
+        self.max_latency = max_latency
+        # 取走速率的指数滑动平均系数；单个采样周期内只取走零或一个数据，需要平滑
+        self.smoothing = smoothing
+        self._last = (time.monotonic(), producer.put_pacer.total, self.buffer._available())
+        self.drain_rate = 0.0
+        self.on_rate = on_rate or self.apply
+
+    def task(self):
+        """返回每 interval 秒调整一次的周期任务，提交到 Executor 上运行"""
+        return Task("backpressure", self.update, Pacer(1 / self.interval))
+
+    def target(self):
+        target = self.controller.target
+        # 还没有测到取走速率时不按时延限制，否则目标为 0 会把生产者一直压在最低速率
+        if self.max_latency is not None and self.drain_rate > 0:
+            target = min(target, self.max_latency * self.drain_rate / self.buffer.capacity)
+        return target
+
+    def update(self):
+        now = time.monotonic()
+        produced, size = self.producer.put_pacer.total, self.buffer._available()
+        last_time, last_produced, last_size = self._last
+        self._last = (now, produced, size)
+        dt = now - last_time
+        if dt <= 0:
+            return True
+        # 取走的数量 = 放入的数量 - 缓冲区增长的数量
+        drained = max(produced - last_produced - (size - last_size), 0) / dt
+        self.drain_rate += self.smoothing * (drained - self.drain_rate)
+        occupancy = size / self.buffer.capacity
+        rate = self.controller.update(occupancy, self.drain_rate, self.producer.put_freq, dt,
+                                      self.target(), self.buffer.capacity)
+        self.on_rate(rate)
+        logger.debug("Backpressure on Buffer %s: occupancy %.2f, drain %.2f/s, put_freq %.2f",
+                     self.buffer.id, occupancy, self.drain_rate, rate)
+        return True
+
+    def apply(self, rate):
+        """把频率写入生产者。控制器频繁调整速率，直接更新节拍器，不经过 set_put_freq 的日志"""
+        self.producer.put_freq = rate
+        self.producer.put_pacer.set_rate(rate)
@@ -0,0 +1,92 @@
+"""
+asyncio 与线程版本的对比基准：同时运行 pairs 组「生产者 -> 缓冲区 -> 消费者」，
+每个角色按 freq Hz 节拍运行 duration 秒，比较实际达到的操作速率和所需的线程数。
+
+用法: PYTHONPATH=. python bench/bench_async.py [pairs] [freq] [duration]
+"""
+import sys
+import asyncio
+import threading
+import time
+import logging
+
+from buffer import Buffer, BufferClosed, Producer, Consumer
+from async_buffer import AsyncBuffer, AsyncProducer, AsyncConsumer
+
+logging.disable(logging.INFO)
+
+
+def run_threaded(pairs, freq, duration):
+    """每个生产者和消费者各占一个线程，返回 (完成的get次数, 峰值线程数)"""
+    stop_event = threading.Event()
+    counts = [0] * pairs
+    buffers = [Buffer(8, i) for i in range(pairs)]
+
+    def produce(buffer):
+        producer = Producer(buffer, freq, stop_event=stop_event)
+        try:
+            while not stop_event.is_set():
+                producer.put()
+        except BufferClosed:
+            pass
+
+    def consume(index, buffer):
+        consumer = Consumer(buffer, freq, stop_event=stop_event)
+        try:
+            while not stop_event.is_set():
+                consumer.get()
+                counts[index] += 1
+        except BufferClosed:
+            pass
+
+    threads = []
+    for index, buffer in enumerate(buffers):
+        threads.append(threading.Thread(target=produce, args=(buffer,)))
+        threads.append(threading.Thread(target=consume, args=(index, buffer)))
+    for t in threads:
+        t.start()
+    peak_threads = threading.active_count()
+    time.sleep(duration)
+    stop_event.set()
+    for buffer in buffers:
+        buffer.close()
+    for t in threads:
+        t.join()
+    return sum(counts), peak_threads
+
+
+async def _run_async(pairs, freq, duration):
+    buffers = [AsyncBuffer(8, i) for i in range(pairs)]
+    tasks = []
+    for buffer in buffers:
+        tasks.append(asyncio.create_task(AsyncProducer(buffer, freq).run()))
+        tasks.append(asyncio.create_task(AsyncConsumer(buffer, freq).run_get()))
+    peak_threads = threading.active_count()
+    await asyncio.sleep(duration)
+    for buffer in buffers:
+        buffer.close()
+    results = await asyncio.gather(*tasks)
+    # 结果依次为 (生产数, 消费数)，只统计消费数
+    return sum(results[1::2]), peak_threads
+
+
+def run_async(pairs, freq, duration):
+    """所有角色都是同一个事件循环中的协程，返回 (完成的get次数, 峰值线程数)"""
+    return asyncio.run(_run_async(pairs, freq, duration))
+
+
+def main():
+    pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    freq = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 3
+    target = pairs * freq
+    print(f"pairs={pairs} freq={freq}Hz duration={duration}s target={target:.0f} gets/s")
+    print(f"{'impl':<10} {'gets/s':>10} {'of target':>10} {'threads':>8}")
+    for name, runner in (("threaded", run_threaded), ("asyncio", run_async)):
+        gets, threads = runner(pairs, freq, duration)
+        rate = gets / duration
+        print(f"{name:<10} {rate:>10.0f} {rate / target:>10.1%} {threads:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+缓冲区竞争基准测试：对比单条件变量 + notify_all（旧实现）与
+not_full / not_empty 双条件变量 + 定向 notify（当前实现）的唤醒次数和吞吐量。
+
+容量越小、等待线程越多，notify_all 的惊群越明显。容量为 1 时定向 notify 把每个操作的唤醒次数从约 3.6~4
+降到 2，吞吐量更高；容量为 8 时缓冲区很少满或空，两种实现的唤醒次数基本相同，
+定向 notify 不再有优势，吞吐量比旧实现低约 25%（Buffer 的每次操作还要维护变更记录、阻塞统计和调试日志）。
+线程调度的抖动很大，每个用例运行 repeat 次取中位数。
+
+用法: PYTHONPATH=. python bench/bench_contention.py [items] [getters] [repeat]
+"""
+import statistics
+import sys
+import threading
+import time
+import logging
+from collections import deque
+
+from buffer import Buffer
+
+logging.disable(logging.INFO)
+
+
+class LegacyBuffer:
+    """旧版实现：单个 Condition，每次 put/get 之后 notify_all"""
+    def __init__(self, size=10, id=0):
+        self.id = id
+        self.data = deque(maxlen=size)
+        self.condition = threading.Condition()
+        self.wakeups = 0
+
+    def put(self, data):
+        with self.condition:
+            while len(self.data) == self.data.maxlen:
+                self.condition.wait()
+                self.wakeups += 1
+            self.data.append(data)
+            self.condition.notify_all()
+            return data
+
+    def get(self):
+        with self.condition:
+            while len(self.data) == 0:
+                self.condition.wait()
+                self.wakeups += 1
+            data = self.data.popleft()
+            self.condition.notify_all()
+            return data
+
+
+def run(buffer, items, producers, getters):
+    """producers 个生产者共放入 items 个元素，getters 个消费者取完，返回 (耗时, 唤醒次数)"""
+    per_producer = items // producers
+    total = per_producer * producers
+    per_getter = [total // getters + (1 if i < total % getters else 0) for i in range(getters)]
+
+    def produce():
+        for _ in range(per_producer):
+            buffer.put('x')
+
+    def consume(n):
+        for _ in range(n):
+            buffer.get()
+
+    threads = [threading.Thread(target=produce) for _ in range(producers)]
+    threads += [threading.Thread(target=consume, args=(n,)) for n in per_getter]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, buffer.wakeups, total
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    getters = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    print(f"{'impl':<8} {'size':>4} {'prod':>4} {'get':>4} {'ops/s':>12} {'min':>10} {'max':>10} {'wakeups/op':>11}")
+    for size in (1, 8):
+        for producers in (1, 2):
+            for name, cls in (("legacy", LegacyBuffer), ("split", Buffer)):
+                runs = [run(cls(size, 1), items, producers, getters) for _ in range(repeat)]
+                rates = sorted(total / elapsed for elapsed, _, total in runs)
+                wakeups = statistics.median(wakeups / total for _, wakeups, total in runs)
+                print(f"{name:<8} {size:>4} {producers:>4} {getters:>4} {statistics.median(rates):>12.0f} "
+                      f"{rates[0]:>10.0f} {rates[-1]:>10.0f} {wakeups:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+缓冲区内存基准：对比 deque 存储与 bytearray 字符环（storage='char'）
+在容量 1e3 ~ 1e7 且填满时每个元素占用的字节数。
+
+用法: PYTHONPATH=. python bench/bench_memory.py [max_exponent]
+"""
+import sys
+import random
+import string
+import tracemalloc
+import logging
+
+from buffer import Buffer
+
+logging.disable(logging.INFO)
+
+
+def measure(storage, capacity, chars):
+    """创建并填满缓冲区，返回缓冲区占用的字节数"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    buffer = Buffer(capacity, 1, storage=storage)
+    buffer.put_many(chars)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del buffer
+    return used
+
+
+def main():
+    max_exponent = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    alphabet = string.ascii_letters + string.digits
+    print(f"{'capacity':>10} {'storage':>8} {'bytes':>14} {'bytes/item':>11}")
+    for exponent in range(3, max_exponent + 1):
+        capacity = 10 ** exponent
+        # 预先生成数据，避免把输入列表计入缓冲区的内存
+        chars = random.choices(alphabet, k=capacity)
+        for storage in ('deque', 'char'):
+            used = measure(storage, capacity, chars)
+            print(f"{capacity:>10} {storage:>8} {used:>14} {used / capacity:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
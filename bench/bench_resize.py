@@ -0,0 +1,54 @@
+"""
+Buffer.resize 延迟基准：在不同占用量下对比旧实现（拷贝 deque 并截断）
+与当前实现（只修改容量上限）的单次调整耗时。
+
+用法: PYTHONPATH=. python bench/bench_resize.py [max_exponent]
+"""
+import sys
+import time
+import logging
+from collections import deque
+
+from buffer import Buffer
+
+logging.disable(logging.INFO)
+
+
+def legacy_resize(data, new_size):
+    """旧版 resize 的核心：拷贝到列表、切片并重建 deque"""
+    current_items = list(data)
+    return deque(current_items[:new_size], maxlen=new_size)
+
+
+def timed(func, repeat=5):
+    """返回 repeat 次调用中的最短耗时（微秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main():
+    max_exponent = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    print(f"{'occupancy':>10} {'impl':>8} {'grow us':>12} {'shrink us':>12}")
+    for exponent in range(3, max_exponent + 1):
+        occupancy = 10 ** exponent
+        items = ['x'] * occupancy
+
+        data = deque(items, maxlen=occupancy)
+        grow = timed(lambda: legacy_resize(data, occupancy * 2))
+        shrink = timed(lambda: legacy_resize(data, occupancy // 2))
+        print(f"{occupancy:>10} {'legacy':>8} {grow:>12.1f} {shrink:>12.1f}")
+
+        for storage in ('deque', 'char'):
+            buffer = Buffer(occupancy, 1, storage=storage)
+            buffer.put_many(items)
+            grow = timed(lambda: buffer.resize(occupancy * 2))
+            shrink = timed(lambda: buffer.resize(occupancy // 2))
+            print(f"{occupancy:>10} {storage:>8} {grow:>12.1f} {shrink:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+单生产者/单消费者吞吐量基准：对比条件变量 Buffer 与无锁快速路径的 SPSCBuffer。
+
+用法: PYTHONPATH=. python bench/bench_spsc.py [items]
+"""
+import sys
+import threading
+import time
+import logging
+
+from buffer import Buffer, SPSCBuffer
+
+logging.disable(logging.INFO)
+
+
+def run(buffer, items):
+    """一个线程放入 items 个元素，另一个线程全部取出，返回耗时"""
+    def produce():
+        put = buffer.put
+        for i in range(items):
+            put(i)
+
+    def consume():
+        get = buffer.get
+        for _ in range(items):
+            get()
+
+    threads = [threading.Thread(target=produce), threading.Thread(target=consume)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    print(f"{'impl':<12} {'size':>6} {'ops/s':>12} {'wakeups':>10}")
+    for size in (1, 8, 1024):
+        for name, cls in (("Buffer", Buffer), ("SPSCBuffer", SPSCBuffer)):
+            buffer = cls(size, 1)
+            elapsed = run(buffer, items)
+            print(f"{name:<12} {size:>6} {items / elapsed:>12.0f} {buffer.wakeups:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+无节拍的吞吐量基准套件：直接调用缓冲区的 put/get 和 transfer，不经过 Pacer，
+测量不同生产者/消费者线程数、容量和批量大小下的每秒操作数与数据在队列中的延迟，
+并与 queue.Queue / queue.SimpleQueue 对比。
+
+每个数据就是放入时的 perf_counter 时间戳，取出时计算排队延迟，记入对数分桶直方图。
+结果可以写成 JSON，并与之前保存的基线逐项比较，吞吐量下降超过容差时以非零状态退出。
+
+用法: PYTHONPATH=. python bench/bench_suite.py [--items N] [--producers 1,4] [--consumers 1,4]
+          [--capacities 1,64] [--batches 1,16] [--json results.json] [--baseline base.json] [--tolerance 0.1]
+"""
+import argparse
+import json
+import logging
+import platform
+import queue
+import sys
+import threading
+import time
+
+from buffer import Buffer, SPSCBuffer, transfer
+from tracing import LatencyHistogram
+
+logging.disable(logging.INFO)
+
+
+class QueueAdapter:
+    """queue.Queue / SimpleQueue 只提供逐个的 put/get，不参加批量用例"""
+    def __init__(self, q):
+        self.put = q.put
+        self.get = q.get
+
+
+# 实现名 -> (构造函数, 是否支持多个读写者, 是否有原生批量接口)
+IMPLS = {
+    'Buffer': (lambda capacity: Buffer(capacity), True, True),
+    'SPSCBuffer': (lambda capacity: SPSCBuffer(capacity), False, True),
+    'Queue': (lambda capacity: QueueAdapter(queue.Queue(capacity)), True, False),
+    # SimpleQueue 没有容量限制，capacity 对它不起作用
+    'SimpleQueue': (lambda capacity: QueueAdapter(queue.SimpleQueue()), True, False),
+}
+
+# 结果中用于与基线对应的字段
+KEY_FIELDS = ('impl', 'op', 'producers', 'consumers', 'capacity', 'batch')
+
+
+def _shares(total, workers):
+    return [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+
+
+def _producer(buffer, n, batch):
+    def run():
+        clock = time.perf_counter
+        if batch == 1:
+            put = buffer.put
+            for _ in range(n):
+                put(clock())
+        else:
+            for start in range(0, n, batch):
+                buffer.put_many([clock()] * min(batch, n - start))
+    return run
+
+
+def _consumer(buffer, n, batch, histogram):
+    def run():
+        clock = time.perf_counter
+        record = histogram.record
+        got = 0
+        while got < n:
+            if batch == 1:
+                items = [buffer.get()]
+            else:
+                items = buffer.get_many(min(batch, n - got))
+            now = clock()
+            for stamp in items:
+                record(now - stamp)
+            got += len(items)
+    return run
+
+
+def _mover(source, target, n, batch):
+    def run():
+        moved = 0
+        while moved < n:
+            moved += len(transfer(source, target, min(batch, n - moved)))
+    return run
+
+
+def _run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def bench_put_get(impl, items, producers, consumers, capacity, batch):
+    """producers 个线程共放入 items 个数据，consumers 个线程全部取出"""
+    buffer = IMPLS[impl][0](capacity)
+    histogram = LatencyHistogram()
+    targets = [_producer(buffer, n, batch) for n in _shares(items, producers)]
+    targets += [_consumer(buffer, n, batch, histogram) for n in _shares(items, consumers)]
+    return _run_threads(targets), histogram
+
+
+def bench_move(impl, items, producers, consumers, capacity, batch):
+    """生产者放入源缓冲区，consumers 个移动线程原子转移到目标缓冲区，再由 consumers 个线程取出"""
+    make = IMPLS[impl][0]
+    source, target = make(capacity), make(capacity)
+    histogram = LatencyHistogram()
+    targets = [_producer(source, n, batch) for n in _shares(items, producers)]
+    targets += [_mover(source, target, n, batch) for n in _shares(items, consumers)]
+    targets += [_consumer(target, n, batch, histogram) for n in _shares(items, consumers)]
+    return _run_threads(targets), histogram
+
+
+BENCHES = {
+    'put_get': bench_put_get,
+    'move': bench_move,
+}
+
+
+def cases(args):
+    for op in BENCHES:
+        for impl, (_, multi, batched) in IMPLS.items():
+            # 移动依赖 transfer 的缓冲区协议，只测本项目的实现
+            if op == 'move' and impl not in ('Buffer', 'SPSCBuffer'):
+                continue
+            for producers in args.producers:
+                for consumers in args.consumers:
+                    if not multi and (producers, consumers) != (1, 1):
+                        continue
+                    for capacity in args.capacities:
+                        for batch in args.batches:
+                            if batch > 1 and not batched:
+                                continue
+                            yield op, impl, producers, consumers, capacity, batch
+
+
+def run_suite(args):
+    results = []
+    print(f"{'op':<8} {'impl':<12} {'prod':>4} {'cons':>4} {'cap':>6} {'batch':>5} "
+          f"{'ops/s':>12} {'p50(us)':>9} {'p99(us)':>9} {'p999(us)':>9}")
+    for op, impl, producers, consumers, capacity, batch in cases(args):
+        elapsed, histogram = BENCHES[op](impl, args.items, producers, consumers, capacity, batch)
+        summary = histogram.summary()
+        result = {
+            'op': op, 'impl': impl, 'producers': producers, 'consumers': consumers,
+            'capacity': capacity, 'batch': batch, 'items': args.items, 'seconds': elapsed,
+            'ops_per_sec': args.items / elapsed,
+            'p50': summary['p50'], 'p99': summary['p99'], 'p999': summary['p999'],
+        }
+        results.append(result)
+        print(f"{op:<8} {impl:<12} {producers:>4} {consumers:>4} {capacity:>6} {batch:>5} "
+              f"{result['ops_per_sec']:>12.0f} {result['p50'] * 1e6:>9.1f} "
+              f"{result['p99'] * 1e6:>9.1f} {result['p999'] * 1e6:>9.1f}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """逐项对比吞吐量，返回吞吐量比基线下降超过 tolerance 的结果"""
+    previous = {tuple(r[f] for f in KEY_FIELDS): r for r in baseline['results']}
+    regressions = []
+    print(f"\n与基线对比（{baseline.get('python', '未知版本')}）：")
+    for result in results:
+        key = tuple(result[f] for f in KEY_FIELDS)
+        if key not in previous:
+            continue
+        ratio = result['ops_per_sec'] / previous[key]['ops_per_sec']
+        flag = ''
+        if ratio < 1 - tolerance:
+            regressions.append(result)
+            flag = '  <-- 退化'
+        print(f"{' '.join(str(k) for k in key):<40} {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def _int_list(text):
+    return [int(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000, help='每个用例传递的数据个数')
+    parser.add_argument('--producers', type=_int_list, default=[1, 4])
+    parser.add_argument('--consumers', type=_int_list, default=[1, 4])
+    parser.add_argument('--capacities', type=_int_list, default=[1, 64])
+    parser.add_argument('--batches', type=_int_list, default=[1, 16])
+    parser.add_argument('--json', help='把结果写入该 JSON 文件')
+    parser.add_argument('--baseline', help='与该 JSON 基线比较吞吐量')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的吞吐量下降比例')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'results': results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
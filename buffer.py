@@ -1,82 +1,758 @@
-from collections import deque
+from collections import deque, namedtuple
+import contextlib
+import itertools
 import random
-import string
 import threading
 import time
 import logging
+
+from pacing import Pacer
+from metrics import Counter
+from payload import RandomChars
+
 random.seed(time.time())
 
 logger = logging.getLogger(__name__)
 
+# 进程内缓冲区的全局加锁顺序，同时锁两个缓冲区时按 lock_order 从小到大获取，避免死锁
+_lock_order = itertools.count()
+
+class DequeStorage(deque):
+    """基于 deque 的通用存储，可以存放任意对象；本身不限制长度，容量由 Buffer 控制"""
+    def __init__(self, items=(), capacity=None):
+        super().__init__(items)
+    
+    def qsize(self):
+        return len(self)
+    
+    def empty(self):
+        return not self
+    
+    def popmany(self, n):
+        popleft = self.popleft
+        return [popleft() for _ in range(n)]
+
+
+class CharRing:
+    """
+    预分配 bytearray 的字符环形存储，每个元素只占 1 字节。
+    只能存放单个 latin-1 字符（ord < 256），保持与 deque 相同的 FIFO 语义。
+    容量由 Buffer 控制；写入超出已分配空间时按倍数扩容，摊还到每次写入为 O(1)。
+    """
+    def __init__(self, items=(), capacity=10):
+        self.slots = max(capacity, 1)
+        self.buf = bytearray(self.slots)
+        self.head = 0  # 最早元素所在的下标
+        self.size = 0
+        self.extend(items)
+    
+    def __len__(self):
+        return self.size
+    
+    def __iter__(self):
+        return iter(self._bytes().decode('latin-1'))
+    
+    def qsize(self):
+        return self.size
+    
+    def empty(self):
+        return self.size == 0
+    
+    def _grow(self, needed):
+        """扩容到至少 needed 个槽位，并把数据整理到数组开头"""
+        slots = max(self.slots * 2, needed)
+        buf = bytearray(slots)
+        buf[:self.size] = self._bytes()
+        self.buf = buf
+        self.slots = slots
+        self.head = 0
+    
+    def append(self, char):
+        if self.size == self.slots:
+            self._grow(self.size + 1)
+        self.buf[(self.head + self.size) % self.slots] = ord(char)
+        self.size += 1
+    
+    def extend(self, chars):
+        data = ''.join(chars).encode('latin-1')
+        n = len(data)
+        if n > self.slots - self.size:
+            self._grow(self.size + n)
+        # 分两段拷贝：先写到数组末尾，剩余部分回绕到开头
+        start = (self.head + self.size) % self.slots
+        first = min(n, self.slots - start)
+        self.buf[start:start + first] = data[:first]
+        self.buf[:n - first] = data[first:]
+        self.size += n
+    
+    def popleft(self):
+        if self.size == 0:
+            raise IndexError("pop from an empty CharRing")
+        char = chr(self.buf[self.head])
+        self.head = (self.head + 1) % self.slots
+        self.size -= 1
+        return char
+    
+    def popmany(self, n):
+        n = min(n, self.size)
+        end = self.head + n
+        if end <= self.slots:
+            data = self.buf[self.head:end]
+        else:
+            data = self.buf[self.head:] + self.buf[:end - self.slots]
+        self.head = end % self.slots
+        self.size -= n
+        return list(data.decode('latin-1'))
+    
+    def _bytes(self):
+        end = self.head + self.size
+        if end <= self.slots:
+            return bytes(self.buf[self.head:end])
+        return bytes(self.buf[self.head:]) + bytes(self.buf[:end - self.slots])
+    
+    def __repr__(self):
+        return repr(list(self))
+
+
+# 可选的存储类型：'deque' 存放任意对象，'char' 用紧凑的字节环存放单个字符
+STORAGE_TYPES = {
+    'deque': DequeStorage,
+    'char': CharRing,
+}
+
+
+# 缓冲区增量快照。version 为 (累计放入数, 累计取出数)，两个分量都单调递增。
+# 增量模式下观察者先从镜像头部删除 removed 个元素，再追加 appended；
+# reset 为 True 时 appended 是当前全部内容（落后太多无法恢复时为 None，只提供 size/capacity）。
+BufferChange = namedtuple('BufferChange', ['version', 'appended', 'removed', 'size', 'capacity', 'reset'])
+
+
+def _read_log(log, start, end, current_end):
+    """
+    无锁读取环形日志中序号 [start, end) 的条目。
+    写者先写槽位再推进序号，读完后再检查一次写者序号，确认这些槽位在读取期间没有被覆盖；
+    否则返回 None。
+    """
+    slots = len(log)
+    if end - start > slots:
+        return None
+    items = [log[seq % slots] for seq in range(start, end)]
+    if current_end() >= start + slots:
+        return None
+    return items
+
+
+class BufferView:
+    """
+    观察者一侧的缓冲区镜像，通过 snapshot_since 按增量更新，不获取缓冲区的锁。
+    items 为 None 表示观察者落后太多，只知道占用量。
+    """
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.version = None
+        self.items = deque()
+        self.size = 0
+        self.capacity = buffer.capacity
+    
+    def refresh(self):
+        """拉取增量并应用到镜像，有变化时返回 True"""
+        # 镜像内容未知时请求完整快照，直到能够重新同步
+        since = None if self.items is None else self.version
+        change = self.buffer.snapshot_since(since)
+        unchanged = change.version == self.version and change.capacity == self.capacity
+        if unchanged and (since is not None or change.appended is None):
+            return False
+        
+        if change.reset:
+            self.items = None if change.appended is None else deque(change.appended)
+        else:
+            for _ in range(min(change.removed, len(self.items))):
+                self.items.popleft()
+            self.items.extend(change.appended)
+        self.version = change.version
+        self.size = change.size
+        self.capacity = change.capacity
+        return True
+
+
+class BufferClosed(Exception):
+    """缓冲区已关闭：等待中的和之后的 put 都会收到该异常，get 在取完剩余数据后收到该异常"""
+
+
 class Buffer:
-    def __init__(self, size = 10, id=0):
+    def __init__(self, size = 10, id=0, storage='deque', history=1024):
         self.id = id
-        self.data = deque(maxlen = size)
-        self.condition = threading.Condition()
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"未知的存储类型 {storage}，可选: {', '.join(STORAGE_TYPES)}")
+        # 容量是逻辑上限，与存储的物理大小无关，调整容量不需要重建存储
+        self.capacity = size
+        self.data = STORAGE_TYPES[storage](capacity = size)
+        # 两个条件变量共享同一把锁：生产者只在 not_full 上等待，消费者只在 not_empty 上等待，
+        # 这样每次操作只需唤醒能够继续执行的一方，避免 notify_all 引起的惊群
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.not_empty = threading.Condition(self.lock)
+        # transfer 同时操作两个缓冲区时需要持有的锁及其全局顺序
+        self.transfer_lock = self.lock
+        self.lock_order = (0, next(_lock_order))
+        self.closed = False
+        # 被唤醒的次数（在锁内累加），用于观察唤醒开销
+        self.wakeups = 0
+        # 正在 not_full / not_empty 上等待的线程数（在锁内修改），没有等待者时跳过 notify
+        self.put_waiting = 0
+        self.get_waiting = 0
+        # 生产者/消费者在满/空缓冲区上阻塞的累计秒数，只在真正等待时累加
+        self.put_blocked = Counter()
+        self.get_blocked = Counter()
+        # 变更记录：累计放入/取出计数，以及最近 history 个放入数据的环形日志，
+        # 观察者据此无锁地获取增量（见 snapshot_since）
+        self.put_seq = 0
+        self.get_seq = 0
+        self.recent = [None] * history
         logger.info(f"Buffer {self.id} initialized with size {size}")
     
     def can_put(self):
-        return len(self.data) < self.data.maxlen
+        return len(self.data) < self.capacity
     
     def can_get(self):
         return len(self.data) > 0
     
-    def put(self, data):
-        with self.condition:
-            while len(self.data) == self.data.maxlen:
-                logger.debug(f"Buffer {self.id} is full, producer waiting.")
-                self.condition.wait()
+    def _wait(self, condition, ready, timeout):
+        """
+        调用方持有锁。在 condition 上等待直到 ready() 为真或缓冲区被关闭。
+        timeout 为 None 时一直等待；超时返回 False。
+        """
+        if ready() or self.closed:
+            return True
+        if timeout == 0:
+            return False
+        start = time.monotonic()
+        waiting = 'put_waiting' if condition is self.not_full else 'get_waiting'
+        setattr(self, waiting, getattr(self, waiting) + 1)
+        try:
+            endtime = None if timeout is None else start + timeout
+            while not ready() and not self.closed:
+                if endtime is None:
+                    condition.wait()
+                else:
+                    remaining = endtime - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    condition.wait(remaining)
+                self.wakeups += 1
+            return True
+        finally:
+            setattr(self, waiting, getattr(self, waiting) - 1)
+            blocked = self.put_blocked if waiting == 'put_waiting' else self.get_blocked
+            blocked.inc(time.monotonic() - start)
+    
+    def put(self, data, timeout=None):
+        """
+        放入数据。缓冲区满时最多等待 timeout 秒（None 表示一直等待），超时返回 None。
+        缓冲区关闭时抛出 BufferClosed。
+        """
+        with self.lock:
+            # 有空位时直接放入，只有需要等待时才进入 _wait
+            if not self.can_put() and not self._wait(self.not_full, self.can_put, timeout):
+                logger.debug("Buffer %s is full, put timed out.", self.id)
+                return None
+            if self.closed:
+                raise BufferClosed(f"Buffer {self.id} is closed")
                 
             self.data.append(data)
-            logger.debug(f"Buffer {self.id} put data: {data}, current size: {len(self.data)}")
-            self.condition.notify_all()
+            self.recent[self.put_seq % len(self.recent)] = data
+            self.put_seq += 1
+            logger.debug("Buffer %s put data: %s, current size: %d", self.id, data, len(self.data))
+            # 放入一个元素只可能让一个消费者继续；没有消费者在等待时不需要通知
+            if self.get_waiting:
+                self.not_empty.notify()
             return data
     
-    def get(self):
-        with self.condition:
-            while len(self.data) == 0:
-                logger.debug(f"Buffer {self.id} is empty, consumer waiting.")
-                self.condition.wait()
+    def get(self, timeout=None):
+        """
+        取出数据。缓冲区空时最多等待 timeout 秒（None 表示一直等待），超时返回 None。
+        缓冲区关闭后仍可取完剩余数据，取空后抛出 BufferClosed。
+        """
+        with self.lock:
+            if not self.can_get() and not self._wait(self.not_empty, self.can_get, timeout):
+                logger.debug("Buffer %s is empty, get timed out.", self.id)
+                return None
+            if not self.data:
+                raise BufferClosed(f"Buffer {self.id} is closed")
                 
             data = self.data.popleft()
-            logger.debug(f"Buffer {self.id} get data: {data}, current size: {len(self.data)}")
-            self.condition.notify_all()
+            self.get_seq += 1
+            logger.debug("Buffer %s get data: %s, current size: %d", self.id, data, len(self.data))
+            # 取出一个元素只空出一个位置，只唤醒一个生产者
+            self._notify_space(1)
             return data
+    
+    def try_put(self, data):
+        """非阻塞放入，成功返回 True，缓冲区满返回 False"""
+        return self.put(data, timeout=0) is not None
+    
+    def try_get(self):
+        """非阻塞取出，缓冲区空时返回 None"""
+        return self.get(timeout=0)
+    
+    def close(self):
+        """关闭缓冲区并唤醒所有等待的生产者和消费者"""
+        with self.lock:
+            self.closed = True
+            self.not_full.notify_all()
+            self.not_empty.notify_all()
+        logger.info(f"Buffer {self.id} closed")
+    
+    def reopen(self):
+        """重新打开已关闭的缓冲区，保留其中的数据"""
+        with self.lock:
+            self.closed = False
+        logger.info(f"Buffer {self.id} reopened")
         
+    def put_many(self, items):
+        """
+        批量放入数据，只获取一次锁。
+        缓冲区满时等待空位，每批放入后只通知一次消费者。返回放入的元素个数。
+        """
+        items = list(items)
+        count = 0
+        with self.not_full:
+            while count < len(items):
+                self._wait(self.not_full, self.can_put, None)
+                if self.closed:
+                    raise BufferClosed(f"Buffer {self.id} is closed")
+                
+                batch = items[count:count + self._free()]
+                self._extend(batch)
+                count += len(batch)
+            logger.debug("Buffer %s put %d items, current size: %d", self.id, count, len(self.data))
+        return count
+    
+    def get_many(self, max_n, timeout=None):
+        """
+        批量取出最多 max_n 个数据，只获取一次锁。
+        缓冲区为空时最多等待 timeout 秒（None 表示一直等待），超时返回空列表。
+        """
+        with self.not_empty:
+            if not self._wait(self.not_empty, self.can_get, timeout):
+                return []
+            if not self.data:
+                raise BufferClosed(f"Buffer {self.id} is closed")
+            
+            items = self._take(min(max_n, len(self.data)))
+            logger.debug("Buffer %s get %d items, current size: %d", self.id, len(items), len(self.data))
+            return items
+    
+    def drain_into(self, other, max_n=None):
+        """
+        将本缓冲区的数据直接转移到另一个缓冲区，不阻塞。
+        转移数量受目标空位限制，返回转移的数据列表（没有可转移的数据时为空列表）。
+        """
+        if other is self:
+            return []
+        return transfer(self, other, float('inf') if max_n is None else max_n, timeout=0)
+    
+    def _available(self):
+        """可取出的数据个数，调用方需持有锁"""
+        return len(self.data)
+    
+    def _peek(self, n):
+        """按取出的顺序列出接下来的 n 个数据但不取出，调用方需持有锁"""
+        return list(itertools.islice(self.data, n))
+    
+    def _take(self, n):
+        """取出 n 个数据并通知生产者，调用方需持有锁且已确认数据足够"""
+        items = self.data.popmany(n)
+        self.get_seq += n
+        self._notify_space(n)
+        return items
+    
+    def _notify_space(self, n):
+        """空出 n 个位置后唤醒等待的生产者，调用方需持有锁"""
+        if self.put_waiting:
+            self.not_full.notify(n)
+    
+    def _wait_readable(self, timeout):
+        """不持有锁时调用：等待直到有数据可取或缓冲区关闭，超时返回 False"""
+        with self.lock:
+            return self._wait(self.not_empty, self.can_get, timeout)
+    
+    def _wait_writable(self, timeout, item=None):
+        """
+        不持有锁时调用：等待直到有空位或缓冲区关闭，超时返回 False。
+        item 为等待放入的数据，按类别限制容量的缓冲区据此等待，这里不使用。
+        """
+        with self.lock:
+            return self._wait(self.not_full, self.can_put, timeout)
+    
+    def _free(self):
+        """剩余空位数，调用方需持有锁"""
+        return max(self.capacity - len(self.data), 0)
+    
+    def _room(self, source, n):
+        """从 source 转移过来的 n 个数据中能放入的个数，调用方需持有两边的锁"""
+        return min(n, self._free())
+    
+    def _extend(self, items):
+        """追加一批数据、记录变更并通知消费者，调用方需持有锁且已确认空位足够"""
+        self.data.extend(items)
+        recent = self.recent
+        slots = len(recent)
+        end = self.put_seq + len(items)
+        logged = items[-slots:]  # 比日志更长的批次只需记录最后 slots 个
+        for seq, item in enumerate(logged, end - len(logged)):
+            recent[seq % slots] = item
+        self.put_seq = end
+        if self.get_waiting:
+            self.not_empty.notify(len(items))
+    
     def resize(self, new_size):
         """
-        调整缓冲区的大小。
-        如果新大小小于当前元素数量，则保留最早的元素。
+        调整缓冲区的大小，只修改容量上限，不重建存储，耗时为 O(1)。
+        缩小到小于当前元素数量时不丢弃数据：缓冲区暂停接收，直到被取到新容量以下。
         """
-        with self.condition:
+        with self.lock:
             if not isinstance(new_size, int) or new_size <= 0:
                 logger.warning(f"Buffer {self.id} resize: 无效的大小 {new_size}。必须是正整数。")
                 return False # 表示操作失败
 
-            current_items = list(self.data)
-            
-            # 如果缩小缓冲区，保留最左边（最早）的元素
-            if new_size < len(current_items):
-                items_to_keep = current_items[:new_size]
-            else:
-                items_to_keep = current_items # 如果扩大或大小不变，保留所有元素
+            self.capacity = new_size
             
-            self.data = deque(items_to_keep, maxlen=new_size)
-            
-            logger.info(f"Buffer {self.id} 已调整大小为 {new_size}。当前元素: {len(self.data)}/{self.data.maxlen}.")
-            # 通知所有等待的线程，因为缓冲区的容量和/或内容可能已更改
-            self.condition.notify_all()
+            logger.info(f"Buffer {self.id} 已调整大小为 {new_size}。当前元素: {len(self.data)}/{self.capacity}.")
+            # 扩容后按新增的空位数唤醒生产者；数据没有变化，不需要唤醒消费者
+            free = self._free()
+            if free:
+                self._notify_space(free)
             return True
     
+    def snapshot_since(self, version=None):
+        """
+        返回自 version 以来的增量 BufferChange，不获取锁，耗时与变化量成正比。
+        version 为 None 或日志已被覆盖时返回 reset 快照。
+        """
+        get_seq = self.get_seq
+        put_seq = self.put_seq
+        current_put = lambda: self.put_seq
+        if version is not None:
+            put0, get0 = version
+            appended = _read_log(self.recent, max(put0, get_seq), put_seq, current_put)
+            if appended is not None:
+                return BufferChange((put_seq, get_seq), appended, get_seq - get0,
+                                    put_seq - get_seq, self.capacity, False)
+        
+        appended = _read_log(self.recent, get_seq, put_seq, current_put)
+        return BufferChange((put_seq, get_seq), appended, None, put_seq - get_seq, self.capacity, True)
+    
     def __str__(self):
-        with self.condition:
+        with self.lock:
             return f"Buffer{self.id} {list(self.data)}"
 
+class SPSCBuffer:
+    """
+    单生产者/单消费者环形缓冲区。
+    只允许一个线程 put、一个线程 get：tail 只由生产者推进，head 只由消费者推进，
+    快速路径不加锁（依赖 GIL 保证单个属性读写的原子性）；只有在环满或环空时才进入
+    带条件变量的慢路径阻塞等待。
+    环的槽位在构造时按 max_size 一次分配好，之后不再重建，运行中只能在 max_size 以内调整容量。
+    """
+    def __init__(self, size = 10, id=0, max_size=None):
+        self.id = id
+        self.capacity = size  # 逻辑容量上限
+        self.slots = max(size, max_size or size)  # 环的物理槽位数，即容量能调到的上限
+        self.ring = [None] * self.slots
+        self.head = 0  # 下一个要读取的序号，只由消费者修改
+        self.tail = 0  # 下一个要写入的序号，只由生产者修改
+        # 慢路径：等待方先置位标志再检查条件，另一方推进索引后看到标志才加锁通知
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.not_empty = threading.Condition(self.lock)
+        self.put_waiting = False
+        self.get_waiting = False
+        # 单写单读的链路在 transfer 中不需要持锁：唯一的写者/读者就是执行转移的线程，
+        # 慢路径的锁只在通知时短暂获取
+        self.transfer_lock = contextlib.nullcontext()
+        self.lock_order = (0, next(_lock_order))
+        self.closed = False
+        self.wakeups = 0
+        self.put_blocked = Counter()
+        self.get_blocked = Counter()
+        logger.info(f"SPSCBuffer {self.id} initialized with size {size}")
+    
+    def __len__(self):
+        return self.tail - self.head
+    
+    def can_put(self):
+        return self.tail - self.head < self.capacity
+    
+    def can_get(self):
+        return self.tail - self.head > 0
+    
+    def _wait(self, condition, ready, timeout, flag):
+        """
+        慢路径：持锁置位等待标志后再检查条件，直到 ready() 为真或缓冲区被关闭。
+        timeout 为 None 时一直等待；超时返回 False。
+        """
+        with self.lock:
+            setattr(self, flag, True)
+            start = time.monotonic()
+            try:
+                endtime = None
+                while not ready() and not self.closed:
+                    if timeout is None:
+                        condition.wait()
+                    else:
+                        if endtime is None:
+                            endtime = time.monotonic() + timeout
+                        remaining = endtime - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        condition.wait(remaining)
+                    self.wakeups += 1
+                return True
+            finally:
+                setattr(self, flag, False)
+                blocked = self.put_blocked if flag == 'put_waiting' else self.get_blocked
+                blocked.inc(time.monotonic() - start)
+    
+    def put(self, data, timeout=None):
+        """
+        放入数据。环满时最多等待 timeout 秒（None 表示一直等待），超时返回 None。
+        缓冲区关闭时抛出 BufferClosed。
+        """
+        if self.tail - self.head >= self.capacity or self.closed:
+            logger.debug("SPSCBuffer %s is full, producer waiting.", self.id)
+            if not self._wait(self.not_full, self.can_put, timeout, 'put_waiting'):
+                return None
+            if self.closed:
+                raise BufferClosed(f"SPSCBuffer {self.id} is closed")
+        
+        # 先写入槽位再发布 tail，消费者看到新 tail 时数据一定已经就绪
+        tail = self.tail
+        self.ring[tail % self.slots] = data
+        self.tail = tail + 1
+        if self.get_waiting:
+            with self.lock:
+                self.not_empty.notify()
+        return data
+    
+    def get(self, timeout=None):
+        """
+        取出数据。环空时最多等待 timeout 秒（None 表示一直等待），超时返回 None。
+        缓冲区关闭后仍可取完剩余数据，取空后抛出 BufferClosed。
+        """
+        if self.tail - self.head <= 0:
+            logger.debug("SPSCBuffer %s is empty, consumer waiting.", self.id)
+            if not self._wait(self.not_empty, self.can_get, timeout, 'get_waiting'):
+                return None
+            if self.tail - self.head <= 0:
+                raise BufferClosed(f"SPSCBuffer {self.id} is closed")
+        
+        head = self.head
+        # 槽位不清空：已取出的数据留到被覆盖为止，供 snapshot_since 无锁读取
+        data = self.ring[head % self.slots]
+        self.head = head + 1
+        if self.put_waiting:
+            with self.lock:
+                self.not_full.notify()
+        return data
+    
+    def try_put(self, data):
+        """非阻塞放入，成功返回 True，环满返回 False"""
+        return self.put(data, timeout=0) is not None
+    
+    def try_get(self):
+        """非阻塞取出，环空时返回 None"""
+        return self.get(timeout=0)
+    
+    def close(self):
+        """关闭缓冲区并唤醒等待的生产者和消费者"""
+        with self.lock:
+            self.closed = True
+            self.not_full.notify_all()
+            self.not_empty.notify_all()
+        logger.info(f"SPSCBuffer {self.id} closed")
+    
+    def reopen(self):
+        """重新打开已关闭的缓冲区，保留其中的数据"""
+        with self.lock:
+            self.closed = False
+        logger.info(f"SPSCBuffer {self.id} reopened")
+    
+    def put_many(self, items):
+        """逐个放入，接口与 Buffer.put_many 一致"""
+        count = 0
+        for item in items:
+            self.put(item)
+            count += 1
+        return count
+    
+    def get_many(self, max_n, timeout=None):
+        """取出最多 max_n 个数据；为空时最多等待 timeout 秒，超时返回空列表"""
+        if self.tail - self.head <= 0:
+            if not self._wait(self.not_empty, self.can_get, timeout, 'get_waiting'):
+                return []
+            if self.tail - self.head <= 0:
+                raise BufferClosed(f"SPSCBuffer {self.id} is closed")
+        
+        return self._take(min(max_n, self.tail - self.head))
+    
+    def _available(self):
+        return self.tail - self.head
+    
+    def _peek(self, n):
+        """由唯一的消费者查看接下来的 n 个数据，不取出"""
+        head = self.head
+        return [self.ring[seq % self.slots] for seq in range(head, head + min(n, self.tail - head))]
+    
+    def _take(self, n):
+        """由唯一的消费者取出 n 个数据，调用方已确认数据足够"""
+        head = self.head
+        items = [self.ring[seq % self.slots] for seq in range(head, head + n)]
+        self.head = head + n
+        if self.put_waiting:
+            with self.lock:
+                self.not_full.notify()
+        return items
+    
+    def _wait_readable(self, timeout):
+        return self._wait(self.not_empty, self.can_get, timeout, 'get_waiting')
+    
+    def _wait_writable(self, timeout, item=None):
+        return self._wait(self.not_full, self.can_put, timeout, 'put_waiting')
+    
+    def _free(self):
+        """剩余空位数（只有唯一的生产者调用时才可靠）"""
+        return max(self.capacity - (self.tail - self.head), 0)
+    
+    def _room(self, source, n):
+        return min(n, self._free())
+    
+    def _extend(self, items):
+        """由唯一的生产者追加一批数据，调用方已确认空位足够"""
+        tail = self.tail
+        for offset, item in enumerate(items):
+            self.ring[(tail + offset) % self.slots] = item
+        self.tail = tail + len(items)
+        if self.get_waiting:
+            with self.lock:
+                self.not_empty.notify()
+    
+    def resize(self, new_size):
+        """
+        调整缓冲区的大小，只修改容量上限，可以在 put/get 运行中调用。
+        缩小时不丢弃数据，缓冲区暂停接收直到被取到新容量以下。
+        无锁的 put/get 随时在读写环，重建环会与它们竞争，因此超过构造时分配的槽位（max_size）时拒绝调整。
+        """
+        with self.lock:
+            if not isinstance(new_size, int) or new_size <= 0:
+                logger.warning(f"SPSCBuffer {self.id} resize: 无效的大小 {new_size}。必须是正整数。")
+                return False
+            if new_size > self.slots:
+                logger.warning(f"SPSCBuffer {self.id} resize: 大小 {new_size} 超过预分配的上限 {self.slots}。")
+                return False
+            
+            self.capacity = new_size
+            logger.info(f"SPSCBuffer {self.id} 已调整大小为 {new_size}。当前元素: {len(self)}/{new_size}.")
+            self.not_full.notify()
+            return True
+    
+    def _items(self):
+        return [self.ring[seq % self.slots] for seq in range(self.head, self.tail)]
+    
+    def snapshot_since(self, version=None):
+        """
+        返回自 version 以来的增量 BufferChange，不加锁。
+        head/tail 即累计取出/放入计数，环本身就是放入日志。
+        """
+        get_seq = self.head
+        put_seq = self.tail
+        ring = self.ring
+        current_put = lambda: self.tail
+        if version is not None:
+            put0, get0 = version
+            appended = _read_log(ring, max(put0, get_seq), put_seq, current_put)
+            if appended is not None:
+                return BufferChange((put_seq, get_seq), appended, get_seq - get0,
+                                    put_seq - get_seq, self.capacity, False)
+        
+        appended = _read_log(ring, get_seq, put_seq, current_put)
+        return BufferChange((put_seq, get_seq), appended, None, put_seq - get_seq, self.capacity, True)
+    
+    def __str__(self):
+        return f"Buffer{self.id} {self._items()}"
+
+
+def transfer(source, target, max_n=1, timeout=None):
+    """
+    原子地把最多 max_n 个数据从 source 移到 target，返回移动的数据列表。
+    按 lock_order 的全局顺序同时持有两边的锁，只有两边都能接受时才移动，
+    数据要么还在 source 中，要么已经进入 target，不存在中间状态。
+    没有数据可取或目标已满时释放两把锁，在阻塞的一方上等待后重试；
+    最多等待 timeout 秒（None 表示一直等待），超时返回空列表。
+    任一缓冲区关闭（源缓冲区需已取空）时抛出 BufferClosed。
+    """
+    if source is target:
+        raise ValueError("source 和 target 不能是同一个缓冲区")
+    first, second = sorted((source, target), key=lambda b: b.lock_order)
+    endtime = None if timeout is None else time.monotonic() + timeout
+    while True:
+        with first.transfer_lock, second.transfer_lock:
+            if target.closed:
+                raise BufferClosed(f"Buffer {target.id} is closed")
+            available = source._available()
+            # 目标按类别限制容量时，能放入的个数取决于源中接下来的数据
+            n = target._room(source, min(max_n, available))
+            if n > 0:
+                items = source._take(n)
+                target._extend(items)
+                logger.debug("Transferred %d items from Buffer %s to Buffer %s", n, source.id, target.id)
+                return items
+            if available == 0 and source.closed:
+                raise BufferClosed(f"Buffer {source.id} is closed")
+            blocked = source._peek(1)[0] if available else None
+        
+        remaining = None if endtime is None else endtime - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return []
+        # 不持有另一把锁，只在阻塞的一方上等待
+        if available == 0:
+            ready = source._wait_readable(remaining)
+        else:
+            ready = target._wait_writable(remaining, blocked)
+        if not ready:
+            return []
+
+
+def create_buffer(size=10, id=0, single_writer=False, single_reader=False, storage='deque', priority=None,
+                  max_size=None):
+    """
+    按链路的读写方数量创建缓冲区。
+    声明为单写单读的链路使用无锁快速路径的 SPSCBuffer，其余使用 Buffer（可选择存储类型）。
+    max_size 为运行中可能调整到的最大容量，SPSCBuffer 按它预分配槽位。
+    给出 priority（PriorityBuffer 的构造参数）时创建按服务类别出队的 PriorityBuffer。
+    """
+    if priority is not None:
+        from priority_buffer import PriorityBuffer
+        return PriorityBuffer(size, id, **priority)
+    if single_writer and single_reader:
+        return SPSCBuffer(size, id, max_size)
+    return Buffer(size, id, storage)
+
+
 class Producer:
-    def __init__(self, buffer, put_freq=2):
+    def __init__(self, buffer, put_freq=2, batch_size=1, stop_event=None, burst=1, payload=None):
         self.buffer = buffer
+        # 数据来源，默认成块预生成的随机字符
+        self.payload = payload or RandomChars()
+        # try_put 因缓冲区满未能放入的数据，下次优先放入，序号类数据源不会因此跳号
+        self._pending = None
+        self.stop_event = stop_event
         self.put_freq = max(put_freq, 0.1)
-        logger.info(f"Producer initialized for Buffer {self.buffer.id} with put_freq {self.put_freq}")
+        # 批量模式下每次 put_batch 放入 batch_size 个数据，平均速率仍为 put_freq
+        self.batch_size = max(int(batch_size), 1)
+        # 令牌桶至少能容纳一整批；burst 更大时允许在停顿后追回落下的操作
+        self.put_pacer = Pacer(self.put_freq, max(burst, self.batch_size))
+        logger.info(f"Producer initialized for Buffer {self.buffer.id} with put_freq {self.put_freq}, batch_size {self.batch_size}")
 
     def set_put_freq(self, freq):
         """设置生产者放入数据的频率"""
@@ -85,25 +761,66 @@ class Producer:
             self.put_freq = 2
         else:
             self.put_freq = freq
+        self.put_pacer.set_rate(self.put_freq)
         logger.info(f"Producer put frequency set to {self.put_freq}")
+
+    def stats(self):
+        """各角色的目标速率与实际达到的速率"""
+        return {'put': self.put_pacer.stats()}
     
     def put(self):
-        time.sleep(1 / self.put_freq)
-        random_char = random.choice(string.ascii_letters + string.digits)
+        self.put_pacer.acquire(1, self.stop_event)
         try:
-            data = self.buffer.put(random_char)
+            data = self.buffer.put(self.payload.next())
+            self.put_pacer.done()
             logger.info(f"Producer put '{data}' into Buffer {self.buffer.id}")
             return data
+        except BufferClosed:
+            raise
         except Exception as e:
             logger.error(f"生产者放入数据失败: {e}", exc_info=True)
             raise
 
+    def try_put(self):
+        """
+        不等待节拍、不阻塞地放入一个数据，缓冲区满时返回 None。
+        供 Executor 调度使用，节拍由调度器按 put_pacer 控制。
+        """
+        data = self._pending if self._pending is not None else self.payload.next()
+        if not self.buffer.try_put(data):
+            self._pending = data
+            return None
+        self._pending = None
+        self.put_pacer.done()
+        logger.info(f"Producer put '{data}' into Buffer {self.buffer.id}")
+        return data
+
+    def put_batch(self):
+        """批量放入 batch_size 个数据，整批只获取一次锁"""
+        self.put_pacer.acquire(self.batch_size, self.stop_event)
+        chars = self.payload.take(self.batch_size)
+        try:
+            self.buffer.put_many(chars)
+            self.put_pacer.done(len(chars))
+            logger.info(f"Producer put {len(chars)} items into Buffer {self.buffer.id}")
+            return chars
+        except BufferClosed:
+            raise
+        except Exception as e:
+            logger.error(f"生产者批量放入数据失败: {e}", exc_info=True)
+            raise
+
 class Consumer:
-    def __init__(self, buffer, get_freq=2, move_freq=2):
+    def __init__(self, buffer, get_freq=2, move_freq=2, batch_size=1, stop_event=None, burst=1):
         self.buffer = buffer
+        self.stop_event = stop_event
         self.get_freq = max(get_freq, 0.1)
         self.move_freq = max(move_freq, 0.1)
-        logger.info(f"Consumer initialized for Buffer {self.buffer.id} with get_freq {self.get_freq}, move_freq {self.move_freq}")
+        # 批量模式下每次 get_batch / move_batch 最多处理 batch_size 个数据
+        self.batch_size = max(int(batch_size), 1)
+        self.get_pacer = Pacer(self.get_freq, max(burst, self.batch_size))
+        self.move_pacer = Pacer(self.move_freq, max(burst, self.batch_size))
+        logger.info(f"Consumer initialized for Buffer {self.buffer.id} with get_freq {self.get_freq}, move_freq {self.move_freq}, batch_size {self.batch_size}")
 
     def set_get_freq(self, freq):
         """设置消费者获取数据的频率"""
@@ -112,6 +829,7 @@ class Consumer:
             self.get_freq = 2
         else:
             self.get_freq = freq
+        self.get_pacer.set_rate(self.get_freq)
         logger.info(f"Consumer get frequency set to {self.get_freq}")
 
     def set_move_freq(self, freq):
@@ -121,25 +839,84 @@ class Consumer:
             self.move_freq = 2
         else:
             self.move_freq = freq
+        self.move_pacer.set_rate(self.move_freq)
         logger.info(f"Consumer move frequency set to {self.move_freq}")
+
+    def stats(self):
+        """各角色的目标速率与实际达到的速率"""
+        return {'get': self.get_pacer.stats(), 'move': self.move_pacer.stats()}
     
     def get(self):
-        time.sleep(1 / self.get_freq)
+        self.get_pacer.acquire(1, self.stop_event)
         try:
             data = self.buffer.get()
+            self.get_pacer.done()
             logger.info(f"Consumer got '{data}' from Buffer {self.buffer.id}")
             return data
+        except BufferClosed:
+            raise
         except Exception as e:
             logger.error(f"消费者获取数据失败: {e}", exc_info=True)
             raise
 
     def move(self, source_buffer):
-        time.sleep(1 / self.move_freq)
+        self.move_pacer.acquire(1, self.stop_event)
         try:
-            data = source_buffer.get()
-            self.buffer.put(data)
+            # 原子转移：两边都能接受时才移动，数据不会停留在两个缓冲区之外
+            data, = transfer(source_buffer, self.buffer)
+            self.move_pacer.done()
             logger.info(f"Consumer moved '{data}' from Buffer {source_buffer.id} to Buffer {self.buffer.id}")
             return data
+        except BufferClosed:
+            raise
         except Exception as e:
             logger.error(f"移动操作失败: {e}", exc_info=True)
             raise
+
+    def try_get(self):
+        """不等待节拍、不阻塞地获取一个数据，缓冲区空时返回 None，供 Executor 调度使用"""
+        data = self.buffer.try_get()
+        if data is not None:
+            self.get_pacer.done()
+            logger.info(f"Consumer got '{data}' from Buffer {self.buffer.id}")
+        return data
+
+    def try_move(self, source_buffer):
+        """不等待节拍、不阻塞地移动一个数据，源为空或目标已满时返回 None，供 Executor 调度使用"""
+        items = transfer(source_buffer, self.buffer, 1, timeout=0)
+        if not items:
+            return None
+        self.move_pacer.done()
+        logger.info(f"Consumer moved '{items[0]}' from Buffer {source_buffer.id} to Buffer {self.buffer.id}")
+        return items[0]
+
+    def get_batch(self):
+        """批量获取最多 batch_size 个数据，整批只获取一次锁"""
+        self.get_pacer.acquire(self.batch_size, self.stop_event)
+        try:
+            items = self.buffer.get_many(self.batch_size)
+            self.get_pacer.done(len(items))
+            logger.info(f"Consumer got {len(items)} items from Buffer {self.buffer.id}")
+            return items
+        except BufferClosed:
+            raise
+        except Exception as e:
+            logger.error(f"消费者批量获取数据失败: {e}", exc_info=True)
+            raise
+
+    def move_batch(self, source_buffer):
+        """
+        原子地批量移动最多 batch_size 个数据：同时持有两边的锁，一次移动两边都能接受的全部数据。
+        源为空或目标已满时阻塞等待，至少移动一个数据后返回。
+        """
+        self.move_pacer.acquire(self.batch_size, self.stop_event)
+        try:
+            items = transfer(source_buffer, self.buffer, self.batch_size)
+            self.move_pacer.done(len(items))
+            logger.info(f"Consumer moved {len(items)} items from Buffer {source_buffer.id} to Buffer {self.buffer.id}")
+            return items
+        except BufferClosed:
+            raise
+        except Exception as e:
+            logger.error(f"批量移动操作失败: {e}", exc_info=True)
+            raise
@@ -0,0 +1,146 @@
+import time
+import zlib
+import logging
+from collections import deque
+
+from pacing import Pacer
+from scheduler import Task
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingPolicy:
+    """
+    分发策略：choose(item, branches) 返回目标分支的下标，没有可用分支时返回 None。
+    目标分支已满时同一个数据会被再次 choose，有状态的策略在 routed() 确认放入之前应返回同一个结果。
+    """
+    def choose(self, item, branches):
+        raise NotImplementedError
+
+    def routed(self, index):
+        """数据已放入 branches[index]"""
+
+
+class RoundRobin(RoutingPolicy):
+    """按顺序轮流分发到各分支"""
+    def __init__(self):
+        self.next = 0
+
+    def choose(self, item, branches):
+        return self.next % len(branches)
+
+    def routed(self, index):
+        self.next = index + 1
+
+
+class Weighted(RoutingPolicy):
+    """
+    平滑加权轮询：每次所有分支的当前值加上各自权重，选当前值最大的分支并减去总权重。
+    权重 2:1 时分发顺序为 A B A A B A ...，不会连续集中在一个分支。
+    """
+    def __init__(self, weights):
+        self.set_weights(weights)
+
+    def set_weights(self, weights):
+        self.weights = list(weights)
+        self.current = [0] * len(self.weights)
+        self._choice = None
+
+    def choose(self, item, branches):
+        if self._choice is None:
+            for i, weight in enumerate(self.weights):
+                self.current[i] += weight
+            self._choice = max(range(len(self.weights)), key=self.current.__getitem__)
+            self.current[self._choice] -= sum(self.weights)
+        return self._choice
+
+    def routed(self, index):
+        self._choice = None
+
+
+class LeastOccupied(RoutingPolicy):
+    """分发到占用率最低且还有空位的分支"""
+    def choose(self, item, branches):
+        candidates = [i for i, branch in enumerate(branches) if branch._free() > 0]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda i: 1 - branches[i]._free() / branches[i].capacity)
+
+
+class KeyHash(RoutingPolicy):
+    """按 key(item) 的 CRC32 选择分支，相同键的数据总是进入同一个分支"""
+    def __init__(self, key=None):
+        self.key = key or (lambda item: item)
+
+    def choose(self, item, branches):
+        key = self.key(item)
+        if not isinstance(key, bytes):
+            key = str(key).encode('utf-8')
+        return zlib.crc32(key) % len(branches)
+
+
+POLICIES = {
+    'round_robin': RoundRobin,
+    'weighted': Weighted,
+    'least_occupied': LeastOccupied,
+    'key_hash': KeyHash,
+}
+
+
+class Dispatcher:
+    """
+    扇出分发：作为源缓冲区唯一的读者，每次成批取出数据，按策略逐个放入下游分支。
+    目标分支已满时保留剩余数据并保持顺序，下次优先分发，不会因为抢锁而让某个分支饿死。
+    dispatch() 不阻塞，通过 task() 在 Executor 上运行，rate 为每秒分发的数据个数。
+    """
+    def __init__(self, source, branches, policy=None, rate=10, batch_size=16, name='dispatch'):
+        self.source = source
+        self.branches = list(branches)
+        self.policy = policy or RoundRobin()
+        self.batch_size = batch_size
+        self.name = name
+        self.pacer = Pacer(rate, burst=batch_size)
+        self.pending = deque()
+        self.counts = [0] * len(self.branches)
+        self.started = time.monotonic()
+
+    def task(self, on_result=None):
+        """返回周期分发任务，按实际分发的数据个数消耗令牌"""
+        return Task(self.name, self.dispatch, self.pacer, on_result, cost=len)
+
+    def set_rate(self, rate):
+        self.pacer.set_rate(rate)
+
+    def dispatch(self):
+        """分发一批数据，返回 [(分支下标, 数据)]；源为空或下游都已满时返回 None"""
+        if not self.pending:
+            # 分发器是各分支唯一的写者，读到的空位数只会偏少，不会多取
+            free = sum(branch._free() for branch in self.branches)
+            n = min(self.batch_size, max(self.pacer.available(), 1), free)
+            if n == 0:
+                return None
+            self.pending.extend(self.source.get_many(n, timeout=0))
+        routed = []
+        try:
+            while self.pending:
+                item = self.pending[0]
+                index = self.policy.choose(item, self.branches)
+                if index is None or not self.branches[index].try_put(item):
+                    break
+                self.pending.popleft()
+                self.policy.routed(index)
+                self.counts[index] += 1
+                routed.append((index, item))
+        except Exception:
+            if self.pending:
+                logger.warning(f"Dispatcher {self.name} 停止时仍有 {len(self.pending)} 个数据未分发")
+            raise
+        return routed or None
+
+    def stats(self):
+        """各分支（按缓冲区 id）累计分发的数据个数和平均吞吐量"""
+        elapsed = time.monotonic() - self.started
+        return {
+            branch.id: {'items': count, 'rate': count / elapsed if elapsed > 0 else 0.0}
+            for branch, count in zip(self.branches, self.counts)
+        }
@@ -0,0 +1,116 @@
+import threading
+import time
+import logging
+
+from pacing import Pacer
+from scheduler import Executor, Task
+
+logger = logging.getLogger(__name__)
+
+STARTING = 'starting'
+RUNNING = 'running'
+DRAINING = 'draining'
+STOPPED = 'stopped'
+
+
+class Supervisor:
+    """
+    管理拓扑的启动和停止，状态依次为 stopped -> starting -> running -> draining -> stopped。
+    停止时先停生产者、等下游把在途数据处理完（最多 drain_timeout 秒），再关闭缓冲区，
+    在 join_timeout 秒内等待执行器线程退出；没能按时退出的线程记为泄漏并在状态中报告。
+    运行期间每 check_interval 秒检查一次执行器，重新拉起意外退出的工作线程；
+    出错的任务由执行器按指数退避重新执行。
+    """
+    def __init__(self, topology, workers=2, drain_timeout=2.0, join_timeout=2.0,
+                 check_interval=1.0, on_state=None, on_result=None):
+        self.topology = topology
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.join_timeout = join_timeout
+        self.check_interval = check_interval
+        self.on_state = on_state
+        # 转交给 Topology.start 的回调 on_result(name, data)
+        self.on_result = on_result
+        self.state = STOPPED
+        self.executor = None
+        self.leaked = []
+        # 串行化 start/stop，避免 UI 连续点击时交错执行
+        self.lock = threading.Lock()
+
+    def _set_state(self, state):
+        self.state = state
+        logger.info(f"Supervisor state: {state}")
+        if self.on_state:
+            self.on_state(state)
+
+    def start(self):
+        """启动拓扑，只有在 stopped 状态下才会执行，返回是否启动"""
+        with self.lock:
+            if self.state != STOPPED:
+                return False
+            self._set_state(STARTING)
+            self.executor = Executor(self.workers)
+            try:
+                self.topology.start(self.executor, self.on_result)
+                self.executor.submit(Task("supervisor", self.check, Pacer(1 / self.check_interval)))
+                self.executor.start()
+            except BaseException:
+                # 启动到一半失败时撤销已经提交的任务和打开的缓冲区，回到 stopped 以便修正后重新启动
+                self.topology.stop()
+                self.leaked = [t for t in self.leaked if t.is_alive()] + self.executor.shutdown(self.join_timeout)
+                self._set_state(STOPPED)
+                raise
+            self._set_state(RUNNING)
+            return True
+
+    def check(self):
+        """周期检查：重新拉起退出的工作线程，清理已经退出的泄漏线程"""
+        self.executor.revive()
+        self.leaked = [t for t in self.leaked if t.is_alive()]
+        return True
+
+    def stop(self, drain=True):
+        """
+        停止拓扑。drain 为 True 时先排空在途数据。
+        返回本次停止后仍未退出的线程列表。
+        """
+        with self.lock:
+            if self.state != RUNNING:
+                return []
+            if drain:
+                self._set_state(DRAINING)
+                self.topology.stop_producers()
+                deadline = time.monotonic() + self.drain_timeout
+                while self.topology.in_flight() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                remaining = self.topology.in_flight()
+                if remaining:
+                    logger.warning(f"排空超时，仍有 {remaining} 个数据留在流水线中")
+            self.topology.stop()
+            alive = self.executor.shutdown(self.join_timeout)
+            self.leaked = [t for t in self.leaked if t.is_alive()] + alive
+            if alive:
+                logger.warning(f"停止时仍有 {len(alive)} 个线程未退出")
+            self._set_state(STOPPED)
+            return alive
+
+    def restart(self, drain=True):
+        self.stop(drain)
+        return self.start()
+
+    def thread_count(self):
+        """当前存活的执行器线程数，包括之前停止时未按时退出的线程"""
+        running = self.executor.thread_count if self.executor and self.state != STOPPED else 0
+        return running + sum(t.is_alive() for t in self.leaked)
+
+    def status(self):
+        executor = self.executor
+        return {
+            'state': self.state,
+            'threads': self.thread_count(),
+            'leaked': sum(t.is_alive() for t in self.leaked),
+            'tasks': len(executor.tasks) if executor else 0,
+            'restarts': executor.restarts if executor else 0,
+            'revived': executor.revived if executor else 0,
+            'in_flight': self.topology.in_flight(),
+        }
@@ -0,0 +1,48 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+# 配置快照：版本号和只读的取值映射，发布后不再修改
+Snapshot = namedtuple('Snapshot', 'version values')
+
+
+class LiveConfig:
+    """
+    版本化的运行时配置。
+    当前快照保存在 current 属性中，读取方只需一次属性访问即可拿到一致的整份配置，不需要加锁；
+    update() 在锁内基于当前快照生成新快照并整体替换引用，多个键的修改作为一个版本同时生效。
+    取值没有变化的 update 不会产生新版本；产生新版本时按订阅顺序通知订阅者。
+    """
+    def __init__(self, values=None):
+        self.lock = threading.Lock()
+        self.current = Snapshot(0, MappingProxyType(dict(values or {})))
+        self._subscribers = []
+
+    def __getitem__(self, key):
+        return self.current.values[key]
+
+    def __contains__(self, key):
+        return key in self.current.values
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def subscribe(self, callback):
+        """callback(old, new) 在每次产生新版本后调用，参数为前后两个快照"""
+        self._subscribers.append(callback)
+
+    def update(self, changes):
+        """合并 changes 并发布新版本，返回生效的快照"""
+        with self.lock:
+            old = self.current
+            if all(old.values.get(key) == value for key, value in changes.items()):
+                return old
+            values = dict(old.values)
+            values.update(changes)
+            new = Snapshot(old.version + 1, MappingProxyType(values))
+            self.current = new
+            # 在锁内通知，保证订阅者按版本顺序收到变更
+            for callback in self._subscribers:
+                callback(old, new)
+            return new
@@ -1,8 +1,17 @@
-import threading
+import multiprocessing
 import os
+import sys
 import time
 import logging
-from buffer import Buffer, Producer, Consumer
+from buffer import Producer, Consumer
+from shm_buffer import SharedBuffer
+from scheduler import Executor, producer_task, consumer_tasks
+from topology import Topology, DEFAULT_TOPOLOGY
+from lifecycle import Supervisor
+from metrics import MetricsRegistry, topology_collector
+from profiler import ContentionProfiler
+from tracing import Tracer
+from simulation import Simulation, format_report
 
 # 配置日志记录
 logging.basicConfig(level=logging.INFO,
@@ -12,58 +21,41 @@ logging.basicConfig(level=logging.INFO,
                         logging.StreamHandler()
                     ])
 
-def producer_thread(buffer1, put_freq):
-    """生产者线程函数"""
-    thread_id = threading.current_thread().ident
-    logging.info(f"生产者线程 {thread_id} 启动")
-    producer = Producer(buffer1, put_freq)
-    while True:
-        producer.put()
+def run_executor(executor):
+    """启动执行器并等待其线程结束（多进程模式下作为进程的主体）"""
+    executor.start()
+    for thread in executor.threads:
+        thread.join()
 
-def consumer_thread(source_buffer, target_buffer, get_freq, move_freq, consumer_id):
-    """消费者线程函数"""
-    thread_id = threading.current_thread().ident
-    logging.info(f"消费者线程 {consumer_id} {thread_id} 启动")
-    
-    # 创建一个消费者实例
+def producer_process(buffer1, put_freq):
+    """生产者进程函数：在本进程的执行器上运行放入任务"""
+    logging.info(f"生产者进程 {os.getpid()} 启动")
+    executor = Executor(workers=1)
+    executor.submit(producer_task(Producer(buffer1, put_freq)))
+    run_executor(executor)
+
+def consumer_process(source_buffer, target_buffer, get_freq, move_freq, consumer_id):
+    """消费者进程函数：移动和获取任务共用本进程执行器的一个工作线程"""
+    logging.info(f"消费者进程 {consumer_id} {os.getpid()} 启动")
+    executor = Executor(workers=1)
     consumer = Consumer(source_buffer, get_freq, move_freq)
-    
-    # 创建两个子线程
-    def move_thread():
-        sub_thread_id = threading.current_thread().ident
-        logging.info(f"消费者 {consumer_id} 的移动线程 {sub_thread_id} 启动")
-        while True:
-            consumer.move(target_buffer)
-    
-    def get_thread():
-        sub_thread_id = threading.current_thread().ident
-        logging.info(f"消费者 {consumer_id} 的获取线程 {sub_thread_id} 启动")
-        while True:
-            consumer.get()
-    
-    # 启动子线程
-    move_t = threading.Thread(target=move_thread, name=f"MoveThread-C{consumer_id}")
-    get_t = threading.Thread(target=get_thread, name=f"GetThread-C{consumer_id}")
-    
-    move_t.daemon = True
-    get_t.daemon = True
-    
-    move_t.start()
-    get_t.start()
-    
-    # 等待子线程完成（实际上因为是守护线程且有无限循环，这里不会退出）
-    move_t.join()
-    get_t.join()
+    for task in consumer_tasks(consumer, target_buffer):
+        executor.submit(task)
+    run_executor(executor)
 
-def print_buffer_status(buffer1, buffer2, buffer3):
+def print_buffer_status(*buffers):
     """打印所有缓冲区状态"""
-    # 获取所有锁，确保状态一致性
     logging.info("\n当前缓冲区状态:")
-    logging.info(f"缓冲区1: {buffer1}")
-    logging.info(f"缓冲区2: {buffer2}")
-    logging.info(f"缓冲区3: {buffer3}\n")
+    for buffer in buffers:
+        logging.info(f"缓冲区{buffer.id}: {buffer}")
 
-def main():
+def main(use_processes=False, topology_path=DEFAULT_TOPOLOGY, metrics_port=None, metrics_file=None,
+         profile_path=None, trace=False):
+    if not use_processes:
+        run_topology(topology_path, metrics_port, metrics_file, profile_path, trace)
+        return
+    
+    # 多进程模式使用固定的三缓冲区布局
     # 缓冲区大小设置
     size_buffer1 = 8
     size_buffer2 = 1
@@ -76,41 +68,99 @@ def main():
     c1_move_freq = 4
     c2_move_freq = 4
     
-    # 创建缓冲区
-    buffer1 = Buffer(size_buffer1, 1)
-    buffer2 = Buffer(size_buffer2, 2)
-    buffer3 = Buffer(size_buffer3, 3)
-    
-    # 创建线程
-    p_thread = threading.Thread(target=producer_thread, 
-                              args=(buffer1, put_freq), name="ProducerThread")
+    # 缓冲区放在共享内存中，生产者和每个消费者各自运行在独立进程，不受GIL限制
+    buffer1 = SharedBuffer(size_buffer1, 1)
+    buffer2 = SharedBuffer(size_buffer2, 2)
+    buffer3 = SharedBuffer(size_buffer3, 3)
     
-    c1_thread = threading.Thread(target=consumer_thread, 
-                               args=(buffer2, buffer1, 
-                                     c1_get_freq, c1_move_freq, 1), name="ConsumerThread-1")
-    
-    c2_thread = threading.Thread(target=consumer_thread, 
-                               args=(buffer3, buffer1,
-                                     c2_get_freq, c2_move_freq, 2), name="ConsumerThread-2")
-    
-    # 设置为守护线程，这样主线程退出时这些线程也会退出
-    p_thread.daemon = True
-    c1_thread.daemon = True
-    c2_thread.daemon = True
-    
-    # 启动线程
+    # 每个进程内用单工作线程的执行器运行该角色的任务
+    workers = [
+        multiprocessing.Process(target=producer_process, args=(buffer1, put_freq), name="Producer", daemon=True),
+        multiprocessing.Process(target=consumer_process, args=(buffer2, buffer1, c1_get_freq, c1_move_freq, 1),
+                                name="Consumer-1", daemon=True),
+        multiprocessing.Process(target=consumer_process, args=(buffer3, buffer1, c2_get_freq, c2_move_freq, 2),
+                                name="Consumer-2", daemon=True),
+    ]
+    for worker in workers:
+        worker.start()
     logging.info("系统启动...")
-    p_thread.start()
-    c1_thread.start()
-    c2_thread.start()
     
     try:
-        # 主线程保持运行，每秒打印缓冲区状态
+        # 主线程保持运行，每3秒打印缓冲区状态
         while True:
-            time.sleep(3)  # 每3秒打印一次所有缓冲区的状态
+            time.sleep(3)
             print_buffer_status(buffer1, buffer2, buffer3)
     except KeyboardInterrupt:
         logging.info("\n程序被用户中断")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for buffer in (buffer1, buffer2, buffer3):
+            buffer.unlink()
+
+def run_topology(topology_path, metrics_port=None, metrics_file=None, profile_path=None, trace=False):
+    """
+    线程模式：按拓扑配置构建流水线，所有角色的任务运行在同一个固定大小的线程池上。
+    给出 metrics_port 时在本机该端口提供 /metrics，给出 metrics_file 时每次打印状态后导出到该文件；
+    给出 profile_path 时分析各缓冲区的锁竞争，退出时打印报告并把折叠栈写入该文件；
+    trace 为 True 时追踪每个数据的延迟，随缓冲区状态一起打印各缓冲区和端到端的分位数。
+    """
+    topology = Topology.load(topology_path)
+    profiler = None
+    if profile_path:
+        profiler = ContentionProfiler()
+        profiler.attach(*topology.buffers.values())
+    tracer = None
+    if trace:
+        tracer = Tracer()
+        topology.trace(tracer)
+    registry = MetricsRegistry()
+    registry.add_collector(topology_collector(topology))
+    server = registry.serve(metrics_port) if metrics_port is not None else None
+    supervisor = Supervisor(topology, workers=2)
+    supervisor.start()
+    logging.info("系统启动...")
+    
+    try:
+        # 主线程保持运行，每3秒打印一次所有缓冲区的状态
+        while True:
+            time.sleep(3)
+            print_buffer_status(*topology.buffers.values())
+            if tracer:
+                logging.info("延迟分位数:\n" + tracer.report())
+            if metrics_file:
+                registry.write(metrics_file)
+    except KeyboardInterrupt:
+        logging.info("\n程序被用户中断")
+    finally:
+        if server:
+            server.shutdown()
+        supervisor.stop(drain=True)
+        logging.info(f"系统已停止: {supervisor.status()}")
+        if profiler:
+            profiler.detach()
+            logging.info("锁竞争报告:\n" + profiler.report(limit=20))
+            profiler.write_folded(profile_path)
+
+def run_simulation(topology_path, duration, seed=0, arrivals='deterministic'):
+    """在虚拟时钟上仿真拓扑 duration 秒并打印各缓冲区和角色的统计"""
+    report = Simulation.load(topology_path, seed=seed, arrivals=arrivals).run(duration)
+    logging.info("仿真结果:\n" + format_report(report))
+    return report
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 传入 --processes 时以多进程模式运行；--topology PATH 指定线程模式使用的拓扑配置；
+    # --metrics-port PORT / --metrics-file PATH 以 Prometheus 文本格式导出指标；
+    # --profile-locks PATH 分析锁竞争并把火焰图所需的折叠栈写入 PATH；--trace 打印每个数据的延迟分位数
+    def option(name, default=None):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+    # --simulate SECONDS 在虚拟时钟上仿真该时长，--seed N 固定随机数，--poisson 使用指数分布的到达间隔
+    if '--simulate' in sys.argv:
+        run_simulation(option('--topology', DEFAULT_TOPOLOGY), float(option('--simulate')),
+                       seed=int(option('--seed', 0)),
+                       arrivals='exponential' if '--poisson' in sys.argv else 'deterministic')
+        sys.exit(0)
+    metrics_port = option('--metrics-port')
+    main(use_processes='--processes' in sys.argv, topology_path=option('--topology', DEFAULT_TOPOLOGY),
+         metrics_port=int(metrics_port) if metrics_port else None, metrics_file=option('--metrics-file'),
+         profile_path=option('--profile-locks'), trace='--trace' in sys.argv)
\ No newline at end of file
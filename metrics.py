@@ -0,0 +1,185 @@
+import os
+import threading
+import logging
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# 一个指标样本：名称、类型（counter / gauge）、说明、标签字典和取值
+Sample = namedtuple('Sample', 'name kind help labels value')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter:
+    """
+    按线程分片的计数器：每个线程第一次 inc 时分到自己的计数格，之后只写自己的格子，不需要加锁。
+    value() 在读取时才把所有格子相加；线程退出后它的格子仍然保留，总数保持单调。
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._cells = []
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0]
+            with self._lock:
+                self._cells.append(cell)
+        cell[0] += amount
+
+    def value(self):
+        with self._lock:
+            cells = list(self._cells)
+        return sum(cell[0] for cell in cells)
+
+
+class MetricsRegistry:
+    """
+    指标注册表。所有指标都是惰性的收集函数，只在导出时求值，热路径上没有额外开销。
+    收集函数返回 Sample 的可迭代对象；同名的样本在导出时归为一组。
+    """
+    def __init__(self):
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def counter(self, name, help, **labels):
+        """注册并返回一个按线程分片的 Counter"""
+        counter = Counter()
+        self.add_collector(lambda: [Sample(name, 'counter', help, labels, counter.value())])
+        return counter
+
+    def gauge(self, name, help, fn, **labels):
+        """注册一个在导出时调用 fn() 取值的 gauge"""
+        self.add_collector(lambda: [Sample(name, 'gauge', help, labels, fn())])
+
+    def collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        samples = []
+        for collector in collectors:
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                logger.warning(f"指标收集失败: {e}")
+        return samples
+
+    def render(self):
+        """按 Prometheus 文本格式导出所有指标"""
+        families = {}
+        for sample in self.collect():
+            families.setdefault(sample.name, []).append(sample)
+        lines = []
+        for name, samples in families.items():
+            lines.append(f"# HELP {name} {samples[0].help}")
+            lines.append(f"# TYPE {name} {samples[0].kind}")
+            for sample in samples:
+                lines.append(f"{name}{_format_labels(sample.labels)} {float(sample.value):g}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """导出到文件（可供 node_exporter 的 textfile 收集器读取），先写临时文件再替换，读者不会看到半个文件"""
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        """在后台线程中启动 HTTP 服务，GET /metrics 返回导出结果；返回服务器对象，调用 shutdown() 停止"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics: " + format, *args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Metrics served at http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+def buffer_samples(buffer):
+    """缓冲区的占用、容量、累计放入/取出数和阻塞等待时间"""
+    labels = {'buffer': str(buffer.id)}
+    yield Sample('buffer_occupancy', 'gauge', "当前缓冲区中的数据个数", labels, buffer._available())
+    yield Sample('buffer_capacity', 'gauge', "缓冲区容量", labels, buffer.capacity)
+    puts, gets = getattr(buffer, 'put_seq', None), getattr(buffer, 'get_seq', None)
+    if puts is None:
+        # SPSCBuffer 的 tail/head 就是累计放入/取出数
+        puts, gets = getattr(buffer, 'tail', None), getattr(buffer, 'head', None)
+    if puts is not None:
+        yield Sample('buffer_puts_total', 'counter', "累计放入缓冲区的数据个数", labels, puts)
+        yield Sample('buffer_gets_total', 'counter', "累计从缓冲区取出的数据个数", labels, gets)
+    for op in ('put', 'get'):
+        blocked = getattr(buffer, f'{op}_blocked', None)
+        if blocked is not None:
+            yield Sample('buffer_blocked_seconds_total', 'counter', "在满/空缓冲区上阻塞等待的累计秒数",
+                         dict(labels, op=op), blocked.value())
+
+
+def pacer_samples(pacer, role, op):
+    """一个角色操作的累计完成数、目标速率和实际速率"""
+    labels = {'role': role, 'op': op}
+    stats = pacer.stats()
+    yield Sample('role_operations_total', 'counter', "角色累计完成的操作数", labels, pacer.total)
+    yield Sample('role_target_rate', 'gauge', "角色的目标速率（次/秒）", labels, stats['target'])
+    yield Sample('role_achieved_rate', 'gauge', "角色在当前速率下实际达到的速率（次/秒）", labels, stats['achieved'])
+
+
+def producer_samples(producer, role):
+    return pacer_samples(producer.put_pacer, role, 'put')
+
+
+def consumer_samples(consumer, role, op):
+    return pacer_samples(consumer.get_pacer if op == 'get' else consumer.move_pacer, role, op)
+
+
+def topology_collector(topology):
+    """
+    拓扑的收集函数：每次导出时按当前的角色表生成样本，拓扑重启后新建的角色自动纳入统计。
+    同名角色的多个工作者（移动者、消费者池）各自带 worker 标签。
+    """
+    def collect():
+        for buffer in topology.buffers.values():
+            yield from buffer_samples(buffer)
+        for name, producer in topology.producers.items():
+            yield from producer_samples(producer, name)
+        for name, movers in topology.movers.items():
+            for i, mover in enumerate(movers):
+                for sample in consumer_samples(mover, name, 'move'):
+                    yield sample._replace(labels=dict(sample.labels, worker=str(i)))
+        for name, pool in topology.sinks.items():
+            yield Sample('pool_workers', 'gauge', "消费者池当前的工作者数", {'role': name}, len(pool))
+            for i, worker in enumerate(pool.workers):
+                for sample in consumer_samples(worker.consumer, name, 'get'):
+                    yield sample._replace(labels=dict(sample.labels, worker=str(i)))
+        for name, dispatcher in topology.dispatchers.items():
+            yield from pacer_samples(dispatcher.pacer, name, 'dispatch')
+    return collect
@@ -0,0 +1,110 @@
+import time
+import threading
+
+
+class Pacer:
+    """
+    基于单调时钟的令牌桶节拍器。
+    令牌按 rate 个/秒持续生成，最多累积 burst 个：执行操作本身花费的时间（等锁、日志、信号）
+    不会叠加到节拍上，停顿之后也能在 burst 范围内追回落下的操作。
+    周期短于 min_sleep 时不再逐个休眠，而是一次休眠 min_sleep，醒来后连续执行这段时间内累积的操作，
+    因此亚毫秒级的周期也能达到目标速率。
+    """
+    def __init__(self, rate, burst=1, min_sleep=0.001):
+        self.rate = rate
+        self.burst = burst
+        self.min_sleep = min_sleep
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+        # 累计完成的操作数，不随速率变化清零
+        self.total = 0
+        self._reset_stats(self.last)
+
+    def _reset_stats(self, now):
+        self.started = now
+        self.completed = 0
+
+    @property
+    def capacity(self):
+        """
+        令牌桶容量：高频时至少能容纳几个 min_sleep 内生成的令牌，
+        休眠比预期多睡一些（调度延迟）时令牌也不会丢失
+        """
+        return max(self.burst, self.rate * self.min_sleep * 4, 1)
+
+    def set_rate(self, rate):
+        """修改速率，已累积的令牌保留；速率变化时重新开始统计实际速率"""
+        with self.lock:
+            if rate == self.rate:
+                return
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = rate
+            self._reset_stats(now)
+
+    def _refill(self, now):
+        self.tokens = min(self.tokens + (now - self.last) * self.rate, self.capacity)
+        self.last = now
+
+    def try_acquire(self, n=1):
+        """不等待，令牌足够时取走 n 个并返回 True"""
+        with self.lock:
+            self._refill(time.monotonic())
+            # 超过桶容量的请求永远攒不够，按容量计
+            n = min(n, self.capacity)
+            if self.tokens < n:
+                return False
+            self.tokens -= n
+            return True
+
+    def available(self):
+        """当前可以立即取走的令牌数"""
+        with self.lock:
+            self._refill(time.monotonic())
+            return int(self.tokens)
+
+    def consume(self, n):
+        """
+        无条件扣除 n 个令牌，可以扣成负数：一次批量完成的操作超出已有令牌时，
+        超出部分由之后生成的令牌偿还，平均速率仍不超过 rate。
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= n
+
+    def delay(self, n=1):
+        """距离攒够 n 个令牌还需等待的秒数；需要等待时至少为 min_sleep"""
+        with self.lock:
+            self._refill(time.monotonic())
+            missing = min(n, self.capacity) - self.tokens
+            if missing <= 0:
+                return 0.0
+            return max(missing / self.rate, self.min_sleep)
+
+    def acquire(self, n=1, stop_event=None):
+        """
+        等待直到攒够 n 个令牌并取走，返回 True。
+        stop_event 被置位时提前返回 False。
+        """
+        while not self.try_acquire(n):
+            wait = self.delay(n)
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+        return True
+
+    def done(self, n=1):
+        """记录实际完成的操作数，用于统计达到的速率"""
+        self.completed += n
+        self.total += n
+
+    def stats(self):
+        """返回目标速率、实际达到的速率和完成的操作数"""
+        elapsed = time.monotonic() - self.started
+        return {
+            'target': self.rate,
+            'achieved': self.completed / elapsed if elapsed > 0 else 0.0,
+            'completed': self.completed,
+        }
@@ -0,0 +1,142 @@
+import os
+import string
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = string.ascii_letters + string.digits
+
+
+class PayloadSource:
+    """
+    生产者数据来源。子类实现 _generate() 一次生成一大块数据，
+    next()/take() 只在块用完时才重新生成，逐个取数据的开销接近一次列表索引。
+    不是线程安全的，每个生产者使用自己的数据源。
+    """
+    def __init__(self, block_size=4096):
+        self.block_size = block_size
+        self._block = []
+        self._index = 0
+
+    def _generate(self):
+        """生成下一块数据，返回列表；没有更多数据时返回空列表"""
+        raise NotImplementedError
+
+    def _refill(self):
+        self._block = self._generate()
+        self._index = 0
+        if not self._block:
+            raise EOFError(f"{type(self).__name__} 没有更多数据")
+
+    def next(self):
+        """取出一个数据"""
+        if self._index >= len(self._block):
+            self._refill()
+        item = self._block[self._index]
+        self._index += 1
+        return item
+
+    def take(self, n):
+        """取出 n 个数据"""
+        items = []
+        while len(items) < n:
+            if self._index >= len(self._block):
+                self._refill()
+            chunk = self._block[self._index:self._index + n - len(items)]
+            self._index += len(chunk)
+            items.extend(chunk)
+        return items
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self.next()
+        except EOFError:
+            raise StopIteration
+
+
+class RandomChars(PayloadSource):
+    """
+    随机字符：用 os.urandom 成块生成随机字节，再按查找表翻译成字母表中的字符。
+    只保留小于字母表长度整数倍的字节，保证每个字符出现的概率相同。
+    """
+    def __init__(self, alphabet=ALPHABET, block_size=4096):
+        super().__init__(block_size)
+        self.alphabet = alphabet
+        encoded = alphabet.encode('ascii')
+        limit = 256 - 256 % len(encoded)
+        self._table = bytes(encoded[i % len(encoded)] for i in range(256))
+        self._reject = bytes(range(limit, 256))
+
+    def _generate(self):
+        raw = os.urandom(self.block_size).translate(self._table, self._reject)
+        # 单字符字符串由解释器缓存，拆分后不会为每个字符分配新对象
+        return list(raw.decode('ascii'))
+
+
+class BinaryRecords(PayloadSource):
+    """固定长度的随机二进制记录，适合 SharedBuffer 等按字节存储的缓冲区"""
+    def __init__(self, record_size=4, block_size=4096):
+        super().__init__(block_size)
+        self.record_size = record_size
+
+    def _generate(self):
+        size = self.record_size
+        raw = os.urandom(size * self.block_size)
+        return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+class SequenceRecords(PayloadSource):
+    """带递增序号的记录，便于在下游检查丢失和乱序"""
+    def __init__(self, prefix='', start=0, block_size=4096):
+        super().__init__(block_size)
+        self.prefix = prefix
+        self.seq = start
+
+    def _generate(self):
+        start, self.seq = self.seq, self.seq + self.block_size
+        return [f"{self.prefix}{seq}" for seq in range(start, self.seq)]
+
+
+class FileReplay(PayloadSource):
+    """
+    从文件回放数据。record_size 为 None 时按行回放（去掉换行符），否则按固定字节数回放二进制记录。
+    loop 为 True 时读到文件末尾后从头开始，否则数据取完后抛出 EOFError。
+    """
+    def __init__(self, path, record_size=None, loop=True, block_size=4096):
+        super().__init__(block_size)
+        self.path = path
+        self.record_size = record_size
+        self.loop = loop
+        self._file = None
+
+    def _open(self):
+        if self.record_size is None:
+            return open(self.path, encoding='utf-8')
+        return open(self.path, 'rb')
+
+    def _read_block(self):
+        if self.record_size is None:
+            return [line.rstrip('\n') for line in itertools.islice(self._file, self.block_size)]
+        size = self.record_size
+        raw = self._file.read(size * self.block_size)
+        # 文件末尾不足一条记录的部分丢弃
+        return [raw[i:i + size] for i in range(0, len(raw) - size + 1, size)]
+
+    def _generate(self):
+        if self._file is None:
+            self._file = self._open()
+        block = self._read_block()
+        if not block and self.loop:
+            self._file.seek(0)
+            block = self._read_block()
+            logger.debug("FileReplay %s rewound", self.path)
+        return block
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,6 +1,7 @@
 import sys
 import logging
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QTimer
 from pc_ui import ProducerConsumerUI
 from pc_system import ProducerConsumerSystem
 
@@ -12,6 +13,10 @@ class ProducerConsumerApp:
         self.system = ProducerConsumerSystem()
         # 连接信号和槽
         self.setup_connections()
+        # 定时拉取缓冲区增量，替代每次操作都发送完整快照
+        self.refresh_timer = QTimer()
+        self.refresh_timer.timeout.connect(self.system.poll_buffer_changes)
+        self.refresh_timer.start(100)
         
     def setup_connections(self):
         """设置UI和系统之间的连接"""
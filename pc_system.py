@@ -1,8 +1,8 @@
-import threading
-import time
 import logging
 from PyQt6.QtCore import QObject, pyqtSignal
-from buffer import Buffer, Producer, Consumer
+from buffer import BufferView
+from lifecycle import Supervisor, RUNNING, STOPPED
+from topology import Topology, DEFAULT_TOPOLOGY
 
 # 获取一个 logger 实例
 logger = logging.getLogger(__name__)
@@ -22,34 +22,36 @@ class QtLogHandler(logging.Handler):
 
 class WorkerSignals(QObject):
     """定义信号类，用于线程和主UI通信"""
-    buffer_update = pyqtSignal(str, str, str)
+    buffer_update = pyqtSignal(object, object, object)  # 三个缓冲区的 BufferView
     log_message = pyqtSignal(str)
     data_flow = pyqtSignal(str, str)  # 新增：数据流动信号
 
 class ProducerConsumerSystem:
     """系统逻辑类，管理缓冲区和线程"""
-    def __init__(self):
+    def __init__(self, topology_path=DEFAULT_TOPOLOGY):
         # 创建信号对象
         self.signals = WorkerSignals()
 
         # logging模块的日志路由到UI
         self._setup_ui_logging()
         
-        # 创建缓冲区
-        self.buffer1 = Buffer(8, 1)
-        self.buffer2 = Buffer(4, 2)
-        self.buffer3 = Buffer(4, 3)
-        
-        # 设置默认频率
-        self.put_freq = 4
-        self.c1_get_freq = 1
-        self.c2_get_freq = 1
-        self.c1_move_freq = 2
-        self.c2_move_freq = 2
-        
-        # 控制线程的标志
-        self.running = False
-        self.threads = []
+        # 缓冲区和角色由拓扑配置描述，界面展示其中 id 为 1、2、3 的缓冲区
+        self.topology = Topology.load(topology_path)
+        self.buffer1, self.buffer2, self.buffer3 = (self.topology.buffers[i] for i in (1, 2, 3))
+        # 观察者镜像：按版本增量刷新，不与生产者/消费者争用缓冲区的锁
+        self.views = [BufferView(self.buffer1), BufferView(self.buffer2), BufferView(self.buffer3)]
+        # 界面上的频率控件对应的拓扑角色名，角色名同时也是数据流动动画的类型
+        self.producer_role = 'produce'
+        self.consumer_roles = {
+            (1, 'get'): 'consume_1', (1, 'move'): 'move_to_2',
+            (2, 'get'): 'consume_2', (2, 'move'): 'move_to_3',
+        }
+        
+        # 所有生产/获取/移动任务由固定大小的线程池执行，线程数不随角色数量增长；
+        # Supervisor 负责启动、排空、限时等待线程退出和重新拉起出错的工作线程
+        self.supervisor = Supervisor(
+            self.topology, workers=2, drain_timeout=1.0, join_timeout=2.0,
+            on_result=lambda name, data: self.signals.data_flow.emit(str(data), name))
 
     def _setup_ui_logging(self):
         """配置logging模块,使其日志消息通过信号发送到UI"""
@@ -57,178 +59,63 @@ class ProducerConsumerSystem:
         qt_handler.setLevel(logging.INFO)
         logging.getLogger().addHandler(qt_handler)
     
+    @property
+    def running(self):
+        return self.supervisor.state != STOPPED
+    
     def start_system(self):
         """启动系统"""
-        if self.running:
+        if not self.supervisor.start():
             return
         
-        self.running = True
-        
-        # 创建线程
-        p_thread = threading.Thread(target=self.producer_thread)
-        c1_thread = threading.Thread(target=self.consumer_thread, 
-                                   args=(self.buffer2, self.buffer1, 
-                                         self.c1_get_freq, self.c1_move_freq, 1))
-        c2_thread = threading.Thread(target=self.consumer_thread, 
-                                   args=(self.buffer3, self.buffer1,
-                                         self.c2_get_freq, self.c2_move_freq, 2))
-        
-        # 设置为守护线程
-        p_thread.daemon = True
-        c1_thread.daemon = True
-        c2_thread.daemon = True
-        
-        # 记录线程
-        self.threads = [p_thread, c1_thread, c2_thread]
-        
-        # 启动线程
-        p_thread.start()
-        c1_thread.start()
-        c2_thread.start()
-
-        log_msg = "系统已启动"
+        status = self.supervisor.status()
+        log_msg = f"系统已启动，{status['tasks']} 个任务运行在 {status['threads']} 个线程上"
         self.signals.log_message.emit(log_msg)
         logger.info(log_msg)
         # 初始状态更新
-        self.signals.buffer_update.emit(str(self.buffer1), str(self.buffer2), str(self.buffer3))
+        self.poll_buffer_changes(force=True)
     
     def stop_system(self):
-        """停止系统"""
-        if not self.running:
+        """停止系统：先停止生产者并排空在途数据，再关闭缓冲区、等待线程退出"""
+        if self.supervisor.state != RUNNING:
             return
         
-        self.running = False
-        log_msg = "系统已停止"
-        self.signals.log_message.emit(log_msg)
-        logger.info(log_msg)
-    
-    def producer_thread(self):
-        """生产者线程函数"""
-        thread_id = threading.current_thread().ident
-        log_msg = f"生产者线程 {thread_id} 启动"
-        self.signals.log_message.emit(log_msg)
-        logger.info(log_msg)
-        producer = Producer(self.buffer1, self.put_freq)
+        alive = self.supervisor.stop(drain=True)
+        if alive:
+            log_msg = f"系统停止时仍有 {len(alive)} 个线程未退出"
+            self.signals.log_message.emit(log_msg)
+            logger.warning(log_msg)
         
-        while self.running:
-            try:
-                producer.set_put_freq(self.put_freq)
-                data = producer.put()
-                if data:
-                    # 发送流动动画信号
-                    self.signals.data_flow.emit(str(data), 'produce')
-                    self.signals.buffer_update.emit(str(self.buffer1), str(self.buffer2), str(self.buffer3))
-            except Exception as e:
-                logger.error(f"生产者线程错误: {e}", exc_info=True)
-                time.sleep(1)
-    
-    def consumer_thread(self, source_buffer, target_buffer, get_freq, move_freq, consumer_id):
-        """消费者线程函数"""
-        thread_id = threading.current_thread().ident
-        log_msg = f"消费者线程 {consumer_id} {thread_id} 启动"
+        log_msg = f"系统已停止，剩余线程数: {self.supervisor.thread_count()}"
         self.signals.log_message.emit(log_msg)
         logger.info(log_msg)
-        
-        # 创建一个消费者实例
-        consumer = Consumer(source_buffer, get_freq, move_freq)
-        
-        # 创建两个子线程
-        def move_thread():
-            sub_thread_id = threading.current_thread().ident
-            move_log_msg = f"消费者 {consumer_id} 的MOVE线程 {sub_thread_id} 启动"
-            self.signals.log_message.emit(move_log_msg)
-            logger.info(move_log_msg)
-            while self.running:
-                try:
-                    if consumer_id == 1:
-                        consumer.set_move_freq(self.c1_move_freq)
-                    elif consumer_id == 2:
-                        consumer.set_move_freq(self.c2_move_freq)
-                    data = consumer.move(target_buffer)
-                    if data:
-                        # 根据消费者ID发送不同的流动动画
-                        if consumer_id == 1:
-                            self.signals.data_flow.emit(str(data), 'move_to_2')
-                        else:
-                            self.signals.data_flow.emit(str(data), 'move_to_3')
-                        self.signals.buffer_update.emit(str(self.buffer1), str(self.buffer2), str(self.buffer3))
-                except Exception as e:
-                    logger.error(f"消费者 {consumer_id} MOVE线程错误: {e}", exc_info=True)
-                    time.sleep(1)
-        
-        def get_thread():
-            sub_thread_id = threading.current_thread().ident
-            get_log_msg = f"消费者 {consumer_id} 的GET线程 {sub_thread_id} 启动"
-            self.signals.log_message.emit(get_log_msg)
-            logger.info(get_log_msg)
-            while self.running:
-                try:
-                    if consumer_id == 1:
-                        consumer.set_get_freq(self.c1_get_freq)
-                    elif consumer_id == 2:
-                        consumer.set_get_freq(self.c2_get_freq)
-                    data = consumer.get()
-                    if data:
-                        # 根据消费者ID发送不同的流动动画
-                        if consumer_id == 1:
-                            self.signals.data_flow.emit(str(data), 'consume_1')
-                        else:
-                            self.signals.data_flow.emit(str(data), 'consume_2')
-                        self.signals.buffer_update.emit(str(self.buffer1), str(self.buffer2), str(self.buffer3))
-                except Exception as e:
-                    logger.error(f"消费者 {consumer_id} GET线程错误: {e}", exc_info=True)
-                    time.sleep(1)
-        
-        # 启动子线程
-        move_t = threading.Thread(target=move_thread)
-        get_t = threading.Thread(target=get_thread)
-        
-        move_t.daemon = True
-        get_t.daemon = True
-        
-        move_t.start()
-        get_t.start()
-        
-        # 将子线程添加到线程列表以便跟踪
-        self.threads.extend([move_t, get_t])
-        
-        # 等待子线程完成
-        while self.running:
-            time.sleep(0.1)
+    
+    def poll_buffer_changes(self, force=False):
+        """
+        拉取各缓冲区自上次以来的增量并更新镜像，有变化时发出 buffer_update。
+        只应由同一个线程（UI 定时器）调用。
+        """
+        changed = [view.refresh() for view in self.views]
+        if force or any(changed):
+            self.signals.buffer_update.emit(*self.views)
     
     def update_producer_freq(self, value):
         """更新生产者频率"""
-        self.put_freq = value
+        self.topology.set_rate(self.producer_role, value)
         log_msg = f"生产者频率更新为: {value}"
         self.signals.log_message.emit(log_msg)
         logger.info(log_msg)
     
     def update_consumer_freq(self, consumer_id, freq_type, value):
         """更新消费者频率"""
-        if consumer_id == 1:
-            if freq_type == 'get':
-                self.c1_get_freq = value
-            else:
-                self.c1_move_freq = value
-        else:
-            if freq_type == 'get':
-                self.c2_get_freq = value
-            else:
-                self.c2_move_freq = value
-                
+        self.topology.set_rate(self.consumer_roles[(consumer_id, freq_type)], value)
         log_msg = f"消费者 {consumer_id} {freq_type}频率更新为: {value}"
         self.signals.log_message.emit(log_msg)
         logger.info(log_msg)
     
     def resize_buffer(self, buffer_id, size):
         """调整缓冲区大小"""
-        target_buffer = None
-        if buffer_id == 1:
-            target_buffer = self.buffer1
-        elif buffer_id == 2:
-            target_buffer = self.buffer2
-        elif buffer_id == 3:
-            target_buffer = self.buffer3
+        target_buffer = self.topology.buffers.get(buffer_id)
         
         if not target_buffer:
             log_msg = f"调整缓冲区大小失败：无效的缓冲区ID {buffer_id}。"
@@ -249,9 +136,9 @@ class ProducerConsumerSystem:
             log_msg = f"缓冲区 {buffer_id} 大小已成功调整为: {size}。"
             self.signals.log_message.emit(log_msg)
             logger.info(log_msg)
-            self.signals.buffer_update.emit(str(self.buffer1), str(self.buffer2), str(self.buffer3))
+            self.poll_buffer_changes()
         else:
             log_msg = f"尝试调整缓冲区 {buffer_id} 大小为 {size}，但操作未完成 (详见缓冲区日志)。"
             self.signals.log_message.emit(log_msg)
             logger.warning(log_msg)
-            self.signals.buffer_update.emit(str(self.buffer1), str(self.buffer2), str(self.buffer3))
\ No newline at end of file
+            self.poll_buffer_changes()
\ No newline at end of file
@@ -1,4 +1,5 @@
 import sys
+import itertools
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QPushButton, QSpinBox, 
                             QGroupBox, QTextEdit, QGridLayout)
@@ -7,7 +8,7 @@ from PyQt6.QtGui import QPainter, QPen, QBrush, QColor, QFont
 
 class WorkerSignals(QObject):
     """定义信号类，用于线程和主UI通信"""
-    buffer_update = pyqtSignal(str, str, str)
+    buffer_update = pyqtSignal(object, object, object)
     log_message = pyqtSignal(str)
     data_flow = pyqtSignal(str, str)  # 添加数据流动信号
 
@@ -374,49 +375,27 @@ class ProducerConsumerUI(QMainWindow):
         # 设置主部件
         self.setCentralWidget(main_widget)
     
-    def update_buffer_display(self, buffer1_str, buffer2_str, buffer3_str):
+    def update_buffer_display(self, buffer1_view, buffer2_view, buffer3_view):
         """更新缓冲区显示"""
         # 只更新树状图中的缓冲区内容显示
-        # 从缓冲区字符串中提取内容部分
-        buffer1_content = self._extract_buffer_content(buffer1_str)
-        buffer2_content = self._extract_buffer_content(buffer2_str)
-        buffer3_content = self._extract_buffer_content(buffer3_str)
+        # 缓冲区1容量更大，显示更多内容；缓冲区2和3最多显示5个元素
+        buffer1_content = self._format_buffer_content(buffer1_view, 8)
+        buffer2_content = self._format_buffer_content(buffer2_view, 5)
+        buffer3_content = self._format_buffer_content(buffer3_view, 5)
         
         self.flow_widget.update_buffer_content(buffer1_content, buffer2_content, buffer3_content)
     
-    def _extract_buffer_content(self, buffer_str):
-        """从缓冲区字符串中提取内容部分"""
-        # buffer_str格式类似 "Buffer1 ['a', 'b', 'c']"
-        try:
-            # 找到第一个 '[' 的位置
-            start_idx = buffer_str.find('[')
-            if start_idx == -1:
-                return "[]"
-            
-            # 提取从 '[' 开始的部分
-            content = buffer_str[start_idx:]
-            
-            # 根据缓冲区类型设置不同的截断策略
-            if "Buffer1" in buffer_str:
-                # 缓冲区1容量更大，显示更多内容
-                if len(content) > 35:
-                    elements = content[1:-1].split(', ')  # 去掉首尾的[]并分割
-                    if len(elements) > 8:
-                        # 显示前8个元素和省略号
-                        truncated = ', '.join(elements[:8]) + '...'
-                        content = f"[{truncated}]"
-            else:
-                # 缓冲区2和3保持原有截断逻辑
-                if len(content) > 25:
-                    elements = content[1:-1].split(', ')  # 去掉首尾的[]并分割
-                    if len(elements) > 5:
-                        # 显示前5个元素和省略号
-                        truncated = ', '.join(elements[:5]) + '...'
-                        content = f"[{truncated}]"
-                    
-            return content
-        except Exception:
-            return "[]"
+    def _format_buffer_content(self, view, limit):
+        """把缓冲区镜像格式化为显示文本，超过 limit 个元素时截断"""
+        if view.items is None:
+            # 镜像落后太多，只显示占用量
+            return f"[{view.size}/{view.capacity}]"
+        
+        elements = [repr(item) for item in itertools.islice(view.items, limit)]
+        content = ', '.join(elements)
+        if len(view.items) > limit:
+            content += '...'
+        return f"[{content}]"
     
     def append_log(self, message):
         """添加日志信息"""
@@ -0,0 +1,300 @@
+import time
+import logging
+from collections import deque, namedtuple
+
+from buffer import Buffer, BufferChange, BufferClosed
+
+logger = logging.getLogger(__name__)
+
+# 带服务类别的数据：priority 为类别名，data 为原始数据。
+# 类别随数据本身移动，Consumer.move 把它转移到下一个 PriorityBuffer 时仍按原类别入队
+Prioritized = namedtuple('Prioritized', 'priority data')
+
+POLICIES = ('strict', 'weighted')
+
+
+class PriorityStorage:
+    """
+    按服务类别分开存放的存储：每个类别一个 deque，元素连同入队时间一起保存。
+    strict 策略总是先取优先级最高（classes 中靠前）的非空类别；
+    weighted 策略在非空类别之间做平滑加权轮询，低优先级类别也能按权重分到服务，不会饿死。
+    """
+    def __init__(self, classes, policy='strict', weights=None, classify=None):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的出队策略 {policy}，可选: {', '.join(POLICIES)}")
+        self.classes = list(classes)
+        self.policy = policy
+        self.weights = dict(zip(self.classes, weights or [1] * len(self.classes)))
+        self.classify = classify or self._default_class
+        self.queues = {name: deque() for name in self.classes}
+        self.current = {name: 0 for name in self.classes}
+        self.size = 0
+        # 各类别累计出队数、等待时间之和与最大等待时间
+        self.served = dict.fromkeys(self.classes, 0)
+        self.total_wait = dict.fromkeys(self.classes, 0.0)
+        self.max_wait = dict.fromkeys(self.classes, 0.0)
+        # 累计放入/取出数，以及写入计数：每次修改前后各加一，为奇数时表示正在修改
+        self.added = 0
+        self.removed = 0
+        self.writes = 0
+
+    def _default_class(self, item):
+        """Prioritized 数据按其 priority 分类，其他数据归入最低优先级的类别"""
+        return getattr(item, 'priority', self.classes[-1])
+
+    def class_of(self, item):
+        name = self.classify(item)
+        if name not in self.queues:
+            raise ValueError(f"未知的服务类别 {name}，可选: {', '.join(self.classes)}")
+        return name
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """按类别优先级依次列出各类别中的数据"""
+        for queue in self.queues.values():
+            for _, item in queue:
+                yield item
+
+    def qsize(self):
+        return self.size
+
+    def empty(self):
+        return self.size == 0
+
+    def append(self, item):
+        self.writes += 1
+        self.queues[self.class_of(item)].append((time.monotonic(), item))
+        self.size += 1
+        self.added += 1
+        self.writes += 1
+
+    def extend(self, items):
+        now = time.monotonic()
+        self.writes += 1
+        for item in items:
+            self.queues[self.class_of(item)].append((now, item))
+        self.size += len(items)
+        self.added += len(items)
+        self.writes += 1
+
+    def _choose(self, active, current):
+        if self.policy == 'strict':
+            return active[0]
+        for name in active:
+            current[name] += self.weights[name]
+        choice = max(active, key=current.__getitem__)
+        current[choice] -= sum(self.weights[name] for name in active)
+        return choice
+
+    def _next_class(self):
+        return self._choose([name for name, queue in self.queues.items() if queue], self.current)
+
+    def popleft(self):
+        if self.size == 0:
+            raise IndexError("pop from an empty PriorityStorage")
+        name = self._next_class()
+        self.writes += 1
+        enqueued, item = self.queues[name].popleft()
+        self.size -= 1
+        self.removed += 1
+        self.writes += 1
+        wait = time.monotonic() - enqueued
+        self.served[name] += 1
+        self.total_wait[name] += wait
+        if wait > self.max_wait[name]:
+            self.max_wait[name] = wait
+        return item
+
+    def popmany(self, n):
+        popleft = self.popleft
+        return [popleft() for _ in range(min(n, self.size))]
+
+    def peekmany(self, n):
+        """按 popmany 的出队顺序列出接下来的 n 个数据，不出队、不改变轮询状态"""
+        current = dict(self.current)
+        taken = dict.fromkeys(self.classes, 0)
+        items = []
+        for _ in range(min(n, self.size)):
+            name = self._choose([name for name, queue in self.queues.items() if len(queue) > taken[name]], current)
+            items.append(self.queues[name][taken[name]][1])
+            taken[name] += 1
+        return items
+
+    def snapshot(self):
+        """
+        不加锁地复制当前内容，返回 ((累计放入数, 累计取出数), 数据列表)。
+        复制期间有写者修改时返回 None，由调用方重试。
+        """
+        writes = self.writes
+        if writes % 2:
+            return None
+        try:
+            items = list(self)
+        except RuntimeError:
+            # deque 在遍历期间被修改
+            return None
+        version = (self.added, self.removed)
+        if self.writes != writes:
+            return None
+        return version, items
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class PriorityBuffer(Buffer):
+    """
+    按服务类别出队的缓冲区，put/get/resize 等接口与 Buffer 相同。
+    classes 按优先级从高到低列出类别名，数据的类别由 classify(item) 决定（默认读取 Prioritized.priority）；
+    policy 为 'strict'（严格优先）或 'weighted'（按 weights 加权公平）。
+    class_capacity 可以限制部分类别的最大占用，某个类别满时只有该类别的数据需要等待：
+    put_many 先放入其他类别的数据，转移时按源中接下来每个数据的类别计算能接受的个数。
+    观察者的增量快照假设先进先出，这里的出队顺序与放入顺序不同，因此 snapshot_since 总是返回完整快照；
+    快照不加锁地从存储复制，内容没有变化时直接返回缓存的快照。
+    """
+    def __init__(self, size=10, id=0, classes=('urgent', 'bulk'), policy='strict', weights=None,
+                 class_capacity=None, classify=None, history=1024):
+        super().__init__(size, id, history=history)
+        self.data = PriorityStorage(classes, policy, weights, classify)
+        self.class_capacity = dict(class_capacity or {})
+        unknown = set(self.class_capacity) - set(self.data.classes)
+        if unknown:
+            raise ValueError(f"class_capacity 中有未知的服务类别: {sorted(unknown)}")
+        self._snapshot = None
+
+    def _class_free(self, name):
+        limit = self.class_capacity.get(name)
+        return float('inf') if limit is None else limit - len(self.data.queues[name])
+
+    def _fits(self, name):
+        return len(self.data) < self.capacity and self._class_free(name) > 0
+
+    def _split(self, items):
+        """
+        把 items 分为现在能放入的和需要等待的：总数不超过空位，每个数据不超过其类别的空位。
+        同一类别中被挡住的数据之后的同类数据也需要等待，各类别内保持原有顺序。调用方需持有锁。
+        """
+        free = self._free()
+        room = {name: self._class_free(name) for name in self.class_capacity}
+        fits, rest = [], []
+        for item in items:
+            name = self.data.class_of(item)
+            if len(fits) < free and room.get(name, 1) > 0:
+                if name in room:
+                    room[name] -= 1
+                fits.append(item)
+            else:
+                rest.append(item)
+        return fits, rest
+
+    def _peek(self, n):
+        return self.data.peekmany(n)
+
+    def _room(self, source, n):
+        """源中接下来的数据按顺序能放入的个数，遇到所属类别已满的数据为止"""
+        n = min(n, self._free())
+        if not self.class_capacity or n == 0:
+            return n
+        # 源按顺序出队，只能放入第一个被挡住的数据之前的部分
+        room = {name: self._class_free(name) for name in self.class_capacity}
+        count = 0
+        for item in source._peek(n):
+            name = self.data.class_of(item)
+            if name in room:
+                if room[name] <= 0:
+                    break
+                room[name] -= 1
+            count += 1
+        return count
+
+    def _wait_writable(self, timeout, item=None):
+        """等待直到 item 所属的类别（item 为 None 时为整个缓冲区）有空位或缓冲区关闭"""
+        if item is None:
+            return super()._wait_writable(timeout)
+        name = self.data.class_of(item)
+        with self.lock:
+            return self._wait(self.not_full, lambda: self._fits(name), timeout)
+
+    def _notify_space(self, n):
+        # 等待的生产者可能属于不同类别，只唤醒 n 个可能都不是空出位置的类别
+        if not self.put_waiting:
+            return
+        if self.class_capacity:
+            self.not_full.notify_all()
+        else:
+            self.not_full.notify(n)
+
+    def put(self, data, timeout=None):
+        """放入数据，只在数据所属的类别或整个缓冲区已满时等待，语义同 Buffer.put"""
+        name = self.data.class_of(data)
+        with self.not_full:
+            if not self._wait(self.not_full, lambda: self._fits(name), timeout):
+                logger.debug("PriorityBuffer %s class %s is full, put timed out.", self.id, name)
+                return None
+            if self.closed:
+                raise BufferClosed(f"Buffer {self.id} is closed")
+            self._extend([data])
+            return data
+
+    def put_many(self, items):
+        """
+        批量放入数据，语义同 Buffer.put_many。某个类别满时先放入其他类别的数据，
+        只为被挡住的数据等待该类别的空位。返回放入的元素个数。
+        """
+        pending = list(items)
+        count = 0
+        with self.not_full:
+            while True:
+                if self.closed:
+                    raise BufferClosed(f"Buffer {self.id} is closed")
+                fits, pending = self._split(pending)
+                if fits:
+                    self._extend(fits)
+                    count += len(fits)
+                if not pending:
+                    break
+                name = self.data.class_of(pending[0])
+                self._wait(self.not_full, lambda: self._fits(name), None)
+            logger.debug("PriorityBuffer %s put %d items, current size: %d", self.id, count, len(self.data))
+        return count
+
+    def class_stats(self):
+        """各类别的当前占用、容量上限、累计出队数，以及平均和最大等待时间（秒）"""
+        with self.lock:
+            storage = self.data
+            return {
+                name: {
+                    'depth': len(storage.queues[name]),
+                    'capacity': self.class_capacity.get(name, self.capacity),
+                    'served': storage.served[name],
+                    'mean_wait': storage.total_wait[name] / storage.served[name] if storage.served[name] else 0.0,
+                    'max_wait': storage.max_wait[name],
+                }
+                for name in storage.classes
+            }
+
+    def snapshot_since(self, version=None, retries=8):
+        """
+        返回完整快照，不获取锁。存储的版本没有变化时返回缓存的快照；
+        连续 retries 次复制都与写者冲突时，返回只有占用量的快照（appended 为 None）。
+        """
+        storage = self.data
+        cached = self._snapshot
+        if cached is None or cached.version != (storage.added, storage.removed):
+            for _ in range(retries):
+                copy = storage.snapshot()
+                if copy is not None:
+                    break
+            else:
+                return BufferChange((storage.added, storage.removed), None, None, len(storage), self.capacity, True)
+            current, items = copy
+            cached = self._snapshot = BufferChange(current, items, None, len(items), self.capacity, True)
+        if cached.capacity != self.capacity:
+            cached = self._snapshot = cached._replace(capacity=self.capacity)
+        return cached
+
+    def __str__(self):
+        with self.lock:
+            return f"PriorityBuffer{self.id} {list(self.data)}"
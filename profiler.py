@@ -0,0 +1,168 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 记录的事件类型：等锁、在满缓冲区上等空位、在空缓冲区上等数据、被唤醒后条件仍不满足
+LOCK = 'lock'
+WAIT_FULL = 'wait_full'
+WAIT_EMPTY = 'wait_empty'
+SPURIOUS = 'spurious_wakeup'
+
+
+class _TimedLock:
+    """包装缓冲区的锁：立即拿到时不计时，需要等待时记录等锁的时间"""
+    def __init__(self, lock, record):
+        self._lock = lock
+        self._record = record
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        self._record(LOCK, time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _WakeCondition(threading.Condition):
+    """记录每个线程最近一次 wait 是被通知唤醒（True）还是超时（False），检查条件后清除"""
+    def __init__(self, lock):
+        super().__init__(lock)
+        self.woken = threading.local()
+
+    def wait(self, timeout=None):
+        notified = super().wait(timeout)
+        self.woken.notified = notified
+        return notified
+
+
+class ContentionProfiler:
+    """
+    可选的锁竞争分析器。attach() 把缓冲区的锁和条件变量换成计时的包装，并包装 _wait，
+    按（缓冲区，线程，事件类型）记录次数、总时间和最长时间；没有 attach 的缓冲区不受任何影响。
+    attach / detach 需要在缓冲区空闲（没有线程在等待）时调用，例如 Supervisor 启动前或停止后。
+    """
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._originals = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.detach()
+
+    def _recorder(self, buffer_id):
+        def record(kind, elapsed, count=1):
+            key = (buffer_id, threading.current_thread().name, kind)
+            with self._lock:
+                entry = self.stats.setdefault(key, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+        return record
+
+    def attach(self, *buffers):
+        for buffer in buffers:
+            if id(buffer) in self._originals:
+                continue
+            record = self._recorder(buffer.id)
+            original = (buffer.lock, buffer.not_full, buffer.not_empty, buffer.transfer_lock)
+            timed = _TimedLock(buffer.lock, record)
+            not_full, not_empty = _WakeCondition(timed), _WakeCondition(timed)
+            if buffer.transfer_lock is buffer.lock:
+                buffer.transfer_lock = timed
+            buffer.lock, buffer.not_full, buffer.not_empty = timed, not_full, not_empty
+            buffer._wait = self._timed_wait(buffer, buffer._wait, record)
+            self._originals[id(buffer)] = (buffer, original)
+
+    def detach(self):
+        """恢复所有缓冲区原来的锁和条件变量，已记录的数据保留"""
+        for buffer, original in self._originals.values():
+            buffer.lock, buffer.not_full, buffer.not_empty, buffer.transfer_lock = original
+            del buffer._wait
+        self._originals.clear()
+
+    def _timed_wait(self, buffer, wait, record):
+        def timed_wait(condition, ready, timeout, *args):
+            woken = condition.woken
+            woken.notified = None
+            waited = False
+            spurious = 0
+
+            def checked():
+                # 只统计 wait 返回之后的检查：被通知唤醒却没有等到条件、缓冲区也没有关闭才是伪唤醒，
+                # 进入等待前的检查和超时后的检查都不算
+                nonlocal waited, spurious
+                result = ready()
+                notified = woken.notified
+                if notified is not None:
+                    waited = True
+                    woken.notified = None
+                    spurious += notified and not result and not buffer.closed
+                return result
+
+            start = time.perf_counter()
+            result = wait(condition, checked, timeout, *args)
+            # 没有真正阻塞过的调用（条件一开始就满足或 timeout=0）不计入
+            if waited:
+                record(WAIT_FULL if condition is buffer.not_full else WAIT_EMPTY, time.perf_counter() - start)
+                if spurious:
+                    record(SPURIOUS, 0.0, spurious)
+            return result
+        return timed_wait
+
+    def records(self):
+        """按总时间从大到小排列的记录：buffer、thread、kind、count、total、max"""
+        with self._lock:
+            items = list(self.stats.items())
+        rows = [
+            {'buffer': buffer_id, 'thread': thread, 'kind': kind, 'count': count, 'total': total, 'max': peak}
+            for (buffer_id, thread, kind), (count, total, peak) in items
+        ]
+        rows.sort(key=lambda row: (row['total'], row['count']), reverse=True)
+        return rows
+
+    def report(self, limit=None):
+        """按总时间排序的文本报告"""
+        rows = self.records()[:limit]
+        lines = [f"{'buffer':>6}  {'thread':<20} {'kind':<16} {'count':>8} {'total(ms)':>10} {'max(ms)':>9}"]
+        for row in rows:
+            lines.append(f"{row['buffer']!s:>6}  {row['thread']:<20} {row['kind']:<16} {row['count']:>8} "
+                         f"{row['total'] * 1000:>10.3f} {row['max'] * 1000:>9.3f}")
+        return '\n'.join(lines)
+
+    def folded(self):
+        """
+        折叠栈格式（flamegraph.pl、speedscope 等可直接读取）：线程;缓冲区;事件类型 微秒数。
+        伪唤醒没有耗时，按次数输出。
+        """
+        lines = []
+        for row in self.records():
+            value = row['count'] if row['kind'] == SPURIOUS else round(row['total'] * 1e6)
+            if value:
+                lines.append(f"{row['thread']};Buffer {row['buffer']};{row['kind']} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_folded(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.folded())
+        logger.info(f"锁竞争折叠栈已写入 {path}")
@@ -0,0 +1,241 @@
+import math
+import queue
+import threading
+import time
+import logging
+
+from buffer import BufferClosed
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    分层时间轮。第 0 层每个槽位对应一个 tick，第 L 层每个槽位对应 slots**L 个 tick；
+    到期时间较远的定时器先放在高层，时间推进到该槽位时再逐层下放，
+    插入和每个 tick 的推进都是 O(1)，与定时器数量无关。
+    不是线程安全的，由调用方加锁。
+    """
+    def __init__(self, tick=0.001, slots=256, levels=4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.origin = time.monotonic()
+        self.current = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, deadline, item):
+        """在单调时钟 deadline 时刻到期；已经过期的定时器在下一个 tick 到期"""
+        expires = max(math.ceil((deadline - self.origin) / self.tick), self.current + 1)
+        self._place(expires, item)
+        self.count += 1
+
+    def _place(self, expires, item):
+        delta = expires - self.current
+        for level in range(self.levels):
+            if delta < self.slots ** (level + 1):
+                break
+        # 超出最高层范围的定时器先放在最高层最远的槽位，下放时再重新计算
+        slot_tick = min(expires, self.current + self.slots ** self.levels - 1)
+        index = (slot_tick // self.slots ** level) % self.slots
+        self.wheels[level][index].append((expires, item))
+
+    def advance(self, now):
+        """推进到单调时钟 now，返回这段时间内到期的定时器"""
+        target = int((now - self.origin) / self.tick)
+        due = []
+        while self.current < target:
+            self.current += 1
+            # 先从高层往低层下放，刚好到期的定时器会落到第 0 层当前槽位
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self.current % span:
+                    continue
+                index = (self.current // span) % self.slots
+                bucket, self.wheels[level][index] = self.wheels[level][index], []
+                for expires, item in bucket:
+                    self._place(expires, item)
+            index = self.current % self.slots
+            bucket, self.wheels[0][index] = self.wheels[0][index], []
+            for expires, item in bucket:
+                if expires <= self.current:
+                    due.append(item)
+                else:
+                    self._place(expires, item)
+        self.count -= len(due)
+        return due
+
+
+class Task:
+    """
+    由 Executor 周期执行的非阻塞操作。
+    action 不能阻塞：完成一次操作返回结果，缓冲区满/空无法操作时返回 None；
+    节拍由 pacer 控制，只有操作完成才消耗令牌；一次处理多个数据的任务用 cost(result) 给出消耗的令牌数。
+    action 抛出 BufferClosed 时任务结束。
+    """
+    def __init__(self, name, action, pacer, on_result=None, retry=0.01, cost=None,
+                 backoff=0.1, max_backoff=5.0):
+        self.name = name
+        self.action = action
+        self.pacer = pacer
+        self.on_result = on_result
+        # 无法操作时的重试间隔
+        self.retry = retry
+        self.cost = cost
+        # 出错后按指数退避重新执行：第 k 次连续失败后等待 backoff * 2**(k-1) 秒，最多 max_backoff 秒
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.finished = False
+
+    def cancel(self):
+        self.finished = True
+
+    def next_backoff(self):
+        self.failures += 1
+        return min(self.backoff * 2 ** (self.failures - 1), self.max_backoff)
+
+
+class Executor:
+    """
+    用固定数量的线程执行任意多个周期任务：一个计时线程推进时间轮，把到期的任务交给 workers 个工作线程。
+    线程数与生产者/消费者角色的数量无关。
+    任务每次被执行时，只要节拍器还有令牌就连续执行，最多 max_runs 次，速率不受 tick 的限制。
+    """
+    def __init__(self, workers=2, tick=0.001, max_runs=64):
+        self.workers = workers
+        self.max_runs = max_runs
+        self.wheel = TimerWheel(tick)
+        self.lock = threading.Lock()
+        self.ready = queue.SimpleQueue()
+        self.stop_event = threading.Event()
+        self.tasks = []
+        self.threads = []
+        # 任务出错后被重新排程的次数，以及退出后被重新拉起的工作线程数
+        self.restarts = 0
+        self.revived = 0
+
+    def submit(self, task, delay=0.0):
+        """加入任务，delay 秒后第一次执行"""
+        self.tasks.append(task)
+        self._schedule(task, delay)
+        return task
+
+    def _schedule(self, task, delay):
+        with self.lock:
+            self.wheel.schedule(time.monotonic() + delay, task)
+
+    def start(self):
+        self.stop_event.clear()
+        timer = threading.Thread(target=self._timer_loop, name="Executor-Timer", daemon=True)
+        self.threads = [timer] + [self._worker_thread(i) for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+        logger.info(f"Executor started with {self.workers} workers")
+
+    def _worker_thread(self, index):
+        return threading.Thread(target=self._worker_loop, name=f"Executor-Worker-{index}", daemon=True)
+
+    def revive(self):
+        """重新拉起意外退出的工作线程，返回拉起的线程数"""
+        if self.stop_event.is_set():
+            return 0
+        count = 0
+        for index, thread in enumerate(self.threads[1:], start=1):
+            if not thread.is_alive():
+                self.threads[index] = self._worker_thread(index - 1)
+                self.threads[index].start()
+                count += 1
+        if count:
+            self.revived += count
+            logger.warning(f"Executor revived {count} worker threads")
+        return count
+
+    def _timer_loop(self):
+        while not self.stop_event.wait(self.wheel.tick):
+            with self.lock:
+                due = self.wheel.advance(time.monotonic())
+            for task in due:
+                self.ready.put(task)
+
+    def _worker_loop(self):
+        while True:
+            task = self.ready.get()
+            if task is None:
+                break
+            try:
+                self._run(task)
+            except Exception as e:
+                # on_result 等回调出错时不让工作线程退出，任务退避后重新执行
+                logger.error(f"Task {task.name} 回调失败: {e}", exc_info=True)
+                self._retry_later(task)
+
+    def _run(self, task):
+        # 令牌足够时连续执行，一个 tick 内不只执行一次；每次最多执行 max_runs 次，把工作线程让给其他任务
+        for _ in range(self.max_runs):
+            if task.finished:
+                return
+            # 还没有令牌时按节拍器给出的等待时间重新排程
+            wait = task.pacer.delay()
+            if wait > 0:
+                self._schedule(task, wait)
+                return
+            try:
+                result = task.action()
+            except BufferClosed:
+                task.finished = True
+                logger.info(f"Task {task.name} finished: buffer closed")
+                return
+            except Exception as e:
+                logger.error(f"Task {task.name} 执行失败: {e}", exc_info=True)
+                self._retry_later(task)
+                return
+            task.failures = 0
+            if result is None:
+                self._schedule(task, task.retry)
+                return
+            task.pacer.consume(task.cost(result) if task.cost else 1)
+            if task.on_result:
+                task.on_result(result)
+        self._schedule(task, task.pacer.delay())
+
+    def _retry_later(self, task):
+        delay = task.next_backoff()
+        self.restarts += 1
+        logger.info(f"Task {task.name} 第 {task.failures} 次连续失败，{delay:.2f} 秒后重试")
+        self._schedule(task, delay)
+
+    def shutdown(self, timeout=None):
+        """停止计时线程和工作线程，在 timeout 秒内等待它们退出，返回仍存活的线程"""
+        self.stop_event.set()
+        for task in self.tasks:
+            task.cancel()
+        for _ in range(self.workers):
+            self.ready.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        alive = [t for t in self.threads if t.is_alive()]
+        logger.info("Executor stopped")
+        return alive
+
+    @property
+    def thread_count(self):
+        return sum(t.is_alive() for t in self.threads)
+
+
+def producer_task(producer, on_result=None):
+    """把生产者的放入操作包装成周期任务"""
+    return Task(f"put-B{producer.buffer.id}", producer.try_put, producer.put_pacer, on_result)
+
+
+def consumer_tasks(consumer, source_buffer, on_move=None, on_get=None):
+    """把消费者的移动和获取操作包装成两个周期任务，返回 (move_task, get_task)"""
+    move_task = Task(f"move-B{source_buffer.id}-B{consumer.buffer.id}",
+                     lambda: consumer.try_move(source_buffer), consumer.move_pacer, on_move)
+    get_task = Task(f"get-B{consumer.buffer.id}", consumer.try_get, consumer.get_pacer, on_get)
+    return move_task, get_task
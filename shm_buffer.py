@@ -0,0 +1,298 @@
+import multiprocessing
+import struct
+import time
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+from buffer import BufferClosed, transfer
+
+logger = logging.getLogger(__name__)
+
+# 共享内存头部：head, tail, capacity, slots, closed 五个 int64
+_HEADER = struct.Struct('5q')
+# 每个槽位：类型（0 为 str，1 为 bytes）、长度，后面跟 item_size 字节的内容
+_SLOT_HEADER = struct.Struct('BH')
+_STR, _BYTES = 0, 1
+
+# 按共享内存名字登记的进程间同步原语，供同一进程内 attach(name) 使用
+_primitives = {}
+
+
+class SharedStorageView:
+    """共享缓冲区的只读占用量视图，提供与 Buffer.data 相同的 qsize()/empty()"""
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __len__(self):
+        head, tail = self.buffer._indices()
+        return tail - head
+
+    def qsize(self):
+        return len(self)
+
+    def empty(self):
+        return len(self) == 0
+
+
+class SharedBuffer:
+    """
+    跨进程共享内存缓冲区。
+    数据环和 head/tail 索引都存放在 multiprocessing.shared_memory 中，
+    用进程间共享的 Lock/Condition 同步，接口与 Buffer 相同，生产者和消费者可以运行在不同进程、不同核心上。
+
+    在其他进程中使用有两种方式：把 SharedBuffer 对象作为 multiprocessing.Process 的参数传入
+    （同步原语随之传递），或在 fork 出的子进程中用 SharedBuffer.attach(name) 按名字连接。
+    元素可以是 str（按 UTF-8 编码）或 bytes，编码后不超过 item_size 字节。
+    """
+    def __init__(self, size=10, id=0, max_size=None, item_size=4, name=None, ctx=None):
+        self.id = id
+        self.item_size = item_size
+        self.slot_size = _SLOT_HEADER.size + item_size
+        slots = max(size, max_size or 1024)
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=_HEADER.size + slots * self.slot_size)
+        self.name = self.shm.name
+        self.owner = True
+        _HEADER.pack_into(self.shm.buf, 0, 0, 0, size, slots, 0)
+
+        ctx = ctx or multiprocessing.get_context()
+        self.lock = ctx.Lock()
+        self.not_full = ctx.Condition(self.lock)
+        self.not_empty = ctx.Condition(self.lock)
+        _primitives[self.name] = (self.lock, self.not_full, self.not_empty)
+        self._init_local()
+        logger.info(f"SharedBuffer {self.id} ({self.name}) initialized with size {size}, slots {slots}")
+
+    def _init_local(self):
+        self.data = SharedStorageView(self)
+        self.wakeups = 0
+        # 共享缓冲区在所有进程中按名字排序，并排在进程内缓冲区之后，保证跨进程的加锁顺序一致
+        self.transfer_lock = self.lock
+        self.lock_order = (1, self.name)
+
+    @classmethod
+    def attach(cls, name, id=0, item_size=4):
+        """按名字连接已存在的共享缓冲区，要求本进程已经持有对应的同步原语"""
+        if name not in _primitives:
+            raise KeyError(f"SharedBuffer {name} 的同步原语不在本进程中，请通过 Process 参数传递缓冲区对象")
+        buffer = cls.__new__(cls)
+        buffer.__setstate__({'name': name, 'id': id, 'item_size': item_size,
+                             'primitives': _primitives[name]})
+        return buffer
+
+    def __getstate__(self):
+        # 共享内存按名字重新连接，同步原语只能在创建子进程时随参数传递
+        return {'name': self.name, 'id': self.id, 'item_size': self.item_size,
+                'primitives': (self.lock, self.not_full, self.not_empty)}
+
+    def __setstate__(self, state):
+        self.id = state['id']
+        self.item_size = state['item_size']
+        self.slot_size = _SLOT_HEADER.size + self.item_size
+        self.name = state['name']
+        self.shm = shared_memory.SharedMemory(name=self.name)
+        # 连接方不负责销毁共享内存，避免进程退出时被资源跟踪器提前删除
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.owner = False
+        self.lock, self.not_full, self.not_empty = state['primitives']
+        _primitives[self.name] = state['primitives']
+        self._init_local()
+
+    def _indices(self):
+        head, tail = struct.unpack_from('2q', self.shm.buf, 0)
+        return head, tail
+
+    def _header(self):
+        return _HEADER.unpack_from(self.shm.buf, 0)
+
+    @property
+    def capacity(self):
+        return self._header()[2]
+
+    @property
+    def closed(self):
+        return bool(self._header()[4])
+
+    def _set(self, field, value):
+        struct.pack_into('q', self.shm.buf, field * 8, value)
+
+    def _write_slot(self, seq, item, slots):
+        if isinstance(item, bytes):
+            kind, payload = _BYTES, item
+        else:
+            kind, payload = _STR, str(item).encode('utf-8')
+        if len(payload) > self.item_size:
+            raise ValueError(f"SharedBuffer {self.id} 元素编码后 {len(payload)} 字节，超过 item_size {self.item_size}")
+        offset = _HEADER.size + (seq % slots) * self.slot_size
+        _SLOT_HEADER.pack_into(self.shm.buf, offset, kind, len(payload))
+        start = offset + _SLOT_HEADER.size
+        self.shm.buf[start:start + len(payload)] = payload
+
+    def _read_slot(self, seq, slots):
+        offset = _HEADER.size + (seq % slots) * self.slot_size
+        kind, length = _SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        start = offset + _SLOT_HEADER.size
+        payload = bytes(self.shm.buf[start:start + length])
+        return payload if kind == _BYTES else payload.decode('utf-8')
+
+    def can_put(self):
+        head, tail, capacity, _, _ = self._header()
+        return tail - head < capacity
+
+    def can_get(self):
+        head, tail = self._indices()
+        return tail - head > 0
+
+    def _wait(self, condition, ready, timeout):
+        """调用方持有锁。等待直到 ready() 为真或缓冲区被关闭；超时返回 False"""
+        endtime = None
+        while not ready() and not self.closed:
+            if timeout is None:
+                condition.wait()
+            else:
+                if endtime is None:
+                    endtime = time.monotonic() + timeout
+                remaining = endtime - time.monotonic()
+                if remaining <= 0:
+                    return False
+                condition.wait(remaining)
+            self.wakeups += 1
+        return True
+
+    def put(self, data, timeout=None):
+        """放入数据。缓冲区满时最多等待 timeout 秒，超时返回 None；缓冲区关闭时抛出 BufferClosed"""
+        with self.lock:
+            if not self._wait(self.not_full, self.can_put, timeout):
+                return None
+            if self.closed:
+                raise BufferClosed(f"SharedBuffer {self.id} is closed")
+            self._extend([data])
+            logger.debug("SharedBuffer %s put data: %s", self.id, data)
+            return data
+
+    def get(self, timeout=None):
+        """取出数据。缓冲区空时最多等待 timeout 秒，超时返回 None；关闭且取空后抛出 BufferClosed"""
+        items = self.get_many(1, timeout)
+        return items[0] if items else None
+
+    def try_put(self, data):
+        return self.put(data, timeout=0) is not None
+
+    def try_get(self):
+        return self.get(timeout=0)
+
+    def put_many(self, items):
+        """批量放入数据，满时等待空位，返回放入的元素个数"""
+        items = list(items)
+        count = 0
+        with self.lock:
+            while count < len(items):
+                self._wait(self.not_full, self.can_put, None)
+                if self.closed:
+                    raise BufferClosed(f"SharedBuffer {self.id} is closed")
+                batch = items[count:count + self._free()]
+                self._extend(batch)
+                count += len(batch)
+        return count
+
+    def get_many(self, max_n, timeout=None):
+        """批量取出最多 max_n 个数据，空时最多等待 timeout 秒，超时返回空列表"""
+        with self.lock:
+            if not self._wait(self.not_empty, self.can_get, timeout):
+                return []
+            available = self._available()
+            if available == 0:
+                raise BufferClosed(f"SharedBuffer {self.id} is closed")
+            return self._take(min(max_n, available))
+
+    def drain_into(self, other, max_n=None):
+        """不阻塞地把数据转移到另一个缓冲区，返回转移的数据列表"""
+        return transfer(self, other, float('inf') if max_n is None else max_n, timeout=0)
+
+    def _available(self):
+        head, tail = self._indices()
+        return tail - head
+
+    def _peek(self, n):
+        """按取出的顺序列出接下来的 n 个数据但不取出，调用方需持有锁"""
+        head, tail, _, slots, _ = self._header()
+        return [self._read_slot(seq, slots) for seq in range(head, min(head + n, tail))]
+
+    def _take(self, n):
+        """取出 n 个数据并通知生产者，调用方需持有锁且已确认数据足够"""
+        head, _, _, slots, _ = self._header()
+        items = [self._read_slot(seq, slots) for seq in range(head, head + n)]
+        self._set(0, head + n)
+        self.not_full.notify(n)
+        return items
+
+    def _wait_readable(self, timeout):
+        with self.lock:
+            return self._wait(self.not_empty, self.can_get, timeout)
+
+    def _wait_writable(self, timeout, item=None):
+        with self.lock:
+            return self._wait(self.not_full, self.can_put, timeout)
+
+    def _free(self):
+        """剩余空位数，调用方需持有锁"""
+        head, tail, capacity, _, _ = self._header()
+        return max(capacity - (tail - head), 0)
+
+    def _room(self, source, n):
+        return min(n, self._free())
+
+    def _extend(self, items):
+        """追加一批数据并通知消费者，调用方需持有锁且已确认空位足够"""
+        _, tail, _, slots, _ = self._header()
+        for offset, item in enumerate(items):
+            self._write_slot(tail + offset, item, slots)
+        self._set(1, tail + len(items))
+        self.not_empty.notify(len(items))
+
+    def close(self):
+        """关闭缓冲区并唤醒所有进程中等待的生产者和消费者"""
+        with self.lock:
+            self._set(4, 1)
+            self.not_full.notify_all()
+            self.not_empty.notify_all()
+        logger.info(f"SharedBuffer {self.id} closed")
+
+    def reopen(self):
+        with self.lock:
+            self._set(4, 0)
+        logger.info(f"SharedBuffer {self.id} reopened")
+
+    def resize(self, new_size):
+        """
+        调整容量上限，不移动数据。缩小时不丢弃数据，取到新容量以下后才恢复接收。
+        共享内存的槽位数在创建时固定，不能超过 slots。
+        """
+        with self.lock:
+            slots = self._header()[3]
+            if not isinstance(new_size, int) or new_size <= 0 or new_size > slots:
+                logger.warning(f"SharedBuffer {self.id} resize: 无效的大小 {new_size}。必须是不超过 {slots} 的正整数。")
+                return False
+            self._set(2, new_size)
+            free = self._free()
+            if free:
+                self.not_full.notify(free)
+            logger.info(f"SharedBuffer {self.id} 已调整大小为 {new_size}。")
+            return True
+
+    def release(self):
+        """关闭本进程对共享内存的映射"""
+        self.data = None
+        self.shm.close()
+
+    def unlink(self):
+        """释放映射并销毁共享内存，只应由创建者在所有进程用完后调用"""
+        self.release()
+        if self.owner:
+            self.shm.unlink()
+            _primitives.pop(self.name, None)
+
+    def __str__(self):
+        with self.lock:
+            head, tail, _, slots, _ = self._header()
+            return f"Buffer{self.id} {[self._read_slot(seq, slots) for seq in range(head, tail)]}"
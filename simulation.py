@@ -0,0 +1,206 @@
+import heapq
+import itertools
+import random
+import logging
+from collections import defaultdict
+
+from payload import SequenceRecords
+from topology import Topology, DEFAULT_TOPOLOGY, load_config
+from buffer import transfer
+
+logger = logging.getLogger(__name__)
+
+ARRIVALS = ('deterministic', 'exponential')
+
+
+class _Actor:
+    """仿真中的一个角色工作者：按间隔尝试一次操作，被满/空缓冲区挡住时挂起，直到相关缓冲区变化"""
+    def __init__(self, name, rate, step, reads=(), writes=()):
+        self.name = name
+        self.rate = rate
+        self.step = step
+        self.buffers = list(reads) + list(writes)
+        self.completed = 0
+        self.blocked = 0.0
+        self.blocked_since = None
+        self.waiting = False
+
+
+class Simulation:
+    """
+    离散事件仿真：在虚拟时钟上运行拓扑配置中的同一套缓冲区和角色，不休眠、不创建线程。
+    每个角色工作者按速率安排下一次操作，arrivals 为 'deterministic' 时间隔固定为 1/rate，
+    为 'exponential' 时按指数分布抽取（泊松到达），随机数只来自以 seed 初始化的生成器，结果可复现。
+    被满/空缓冲区挡住的角色挂起，缓冲区一变化就在同一虚拟时刻重试，挂起的时间计为阻塞时间。
+    缓冲区与分发策略复用 Topology 的构建结果；生产者统一使用 SequenceRecords 数据，不模拟自动扩缩容和背压。
+    """
+    def __init__(self, config, seed=0, arrivals='deterministic', sample_interval=1.0):
+        if arrivals not in ARRIVALS:
+            raise ValueError(f"未知的到达分布 {arrivals}，可选: {', '.join(ARRIVALS)}")
+        self.topology = Topology(config)
+        self.arrivals = arrivals
+        self.sample_interval = sample_interval
+        self.rng = random.Random(seed)
+        self.now = 0.0
+        self.events = []
+        self._seq = itertools.count()
+        self.waiters = defaultdict(list)
+        self.samples = []
+        self.max_occupancy = {buffer_id: 0 for buffer_id in self.topology.buffers}
+        self.actors = self._build_actors()
+
+    @classmethod
+    def load(cls, path=DEFAULT_TOPOLOGY, **options):
+        return cls(load_config(path), **options)
+
+    def _build_actors(self):
+        topology, buffers = self.topology, self.topology.buffers
+        rates = topology.live.current.values
+        actors = []
+        for spec in topology.producer_specs:
+            actors.append(self._producer(spec['name'], rates[spec['name']], buffers[spec['buffer']]))
+        for spec in topology.mover_specs:
+            for _ in range(spec.get('workers', 1)):
+                actors.append(self._mover(spec['name'], rates[spec['name']],
+                                          buffers[spec['from']], buffers[spec['to']]))
+        for spec in topology.sink_specs:
+            for _ in range(spec.get('workers', 1)):
+                actors.append(self._sink(spec['name'], rates[spec['name']], buffers[spec['buffer']]))
+        for spec in topology.dispatcher_specs:
+            actors.append(self._dispatcher(spec['name'], rates[spec['name']], buffers[spec['from']],
+                                           [buffers[i] for i in spec['to']], topology._make_policy(spec, rates)))
+        return actors
+
+    def _producer(self, name, rate, buffer):
+        payload = SequenceRecords(prefix=f"{name}-")
+        pending = []
+
+        def step():
+            data = pending.pop() if pending else payload.next()
+            if not buffer.try_put(data):
+                pending.append(data)
+                return [(buffer, 'writable')]
+        return _Actor(name, rate, step, writes=[buffer])
+
+    def _mover(self, name, rate, source, target):
+        def step():
+            if source._available() == 0:
+                return [(source, 'readable')]
+            if not transfer(source, target, 1, timeout=0):
+                return [(target, 'writable')]
+        return _Actor(name, rate, step, reads=[source], writes=[target])
+
+    def _sink(self, name, rate, buffer):
+        def step():
+            if buffer.try_get() is None:
+                return [(buffer, 'readable')]
+        return _Actor(name, rate, step, reads=[buffer])
+
+    def _dispatcher(self, name, rate, source, branches, policy):
+        pending = []
+
+        def step():
+            if not pending:
+                item = source.try_get()
+                if item is None:
+                    return [(source, 'readable')]
+                pending.append(item)
+            index = policy.choose(pending[0], branches)
+            if index is None:
+                return [(branch, 'writable') for branch in branches]
+            if not branches[index].try_put(pending[0]):
+                return [(branches[index], 'writable')]
+            pending.pop()
+            policy.routed(index)
+        return _Actor(name, rate, step, reads=[source], writes=branches)
+
+    def _interval(self, rate):
+        if self.arrivals == 'exponential':
+            return self.rng.expovariate(rate)
+        return 1 / rate
+
+    def _schedule(self, time, action):
+        heapq.heappush(self.events, (time, next(self._seq), action))
+
+    def _attempt(self, actor):
+        before = [buffer._available() for buffer in actor.buffers]
+        blocked = actor.step()
+        for buffer, size in zip(actor.buffers, before):
+            after = buffer._available()
+            if after > size:
+                self._wake(buffer, 'readable')
+                self.max_occupancy[buffer.id] = max(self.max_occupancy[buffer.id], after)
+            elif after < size:
+                self._wake(buffer, 'writable')
+        if blocked is None:
+            actor.completed += 1
+            if actor.blocked_since is not None:
+                actor.blocked += self.now - actor.blocked_since
+                actor.blocked_since = None
+            self._schedule(self.now + self._interval(actor.rate), lambda: self._attempt(actor))
+            return
+        if actor.blocked_since is None:
+            actor.blocked_since = self.now
+        actor.waiting = True
+        for buffer, kind in blocked:
+            self.waiters[(buffer.id, kind)].append(actor)
+
+    def _wake(self, buffer, kind):
+        for actor in self.waiters.pop((buffer.id, kind), []):
+            # 同时挂在多个缓冲区上的角色只唤醒一次
+            if actor.waiting:
+                actor.waiting = False
+                self._schedule(self.now, lambda actor=actor: self._attempt(actor))
+
+    def _sample(self):
+        self.samples.append((self.now, {buffer_id: buffer._available()
+                                        for buffer_id, buffer in self.topology.buffers.items()}))
+        self._schedule(self.now + self.sample_interval, self._sample)
+
+    def run(self, duration):
+        """仿真 duration 秒（虚拟时间），返回 report()"""
+        for actor in self.actors:
+            self._schedule(self._interval(actor.rate), lambda actor=actor: self._attempt(actor))
+        self._schedule(0.0, self._sample)
+        while self.events and self.events[0][0] <= duration:
+            self.now, _, action = heapq.heappop(self.events)
+            action()
+        self.now = duration
+        return self.report()
+
+    def report(self):
+        """各缓冲区的占用随时间变化与汇总，以及各角色（同名工作者合并）的吞吐量和阻塞时间"""
+        duration = self.now
+        buffers = {}
+        for buffer_id, buffer in self.topology.buffers.items():
+            sizes = [sizes[buffer_id] for _, sizes in self.samples]
+            buffers[buffer_id] = {
+                'capacity': buffer.capacity,
+                'mean_occupancy': sum(sizes) / len(sizes) if sizes else 0.0,
+                'max_occupancy': self.max_occupancy[buffer_id],
+                'full_fraction': sum(size >= buffer.capacity for size in sizes) / len(sizes) if sizes else 0.0,
+                'samples': [(time, sizes[buffer_id]) for time, sizes in self.samples],
+            }
+        nodes = {}
+        for actor in self.actors:
+            node = nodes.setdefault(actor.name, {'workers': 0, 'completed': 0, 'blocked': 0.0})
+            node['workers'] += 1
+            node['completed'] += actor.completed
+            node['blocked'] += actor.blocked
+            if actor.blocked_since is not None:
+                node['blocked'] += duration - actor.blocked_since
+        for node in nodes.values():
+            node['throughput'] = node['completed'] / duration if duration else 0.0
+            node['blocked_fraction'] = node['blocked'] / (duration * node['workers']) if duration else 0.0
+        return {'duration': duration, 'buffers': buffers, 'nodes': nodes}
+
+
+def format_report(report):
+    lines = [f"仿真时长 {report['duration']:.0f} 秒"]
+    for buffer_id, stats in report['buffers'].items():
+        lines.append(f"缓冲区{buffer_id}: 平均占用 {stats['mean_occupancy']:.2f}/{stats['capacity']}，"
+                     f"最大 {stats['max_occupancy']}，满的时间占比 {stats['full_fraction']:.1%}")
+    for name, stats in report['nodes'].items():
+        lines.append(f"{name}: 吞吐量 {stats['throughput']:.2f}/秒，完成 {stats['completed']}，"
+                     f"阻塞 {stats['blocked']:.1f} 秒（{stats['blocked_fraction']:.1%}）")
+    return '\n'.join(lines)
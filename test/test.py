@@ -1,15 +1,52 @@
 import unittest
-from buffer import Buffer, Producer, Consumer
+import multiprocessing
+import asyncio
+from buffer import Buffer, BufferClosed, BufferView, SPSCBuffer, Producer, Consumer, transfer
+from shm_buffer import SharedBuffer
+from async_buffer import AsyncBuffer, AsyncProducer, AsyncConsumer
+from pacing import Pacer
+from payload import RandomChars, SequenceRecords, FileReplay
+from scheduler import TimerWheel, Executor, producer_task, consumer_tasks
+from autoscale import Autoscaler, ConsumerPool
+from backpressure import Backpressure, AIMDController
+from topology import Topology
+from dispatcher import Dispatcher, Weighted, LeastOccupied, KeyHash
+from lifecycle import Supervisor, RUNNING, STOPPED
+from priority_buffer import PriorityBuffer, Prioritized
+from metrics import Counter, MetricsRegistry, topology_collector
+from profiler import ContentionProfiler
+from tracing import Tracer, Envelope, LatencyHistogram
+from simulation import Simulation
+from scheduler import Task
 import time
 import random
 import string
+import threading
+import tempfile
+import os
+import sys
+import itertools
+import contextlib
+import io
+import json
+import logging
 
-class TestProducer(unittest.TestCase):
+class BufferFactory:
+    """为测试提供缓冲区实现，子类可以替换 buffer_class 以在其他实现上运行同样的用例"""
+    buffer_class = Buffer
+    
+    def make_buffer(self, size):
+        test_buffer = self.buffer_class(size=size)
+        if hasattr(test_buffer, 'unlink'):
+            self.addCleanup(test_buffer.unlink)
+        return test_buffer
+
+class TestProducer(BufferFactory, unittest.TestCase):
     def test_producer_put(self):
         """测试Producer的put方法是否能正常向Buffer中放入字符"""
         print("\n===== 测试Producer的put方法 =====")
         # 创建一个大小为5的Buffer
-        test_buffer = Buffer(size=5)
+        test_buffer = self.make_buffer(5)
         
         # 创建一个Producer，设置较高的频率以便快速测试
         producer = Producer(test_buffer, put_freq=1)
@@ -37,7 +74,7 @@ class TestProducer(unittest.TestCase):
     def test_producer_frequency(self):
         """测试Producer的put频率是否正确"""
         print("\n===== 测试Producer的put频率 =====")
-        test_buffer = Buffer(size=10)
+        test_buffer = self.make_buffer(10)
         
         # 创建一个频率为5Hz的Producer（每0.5秒执行一次）
         producer = Producer(test_buffer, put_freq=2)
@@ -61,12 +98,12 @@ class TestProducer(unittest.TestCase):
         self.assertAlmostEqual(elapsed_time, 1, delta=0.1)
         print(f"验证完成: 耗时接近1秒，实际为{elapsed_time:.3f}秒")
 
-class TestConsumer(unittest.TestCase):
+class TestConsumer(BufferFactory, unittest.TestCase):
     def test_consumer_get(self):
         """测试Consumer的get方法是否能正常从Buffer中获取字符"""
         print("\n===== 测试Consumer的get方法 =====")
         # 创建一个大小为5的Buffer
-        test_buffer = Buffer(size=5)
+        test_buffer = self.make_buffer(5)
         
         # 先向buffer中放入3个元素
         test_chars = []
@@ -103,7 +140,7 @@ class TestConsumer(unittest.TestCase):
     def test_consumer_frequency(self):
         """测试Consumer的get频率是否正确"""
         print("\n===== 测试Consumer的get频率 =====")
-        test_buffer = Buffer(size=10)
+        test_buffer = self.make_buffer(10)
         
         # 先向buffer中放入一些元素
         for i in range(3):
@@ -137,8 +174,8 @@ class TestConsumer(unittest.TestCase):
         """测试Consumer的move方法是否能正常从一个Buffer移动元素到另一个Buffer"""
         print("\n===== 测试Consumer的move方法 =====")
         # 创建两个Buffer，一个作为源，一个作为目标
-        source_buffer = Buffer(size=5)
-        dest_buffer = Buffer(size=5)
+        source_buffer = self.make_buffer(5)
+        dest_buffer = self.make_buffer(5)
         print("创建源Buffer和目标Buffer，大小均为5")
         
         # 向源Buffer中放入3个元素
@@ -184,5 +221,979 @@ class TestConsumer(unittest.TestCase):
         print("验证完成: 移动的元素与添加的元素顺序一致")
 
 
+class TestBuffer(unittest.TestCase):
+    def test_resize_wakes_blocked_producer(self):
+        """测试扩容后被阻塞的生产者能够被唤醒"""
+        test_buffer = Buffer(size=1)
+        test_buffer.put('a')
+        
+        # 缓冲区已满，生产者线程会阻塞在not_full上
+        producer = threading.Thread(target=test_buffer.put, args=('b',))
+        producer.start()
+        time.sleep(0.1)
+        self.assertTrue(producer.is_alive())
+        
+        # 扩容后生产者应该完成放入
+        self.assertTrue(test_buffer.resize(2))
+        producer.join(timeout=1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(test_buffer.get(), 'a')
+        self.assertEqual(test_buffer.get(), 'b')
+
+
+    def test_batch_operations(self):
+        """测试put_many/get_many/drain_into的批量语义"""
+        source = Buffer(size=5, id=1)
+        target = Buffer(size=2, id=2)
+        
+        self.assertEqual(source.put_many('abcd'), 4)
+        self.assertEqual(source.get_many(1), ['a'])
+        
+        # 目标只有两个空位，只能转移两个数据
+        self.assertEqual(source.drain_into(target, max_n=10), ['b', 'c'])
+        self.assertEqual(target.get_many(10), ['b', 'c'])
+        self.assertEqual(source.get_many(10), ['d'])
+        
+        # 空缓冲区超时返回空列表
+        self.assertEqual(source.get_many(3, timeout=0.05), [])
+
+    def test_timeouts_and_try_operations(self):
+        """测试超时和非阻塞的put/get"""
+        test_buffer = Buffer(size=1)
+        self.assertIsNone(test_buffer.try_get())
+        self.assertIsNone(test_buffer.get(timeout=0.05))
+        
+        self.assertTrue(test_buffer.try_put('a'))
+        self.assertFalse(test_buffer.try_put('b'))
+        self.assertIsNone(test_buffer.put('b', timeout=0.05))
+        self.assertEqual(test_buffer.try_get(), 'a')
+    
+    def test_close_wakes_waiters(self):
+        """测试close()唤醒所有阻塞的线程，并在取完剩余数据后拒绝get"""
+        for buffer_class in (Buffer, SPSCBuffer):
+            test_buffer = buffer_class(size=1)
+            errors = []
+            
+            def blocked_get():
+                try:
+                    test_buffer.get()
+                except BufferClosed:
+                    errors.append('get')
+            
+            consumer = threading.Thread(target=blocked_get)
+            consumer.start()
+            time.sleep(0.05)
+            test_buffer.close()
+            consumer.join(timeout=1)
+            self.assertFalse(consumer.is_alive())
+            self.assertEqual(errors, ['get'])
+            self.assertRaises(BufferClosed, test_buffer.put, 'a')
+            
+            # 重新打开后恢复正常，关闭后仍能取出剩余数据
+            test_buffer.reopen()
+            test_buffer.put('a')
+            test_buffer.close()
+            self.assertEqual(test_buffer.get(), 'a')
+            self.assertRaises(BufferClosed, test_buffer.get)
+
+    def test_char_storage_fifo(self):
+        """测试字节环存储在回绕和调整大小后仍保持FIFO顺序"""
+        test_buffer = Buffer(size=4, storage='char')
+        test_buffer.put_many('abc')
+        self.assertEqual(test_buffer.get(), 'a')
+        test_buffer.put_many('de')  # 写入回绕到数组开头
+        self.assertEqual(test_buffer.data.qsize(), 4)
+        self.assertFalse(test_buffer.can_put())
+        
+        self.assertTrue(test_buffer.resize(6))
+        test_buffer.put('f')
+        self.assertEqual(test_buffer.get_many(10), ['b', 'c', 'd', 'e', 'f'])
+        self.assertTrue(test_buffer.data.empty())
+
+    def test_shrink_is_lossless(self):
+        """测试缩小容量不丢弃数据，缓冲区取到新容量以下后才恢复接收"""
+        for storage in ('deque', 'char'):
+            test_buffer = Buffer(size=4, storage=storage)
+            test_buffer.put_many('abcd')
+            
+            self.assertTrue(test_buffer.resize(2))
+            self.assertFalse(test_buffer.try_put('e'))
+            self.assertEqual(test_buffer.get(), 'a')
+            self.assertFalse(test_buffer.try_put('e'))
+            self.assertEqual(test_buffer.get_many(2), ['b', 'c'])
+            self.assertTrue(test_buffer.try_put('e'))
+            self.assertEqual(test_buffer.get_many(10), ['d', 'e'])
+
+    def test_snapshot_since_deltas(self):
+        """测试snapshot_since返回的增量能让观察者镜像与缓冲区内容保持一致"""
+        for test_buffer in (Buffer(size=8, history=4), SPSCBuffer(size=4)):
+            view = BufferView(test_buffer)
+            self.assertTrue(view.refresh())
+            self.assertEqual(list(view.items), [])
+            
+            test_buffer.put_many('abc')
+            test_buffer.get()
+            change = test_buffer.snapshot_since(view.version)
+            # 已经被取走的 'a' 不会出现在 appended 中
+            self.assertEqual((change.appended, change.removed), (['b', 'c'], 1))
+            self.assertTrue(view.refresh())
+            self.assertEqual(list(view.items), ['b', 'c'])
+            self.assertFalse(view.refresh())
+            
+            # 只有仍在缓冲区中的数据才需要传给观察者，落后很多也能按增量恢复
+            for char in 'defgh':
+                test_buffer.get()
+                test_buffer.put(char)
+            view.refresh()
+            self.assertEqual(list(view.items), ['g', 'h'])
+            self.assertEqual(view.size, 2)
+        
+        # 仍在缓冲区中的新数据超过日志长度时，只能提供占用量
+        test_buffer = Buffer(size=8, history=4)
+        view = BufferView(test_buffer)
+        view.refresh()
+        test_buffer.put_many('abcdef')
+        change = test_buffer.snapshot_since(view.version)
+        self.assertTrue(change.reset)
+        self.assertIsNone(change.appended)
+        view.refresh()
+        self.assertIsNone(view.items)
+        self.assertEqual(view.size, 6)
+        
+        # 取到日志长度以内后重新同步
+        test_buffer.get_many(3)
+        view.refresh()
+        self.assertEqual(list(view.items), ['d', 'e', 'f'])
+
+
+class TestPacer(unittest.TestCase):
+    def test_work_time_does_not_drift(self):
+        """测试操作本身的耗时不会叠加到节拍上"""
+        producer = Producer(Buffer(size=20), put_freq=10)
+        start_time = time.monotonic()
+        for _ in range(10):
+            producer.put()
+            time.sleep(0.05)  # 模拟每次操作耗时半个周期
+        elapsed_time = time.monotonic() - start_time
+        # 逐次休眠一个周期需要 1.5 秒，按截止时间排程仍约为 1 秒
+        self.assertAlmostEqual(elapsed_time, 1.05, delta=0.1)
+        stats = producer.stats()['put']
+        self.assertEqual(stats['completed'], 10)
+        self.assertEqual(stats['target'], 10)
+
+    def test_burst_catch_up_and_sub_ms_rate(self):
+        """测试停顿后在 burst 内追回操作，以及亚毫秒周期下的实际速率"""
+        pacer = Pacer(10, burst=3)
+        time.sleep(0.5)
+        start_time = time.monotonic()
+        for _ in range(3):
+            pacer.acquire()
+        self.assertLess(time.monotonic() - start_time, 0.05)
+        self.assertFalse(pacer.try_acquire())
+
+        pacer = Pacer(5000)
+        start_time = time.monotonic()
+        while time.monotonic() - start_time < 0.5:
+            pacer.acquire()
+            pacer.done()
+        self.assertAlmostEqual(pacer.stats()['achieved'], 5000, delta=750)
+
+class TestExecutor(unittest.TestCase):
+    def test_timer_wheel_expiry_across_levels(self):
+        """测试分层时间轮中各层的定时器都在到期的 tick 取出"""
+        wheel = TimerWheel(tick=1, slots=4, levels=3)
+        wheel.origin = 0
+        rng = random.Random(1)
+        expected = {i: rng.randint(1, 100) for i in range(200)}
+        for item, deadline in expected.items():
+            wheel.schedule(deadline, item)
+        fired = {}
+        for now in range(1, 101):
+            for item in wheel.advance(now):
+                fired[item] = now
+        self.assertEqual(fired, expected)
+        self.assertEqual(len(wheel), 0)
+
+    def test_many_roles_on_fixed_pool(self):
+        """测试多条流水线运行在固定数量的线程上"""
+        executor = Executor(workers=2)
+        sources = [Buffer(size=4, id=i) for i in range(10)]
+        targets = [Buffer(size=100, id=i) for i in range(10)]
+        for source, target in zip(sources, targets):
+            executor.submit(producer_task(Producer(source, put_freq=50)))
+            for task in consumer_tasks(Consumer(target, get_freq=0.1, move_freq=50), source):
+                executor.submit(task)
+        executor.start()
+        time.sleep(0.5)
+        self.assertEqual(executor.thread_count, 3)
+        self.assertEqual(executor.shutdown(timeout=1), [])
+        for target in targets:
+            self.assertGreater(len(target.data), 10)
+
+    def test_rate_above_tick_frequency(self):
+        """测试速率高于每秒 tick 数的任务在一次执行中连续消耗令牌，达到目标速率"""
+        executor = Executor(workers=1)
+        test_buffer = Buffer(size=100000)
+        executor.submit(producer_task(Producer(test_buffer, put_freq=5000)))
+        executor.start()
+        time.sleep(1)
+        executor.shutdown(timeout=1)
+        self.assertGreater(len(test_buffer.data), 4000)
+
+class TestPayload(unittest.TestCase):
+    def test_random_chars_across_blocks(self):
+        """测试随机字符只来自字母表，跨块取数据时数量正确"""
+        source = RandomChars(alphabet='abc', block_size=16)
+        items = source.take(100)
+        self.assertEqual(len(items), 100)
+        self.assertTrue(set(items) <= set('abc'))
+
+    def test_sequence_survives_full_buffer(self):
+        """测试 try_put 因缓冲区满失败时不丢失序号"""
+        test_buffer = Buffer(size=2)
+        producer = Producer(test_buffer, payload=SequenceRecords(prefix='s', block_size=4))
+        results = [producer.try_put() for _ in range(3)]
+        self.assertEqual(results, ['s0', 's1', None])
+        self.assertEqual(test_buffer.get(), 's0')
+        self.assertEqual(producer.try_put(), 's2')
+
+    def test_file_replay_loops(self):
+        """测试按行回放文件，读到末尾后从头开始"""
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("a\nb\nc\n")
+        self.addCleanup(os.remove, f.name)
+        source = FileReplay(f.name, block_size=2)
+        self.addCleanup(source.close)
+        self.assertEqual(source.take(5), ['a', 'b', 'c', 'a', 'b'])
+
+        source = FileReplay(f.name, loop=False)
+        self.addCleanup(source.close)
+        self.assertEqual(list(source), ['a', 'b', 'c'])
+
+class TestAutoscaler(unittest.TestCase):
+    def test_scale_between_water_marks(self):
+        """测试占用率达到高水位时扩容到上限，空闲时缩容到下限"""
+        test_buffer = Buffer(size=10)
+        pool = ConsumerPool(test_buffer, Executor(), get_freq=2, min_workers=1, max_workers=3)
+        autoscaler = Autoscaler([pool], high=0.8, low=0.2, cooldown=0)
+        
+        test_buffer.put_many('abcdefghij')
+        for _ in range(3):
+            autoscaler.evaluate()
+        self.assertEqual(len(pool), 3)
+        self.assertEqual([(e.old, e.new) for e in autoscaler.events], [(1, 2), (2, 3)])
+        
+        test_buffer.get_many(10)
+        for _ in range(3):
+            autoscaler.evaluate()
+        self.assertEqual(len(pool), 1)
+        metrics = autoscaler.metrics()
+        self.assertEqual((metrics['scale_ups'], metrics['scale_downs']), (2, 2))
+        self.assertEqual(metrics['pools'][test_buffer.id]['workers'], 1)
+
+class TestBackpressure(unittest.TestCase):
+    def test_controllers_track_target_occupancy(self):
+        """测试背压控制器在占用率高于目标时降低 put_freq，低于目标时提高，SPSCBuffer 上同样适用"""
+        for buffer_class, controller in itertools.product((Buffer, SPSCBuffer), (None, AIMDController(target=0.5))):
+            test_buffer = buffer_class(size=10)
+            producer = Producer(test_buffer, put_freq=10)
+            backpressure = Backpressure(producer, controller)
+            
+            test_buffer.put_many('abcdefghi')
+            time.sleep(0.05)
+            backpressure.update()
+            lowered = producer.put_freq
+            self.assertLess(lowered, 10)
+            self.assertEqual(producer.put_pacer.rate, lowered)
+            
+            test_buffer.get_many(9)
+            time.sleep(0.05)
+            backpressure.update()
+            self.assertGreater(producer.put_freq, lowered)
+
+
+def chain_config(stages, rate):
+    """生成 stages 个缓冲区串联的流水线配置"""
+    return {
+        'buffers': [{'id': i, 'size': 4} for i in range(stages)],
+        'producers': [{'name': 'produce', 'buffer': 0, 'rate': rate, 'payload': 'sequence'}],
+        'movers': [{'name': f'move_{i}', 'from': i, 'to': i + 1, 'rate': rate} for i in range(stages - 1)],
+        'sinks': [{'name': 'sink', 'buffer': stages - 1, 'rate': rate}],
+    }
+
+
+class TestTopology(unittest.TestCase):
+    def test_default_topology(self):
+        """测试默认配置构建出原来的三缓冲区布局"""
+        topology = Topology.load()
+        self.assertEqual(sorted(topology.buffers), [1, 2, 3])
+        self.assertEqual(topology.buffers[1].capacity, 8)
+        # 缓冲区1只有生产者写、分发器读；缓冲区2、3由可扩容的工作者池读取
+        self.assertIsInstance(topology.buffers[1], SPSCBuffer)
+        self.assertIsInstance(topology.buffers[2], Buffer)
+        # 界面可以把缓冲区调整到 20，SPSCBuffer 按 max_size 预分配了槽位
+        self.assertTrue(topology.buffers[1].resize(20))
+        self.assertFalse(topology.buffers[1].resize(21))
+
+    def test_chain_runs_end_to_end(self):
+        """测试多级串联流水线在固定线程池上按顺序把数据送到末端"""
+        topology = Topology(chain_config(20, rate=200))
+        # 每个缓冲区单写单读，自动选用 SPSCBuffer
+        self.assertTrue(all(isinstance(b, SPSCBuffer) for b in topology.buffers.values()))
+        consumed = []
+        executor = Executor(workers=2)
+        topology.start(executor, on_result=lambda name, data: name == 'sink' and consumed.append(data))
+        executor.start()
+        time.sleep(1)
+        topology.stop()
+        executor.shutdown(timeout=1)
+        self.assertGreater(len(consumed), 10)
+        self.assertEqual(consumed, [str(i) for i in range(len(consumed))])
+
+    def test_invalid_configs(self):
+        """测试引用不存在的缓冲区或存在环时拒绝配置"""
+        config = chain_config(3, rate=1)
+        config['movers'].append({'name': 'back', 'from': 2, 'to': 0, 'rate': 1})
+        self.assertRaises(ValueError, Topology, config)
+        config = chain_config(3, rate=1)
+        config['sinks'][0]['buffer'] = 9
+        self.assertRaises(ValueError, Topology, config)
+        config = chain_config(3, rate=1)
+        config['producers'][0]['payload'] = 'randm'
+        self.assertRaises(ValueError, Topology, config)
+        config = chain_config(3, rate=1)
+        config['producers'][0]['backpressure'] = {'controller': 'aimd', 'kp': 1.0}
+        self.assertRaises(ValueError, Topology, config)
+
+    def test_live_rates_apply_per_version(self):
+        """测试一次 set_rates 作为一个版本同时作用于多个角色，取值不变时不产生新版本"""
+        topology = Topology.load()
+        executor = Executor(workers=1)
+        topology.start(executor)
+        version = topology.live.version
+        self.assertEqual(topology.set_rates({'produce': 9, 'consume_1': 3, 'move_to_2': 6}), version + 1)
+        self.assertEqual(topology.producers['produce'].put_freq, 9)
+        self.assertEqual(topology.sinks['consume_1'].get_freq, 3)
+        # 分支权重改变时分发器总速率随权重之和变化
+        self.assertEqual(topology.dispatchers['move'].policy.weights, [6, 2])
+        self.assertEqual(topology.dispatchers['move'].pacer.rate, 8)
+        self.assertEqual(topology.set_rates({'produce': 9}), version + 1)
+        self.assertRaises(KeyError, topology.set_rate, 'missing', 1)
+        topology.stop()
+
+    def test_backpressure_publishes_live_rate(self):
+        """测试背压配置拆分为 Backpressure 和控制器参数，控制器的输出写入 live 配置"""
+        config = chain_config(1, rate=10)
+        config['producers'][0]['backpressure'] = {'controller': 'aimd', 'target': 0.5, 'max_latency': 0.5}
+        topology = Topology(config)
+        topology.start(Executor(workers=1))
+        backpressure = topology.backpressure['produce']
+        self.assertEqual(backpressure.max_latency, 0.5)
+        self.assertIsInstance(backpressure.controller, AIMDController)
+        
+        topology.buffers[0].put_many('abcd')
+        time.sleep(0.05)
+        version = topology.live.version
+        backpressure.update()
+        rate = topology.producers['produce'].put_freq
+        self.assertLess(rate, 10)
+        self.assertEqual((topology.live['produce'], topology.live.version), (rate, version + 1))
+        # 操作员把频率设回原值时不会因为 live 配置过期而被忽略
+        topology.set_rate('produce', 10)
+        self.assertEqual(topology.producers['produce'].put_pacer.rate, 10)
+        topology.stop()
+
+class TestDispatcher(unittest.TestCase):
+    def route(self, policy, items, sizes=(100, 100)):
+        source = Buffer(size=len(items))
+        source.put_many(items)
+        branches = [Buffer(size=size, id=i) for i, size in enumerate(sizes)]
+        dispatcher = Dispatcher(source, branches, policy, rate=1000, batch_size=len(items))
+        time.sleep(0.05)
+        dispatcher.dispatch()
+        return dispatcher, branches
+
+    def test_weighted_split_is_deterministic(self):
+        """测试加权轮询按权重交错分发"""
+        dispatcher, branches = self.route(Weighted([2, 1]), 'abcdef')
+        self.assertEqual(list(branches[0].data), ['a', 'c', 'd', 'f'])
+        self.assertEqual(list(branches[1].data), ['b', 'e'])
+        self.assertEqual({i: s['items'] for i, s in dispatcher.stats().items()}, {0: 4, 1: 2})
+
+    def test_key_hash_and_least_occupied(self):
+        """测试相同键进入同一分支，以及优先分发到占用率最低的分支"""
+        _, branches = self.route(KeyHash(), 'abababab')
+        for key in 'ab':
+            self.assertEqual(sum(key in branch.data for branch in branches), 1)
+        
+        dispatcher, branches = self.route(LeastOccupied(), 'abcdef', sizes=(2, 4))
+        self.assertEqual((len(branches[0].data), len(branches[1].data)), (2, 4))
+
+    def test_full_branch_keeps_order(self):
+        """测试下游放不下时数据留在源缓冲区，腾出空位后按原顺序继续分发"""
+        dispatcher, branches = self.route(Weighted([1, 1]), 'abcd', sizes=(1, 1))
+        self.assertEqual(len(dispatcher.source.data), 2)
+        self.assertEqual((list(branches[0].data), list(branches[1].data)), (['a'], ['b']))
+        branches[0].get()
+        branches[1].get()
+        time.sleep(0.01)
+        dispatcher.dispatch()
+        self.assertEqual((list(branches[0].data), list(branches[1].data)), (['c'], ['d']))
+
+class TestSupervisor(unittest.TestCase):
+    def test_restart_does_not_leak_threads(self):
+        """测试反复启动停止时线程数不增长，停止前排空在途数据"""
+        topology = Topology(chain_config(3, rate=50))
+        supervisor = Supervisor(topology, workers=2, drain_timeout=2)
+        for _ in range(3):
+            self.assertTrue(supervisor.start())
+            self.assertFalse(supervisor.start())
+            self.assertEqual(supervisor.state, RUNNING)
+            self.assertEqual(supervisor.thread_count(), 3)
+            time.sleep(0.2)
+            self.assertEqual(supervisor.stop(), [])
+            self.assertEqual(supervisor.state, STOPPED)
+            self.assertEqual(supervisor.thread_count(), 0)
+            self.assertEqual(topology.in_flight(), 0)
+
+    def test_failed_start_can_restart(self):
+        """测试启动中途失败时回到 stopped、不留下线程，修正配置后可以重新启动"""
+        topology = Topology(chain_config(3, rate=50))
+        supervisor = Supervisor(topology, workers=2, drain_timeout=2)
+        topology.producer_specs[0]['payload'] = 'randm'
+        self.assertRaises(ValueError, supervisor.start)
+        self.assertEqual(supervisor.state, STOPPED)
+        self.assertEqual(supervisor.thread_count(), 0)
+        self.assertTrue(all(buffer.closed for buffer in topology.buffers.values()))
+        topology.producer_specs[0]['payload'] = 'random'
+        self.assertTrue(supervisor.start())
+        self.assertEqual(supervisor.state, RUNNING)
+        time.sleep(0.2)
+        self.assertEqual(supervisor.stop(), [])
+        self.assertEqual(supervisor.thread_count(), 0)
+
+    def test_failed_task_retries_with_backoff(self):
+        """测试出错的任务按指数退避重试，成功后恢复正常节拍"""
+        calls = []
+        def flaky():
+            calls.append(time.monotonic())
+            if len(calls) <= 3:
+                raise RuntimeError("boom")
+            return True
+        executor = Executor(workers=1)
+        task = executor.submit(Task("flaky", flaky, Pacer(1000), backoff=0.05))
+        executor.start()
+        time.sleep(0.6)
+        executor.shutdown(timeout=1)
+        self.assertEqual(executor.restarts, 3)
+        gaps = [b - a for a, b in zip(calls, calls[1:4])]
+        self.assertAlmostEqual(gaps[0], 0.05, delta=0.03)
+        self.assertAlmostEqual(gaps[2], 0.2, delta=0.05)
+        self.assertGreater(len(calls), 10)
+        self.assertEqual(task.failures, 0)
+
+class TestPriorityBuffer(unittest.TestCase):
+    def test_urgent_overtakes_backlog(self):
+        """测试严格优先时紧急数据越过积压的普通数据，且等待时间更短"""
+        buffer = PriorityBuffer(size=10)
+        buffer.put_many(['b1', 'b2', 'b3'])
+        time.sleep(0.05)
+        buffer.put(Prioritized('urgent', 'u1'))
+        self.assertEqual(buffer.get(), Prioritized('urgent', 'u1'))
+        self.assertEqual(buffer.get_many(3), ['b1', 'b2', 'b3'])
+        stats = buffer.class_stats()
+        self.assertEqual((stats['urgent']['served'], stats['bulk']['served']), (1, 3))
+        self.assertLess(stats['urgent']['max_wait'], stats['bulk']['mean_wait'])
+
+    def test_weighted_fair_and_class_capacity(self):
+        """测试加权公平出队按权重交错，以及单个类别满时只阻塞该类别的放入"""
+        buffer = PriorityBuffer(size=10, policy='weighted', weights=[2, 1], class_capacity={'urgent': 4})
+        for i in range(4):
+            buffer.put(Prioritized('urgent', i))
+        self.assertIsNone(buffer.put(Prioritized('urgent', 4), timeout=0))
+        self.assertTrue(buffer.try_put('b0'))
+        self.assertTrue(buffer.try_put('b1'))
+        order = [getattr(item, 'priority', 'bulk') for item in buffer.get_many(6)]
+        self.assertEqual(order, ['urgent', 'bulk', 'urgent', 'urgent', 'bulk', 'urgent'])
+
+    def test_move_preserves_priority(self):
+        """测试移动到下一个 PriorityBuffer 后数据仍按原类别出队"""
+        first, second = PriorityBuffer(size=4, id=1), PriorityBuffer(size=4, id=2)
+        first.put_many(['b1', Prioritized('urgent', 'u1')])
+        mover = Consumer(second, move_freq=1000)
+        self.assertEqual(mover.move(first), Prioritized('urgent', 'u1'))
+        second.put('b0')
+        self.assertEqual(mover.move(first), 'b1')
+        self.assertEqual(second.get(), Prioritized('urgent', 'u1'))
+        self.assertEqual(second.class_stats()['urgent']['depth'], 0)
+
+    def test_batch_paths_check_item_class(self):
+        """测试批量放入和转移按每个数据的类别占用空位，普通类别满时紧急数据不被挡住"""
+        buffer = PriorityBuffer(size=10, class_capacity={'bulk': 2})
+        buffer.put_many(['b0', 'b1'])
+        source = Buffer(size=4)
+        source.put_many([Prioritized('urgent', 'u0'), Prioritized('urgent', 'u1'), 'b2'])
+        self.assertEqual(transfer(source, buffer, 3, timeout=0),
+                         [Prioritized('urgent', 'u0'), Prioritized('urgent', 'u1')])
+        self.assertEqual(transfer(source, buffer, 1, timeout=0.05), [])
+
+        worker = threading.Thread(target=buffer.put_many, args=(['b3', Prioritized('urgent', 'u2')],), daemon=True)
+        worker.start()
+        time.sleep(0.05)
+        self.assertTrue(worker.is_alive())
+        self.assertEqual(buffer.class_stats()['urgent']['depth'], 3)
+        # 取出普通数据后，转移和批量放入中被挡住的普通数据依次放入
+        self.assertEqual(buffer.get_many(5)[-2:], ['b0', 'b1'])
+        worker.join(timeout=1)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(transfer(source, buffer, 1, timeout=1), ['b2'])
+        self.assertEqual(buffer.class_stats()['bulk']['depth'], 2)
+
+    def test_resize_wakes_every_class(self):
+        """测试扩容时唤醒所有等待的生产者，先被唤醒的类别仍然超限时不会挡住其他类别"""
+        buffer = PriorityBuffer(size=2, class_capacity={'bulk': 1})
+        buffer.put_many(['b0', Prioritized('urgent', 'u0')])
+        bulk = threading.Thread(target=buffer.put, args=('b1',), daemon=True)
+        bulk.start()
+        time.sleep(0.05)
+        urgent = threading.Thread(target=buffer.put, args=(Prioritized('urgent', 'u1'),), daemon=True)
+        urgent.start()
+        time.sleep(0.05)
+        self.assertTrue(buffer.resize(3))
+        urgent.join(timeout=1)
+        self.assertFalse(urgent.is_alive())
+        self.assertTrue(bulk.is_alive())
+        self.assertEqual(buffer.class_stats()['urgent']['depth'], 2)
+        # 取走普通数据后普通类别也能继续放入
+        self.assertEqual(buffer.get_many(3)[-1], 'b0')
+        bulk.join(timeout=1)
+        self.assertFalse(bulk.is_alive())
+
+    def test_snapshot_without_lock(self):
+        """测试观察者的快照不获取锁，内容没有变化时复用缓存的快照"""
+        buffer = PriorityBuffer(size=4)
+        view = BufferView(buffer)
+        buffer.put_many(['b0', Prioritized('urgent', 'u0')])
+        with buffer.lock:
+            self.assertTrue(view.refresh())
+            self.assertFalse(view.refresh())
+            change = buffer.snapshot_since()
+            self.assertIs(buffer.snapshot_since(), change)
+        self.assertEqual(list(view.items), [Prioritized('urgent', 'u0'), 'b0'])
+        buffer.get()
+        buffer.resize(6)
+        self.assertTrue(view.refresh())
+        self.assertEqual((list(view.items), view.capacity), (['b0'], 6))
+
+class TestMetrics(unittest.TestCase):
+    def test_per_thread_counter(self):
+        """测试各线程分别累加的计数在读取时正确汇总"""
+        counter = Counter()
+        threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.value(), 4000)
+        self.assertEqual(len(counter._cells), 4)
+
+    def test_blocked_wait_time(self):
+        """测试在空缓冲区上等待的时间计入阻塞时间，非阻塞尝试不计入"""
+        for buffer in (Buffer(size=1), SPSCBuffer(size=1)):
+            self.assertIsNone(buffer.get(timeout=0.05))
+            self.assertGreaterEqual(buffer.get_blocked.value(), 0.04)
+            self.assertEqual(buffer.put_blocked.value(), 0)
+
+    def test_topology_export(self):
+        """测试拓扑指标以 Prometheus 文本格式导出到 HTTP 和文件"""
+        import urllib.request
+        topology = Topology(chain_config(2, rate=100))
+        registry = MetricsRegistry()
+        registry.add_collector(topology_collector(topology))
+        executor = Executor(workers=1)
+        topology.start(executor)
+        executor.start()
+        time.sleep(0.3)
+        server = registry.serve(port=0)
+        self.addCleanup(server.shutdown)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            text = response.read().decode('utf-8')
+        topology.stop()
+        executor.shutdown(timeout=1)
+        self.assertIn('# TYPE buffer_occupancy gauge', text)
+        self.assertIn('buffer_capacity{buffer="0"} 4', text)
+        self.assertIn('role_target_rate{role="produce",op="put"} 100', text)
+        puts = [line for line in text.splitlines() if line.startswith('role_operations_total{role="produce"')]
+        self.assertGreater(float(puts[0].split()[-1]), 0)
+        path = os.path.join(tempfile.mkdtemp(), 'metrics.prom')
+        registry.write(path)
+        with open(path, encoding='utf-8') as f:
+            self.assertIn('buffer_puts_total', f.read())
+
+class TestContentionProfiler(unittest.TestCase):
+    def test_records_waits_per_thread(self):
+        """测试按线程记录等数据的时间，输出排序报告和折叠栈，detach 后恢复原来的锁"""
+        buffer = Buffer(size=1, id=7)
+        lock = buffer.lock
+        with ContentionProfiler() as profiler:
+            profiler.attach(buffer)
+            consumer = threading.Thread(target=lambda: [buffer.get() for _ in range(3)], name="reader")
+            consumer.start()
+            for i in range(3):
+                time.sleep(0.05)
+                buffer.put(i)
+            consumer.join()
+        self.assertIs(buffer.lock, lock)
+        self.assertNotIn('_wait', vars(buffer))
+        rows = profiler.records()
+        self.assertEqual((rows[0]['thread'], rows[0]['kind'], rows[0]['count']), ('reader', 'wait_empty', 3))
+        self.assertGreater(rows[0]['total'], 0.1)
+        self.assertEqual(rows, sorted(rows, key=lambda row: row['total'], reverse=True))
+        self.assertIn('wait_empty', profiler.report())
+        self.assertTrue(profiler.folded().startswith('reader;Buffer 7;wait_empty '))
+
+    def test_spurious_wakeups(self):
+        """测试一次阻塞的放入/取出交接和超时的取出都不算伪唤醒，被唤醒后条件仍不满足的才算"""
+        buffer = Buffer(size=1)
+        with ContentionProfiler() as profiler:
+            profiler.attach(buffer)
+            consumer = threading.Thread(target=buffer.get, name="reader")
+            consumer.start()
+            time.sleep(0.05)
+            buffer.put('a')
+            consumer.join()
+            buffer.put('b')
+            producer = threading.Thread(target=buffer.put, args=('c',), name="writer")
+            producer.start()
+            time.sleep(0.05)
+            self.assertEqual(buffer.get(), 'b')
+            producer.join()
+            self.assertEqual(buffer.get(), 'c')
+            self.assertIsNone(buffer.get(timeout=0.05))
+        kinds = {(row['thread'], row['kind']): row['count'] for row in profiler.records()}
+        self.assertEqual(kinds[('reader', 'wait_empty')], 1)
+        self.assertEqual(kinds[('writer', 'wait_full')], 1)
+        self.assertEqual(kinds[('MainThread', 'wait_empty')], 1)
+        self.assertNotIn('spurious_wakeup', {kind for _, kind in kinds})
+
+        # 按类别限制容量时扩容会唤醒所有生产者，类别仍然超限的那个记一次伪唤醒
+        buffer = PriorityBuffer(size=2, class_capacity={'bulk': 1})
+        buffer.put_many(['b0', Prioritized('urgent', 'u0')])
+        with ContentionProfiler() as profiler:
+            profiler.attach(buffer)
+            bulk = threading.Thread(target=buffer.put, args=('b1', 0.3), name="bulk")
+            bulk.start()
+            time.sleep(0.05)
+            buffer.resize(3)
+            bulk.join()
+        kinds = {(row['thread'], row['kind']): row['count'] for row in profiler.records()}
+        self.assertEqual(kinds[('bulk', 'spurious_wakeup')], 1)
+
+class TestTracing(unittest.TestCase):
+    def test_histogram_percentiles(self):
+        """测试对数分桶直方图的分位数相对误差在精度范围内"""
+        histogram = LatencyHistogram()
+        for i in range(1, 10001):
+            histogram.record(i * 1e-5)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 10000)
+        for name, expected in (('p50', 0.05), ('p99', 0.099), ('p999', 0.0999)):
+            self.assertAlmostEqual(summary[name], expected, delta=expected * 0.02)
+        # 超出上限的值计入最后一个桶，内存不增长
+        size = len(histogram.counts)
+        histogram.record(1e6)
+        self.assertEqual((len(histogram.counts), histogram.counts[-1]), (size, 1))
+
+    def test_topology_end_to_end(self):
+        """测试追踪流水线中每个缓冲区的停留时间和端到端延迟"""
+        topology = Topology(chain_config(3, rate=100))
+        tracer = Tracer()
+        topology.trace(tracer)
+        consumed = []
+        executor = Executor(workers=2)
+        topology.start(executor, on_result=lambda name, data: name == 'sink' and consumed.append(data))
+        executor.start()
+        time.sleep(0.5)
+        topology.stop()
+        executor.shutdown(timeout=1)
+        tracer.detach()
+        self.assertGreater(len(consumed), 10)
+        self.assertTrue(all(isinstance(item, Envelope) for item in consumed))
+        self.assertEqual([str(item) for item in consumed], [str(i) for i in range(len(consumed))])
+        self.assertEqual([hop[0] for hop in consumed[0].hops], [0, 1, 2])
+        stats = tracer.stats()
+        self.assertEqual(stats['end_to_end']['count'], len(consumed))
+        self.assertGreaterEqual(stats['end_to_end']['p50'], stats['buffers'][2]['p50'])
+        self.assertNotIn('put', vars(topology.buffers[0]))
+
+class TestSimulation(unittest.TestCase):
+    def test_bottleneck_blocks_producer(self):
+        """测试虚拟时钟上生产者被慢速消费者限速，阻塞时间和吞吐量符合预期"""
+        config = chain_config(1, rate=10)
+        config['sinks'][0]['rate'] = 5
+        start = time.monotonic()
+        report = Simulation(config).run(3600)
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertAlmostEqual(report['nodes']['sink']['throughput'], 5, delta=0.01)
+        self.assertAlmostEqual(report['nodes']['produce']['throughput'], 5, delta=0.01)
+        self.assertAlmostEqual(report['nodes']['produce']['blocked_fraction'], 0.5, delta=0.01)
+        self.assertEqual(report['buffers'][0]['max_occupancy'], 4)
+
+    def test_seeded_runs_are_reproducible(self):
+        """测试相同种子的随机到达仿真结果完全相同，不同种子不同"""
+        runs = [Simulation.load(seed=seed, arrivals='exponential').run(600) for seed in (7, 7, 8)]
+        self.assertEqual(runs[0], runs[1])
+        self.assertNotEqual(runs[0]['nodes'], runs[2]['nodes'])
+
+class TestBenchSuite(unittest.TestCase):
+    def test_baseline_comparison_exit_code(self):
+        """测试基准套件与基线比较：吞吐量在容差内时退出码为 0，下降超过容差时为 1"""
+        from bench import bench_suite
+        self.addCleanup(logging.disable, logging.NOTSET)
+        key = {'op': 'put_get', 'impl': 'Buffer', 'producers': 1, 'consumers': 1, 'capacity': 4, 'batch': 1}
+        baseline = {'results': [dict(key, ops_per_sec=100)]}
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(bench_suite.compare([dict(key, ops_per_sec=95)], baseline, 0.1), [])
+            self.assertEqual(len(bench_suite.compare([dict(key, ops_per_sec=85)], baseline, 0.1)), 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            results, baseline = os.path.join(tmp, 'results.json'), os.path.join(tmp, 'baseline.json')
+            args = ['--items', '200', '--producers', '1', '--consumers', '1', '--capacities', '4', '--batches', '1']
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(bench_suite.main(args + ['--json', results]), 0)
+            for scale, expected in ((0.01, 0), (100, 1)):
+                with open(results, encoding='utf-8') as f:
+                    data = json.load(f)
+                for result in data['results']:
+                    result['ops_per_sec'] *= scale
+                with open(baseline, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.assertEqual(bench_suite.main(args + ['--baseline', baseline]), expected)
+
+class TestTransfer(unittest.TestCase):
+    def test_transfer_waits_without_taking_item(self):
+        """测试目标已满时转移阻塞，且数据一直留在源缓冲区中"""
+        for target_class in (Buffer, SPSCBuffer):
+            source = Buffer(size=4, id=1)
+            target = target_class(size=1, id=2)
+            source.put_many('ab')
+            target.put('x')
+            
+            moved = []
+            mover = threading.Thread(target=lambda: moved.extend(transfer(source, target, 2)))
+            mover.start()
+            time.sleep(0.05)
+            self.assertTrue(mover.is_alive())
+            self.assertEqual(source.data.qsize(), 2)
+            
+            self.assertEqual(target.get(), 'x')
+            mover.join(timeout=1)
+            self.assertEqual(moved, ['a'])
+            self.assertEqual(target.get(), 'a')
+            self.assertEqual(source.get(), 'b')
+    
+    def test_transfer_batch_and_timeout(self):
+        """测试批量转移受两边容量限制，以及超时返回空列表"""
+        source = Buffer(size=8, id=1)
+        target = Buffer(size=3, id=2)
+        source.put_many('abcde')
+        self.assertEqual(transfer(source, target, 10), ['a', 'b', 'c'])
+        self.assertEqual(transfer(source, target, 10, timeout=0.05), [])
+        self.assertEqual(source.get_many(10), ['d', 'e'])
+    
+    def test_opposite_transfers_do_not_deadlock(self):
+        """测试两个线程反方向转移时不会死锁"""
+        first = Buffer(size=4, id=1)
+        second = Buffer(size=4, id=2)
+        first.put_many('ab')
+        second.put_many('cd')
+        
+        def shuttle(source, target):
+            for _ in range(2000):
+                transfer(source, target, 2)
+        
+        threads = [threading.Thread(target=shuttle, args=(first, second)),
+                   threading.Thread(target=shuttle, args=(second, first))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=10)
+        self.assertFalse(any(t.is_alive() for t in threads))
+        self.assertEqual(first.data.qsize() + second.data.qsize(), 4)
+
+
+class TestSPSCBuffer(unittest.TestCase):
+    def test_spsc_fifo_across_threads(self):
+        """测试SPSCBuffer在一个生产者线程和一个消费者线程之间保持FIFO顺序"""
+        test_buffer = SPSCBuffer(size=4)
+        received = []
+        
+        def consume():
+            for _ in range(1000):
+                received.append(test_buffer.get())
+        
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        for i in range(1000):
+            test_buffer.put(i)
+        consumer.join(timeout=5)
+        
+        self.assertEqual(received, list(range(1000)))
+        self.assertFalse(test_buffer.can_get())
+    
+    def test_spsc_resize_keeps_order(self):
+        """测试SPSCBuffer调整大小后数据顺序不变，超过预分配的上限时拒绝调整"""
+        test_buffer = SPSCBuffer(size=3, max_size=5)
+        for char in 'abc':
+            test_buffer.put(char)
+        test_buffer.get()
+        test_buffer.put('d')
+        
+        self.assertTrue(test_buffer.resize(5))
+        self.assertTrue(test_buffer.can_put())
+        self.assertFalse(test_buffer.resize(6))
+        self.assertEqual(test_buffer.get_many(5), ['b', 'c', 'd'])
+    
+    def test_spsc_resize_while_running(self):
+        """测试生产者和消费者运行中反复调整SPSCBuffer的大小，数据不丢失、不停滞"""
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        self.addCleanup(sys.setswitchinterval, interval)
+        for _ in range(20):
+            test_buffer = SPSCBuffer(size=2, max_size=8)
+            received = []
+            consumer = threading.Thread(target=lambda: [received.append(test_buffer.get()) for _ in range(500)])
+            consumer.start()
+            producer = threading.Thread(target=lambda: [test_buffer.put(i) for i in range(500)])
+            producer.start()
+            for size in itertools.cycle((1, 8, 2, 5)):
+                if not producer.is_alive():
+                    break
+                test_buffer.resize(size)
+            producer.join(timeout=5)
+            consumer.join(timeout=5)
+            self.assertFalse(consumer.is_alive())
+            self.assertEqual(received, list(range(500)))
+
+
+class TestSharedProducer(TestProducer):
+    """在共享内存缓冲区上运行同样的Producer用例"""
+    buffer_class = SharedBuffer
+
+
+class TestSharedConsumer(TestConsumer):
+    """在共享内存缓冲区上运行同样的Consumer用例"""
+    buffer_class = SharedBuffer
+
+
+def _put_chars(buffer, chars):
+    """子进程：向共享缓冲区放入字符"""
+    for char in chars:
+        buffer.put(char)
+
+
+def _attach_and_put(name, chars):
+    """fork出的子进程：按名字连接共享缓冲区后放入字符"""
+    _put_chars(SharedBuffer.attach(name), chars)
+
+
+class TestSharedBuffer(unittest.TestCase):
+    def test_cross_process_put_get(self):
+        """测试其他进程放入的数据能在本进程按顺序取出，且满时会阻塞等待"""
+        ctx = multiprocessing.get_context('fork')
+        test_buffer = SharedBuffer(size=2, ctx=ctx)
+        self.addCleanup(test_buffer.unlink)
+        
+        # 通过参数传递缓冲区对象，以及在fork的子进程中按名字连接
+        first = ctx.Process(target=_put_chars, args=(test_buffer, 'abcd'))
+        first.start()
+        received = [test_buffer.get(timeout=5) for _ in range(4)]
+        first.join(timeout=5)
+        second = ctx.Process(target=_attach_and_put, args=(test_buffer.name, 'xy'))
+        second.start()
+        received += [test_buffer.get(timeout=5) for _ in range(2)]
+        second.join(timeout=5)
+        
+        self.assertEqual(received, list('abcdxy'))
+        self.assertEqual(first.exitcode, 0)
+        self.assertEqual(second.exitcode, 0)
+    
+    def test_resize_and_close(self):
+        """测试共享缓冲区的软容量和关闭语义"""
+        test_buffer = SharedBuffer(size=2, max_size=4)
+        self.addCleanup(test_buffer.unlink)
+        
+        test_buffer.put_many('ab')
+        self.assertFalse(test_buffer.try_put('c'))
+        self.assertTrue(test_buffer.resize(3))
+        self.assertFalse(test_buffer.resize(5))
+        self.assertTrue(test_buffer.try_put('c'))
+        
+        test_buffer.close()
+        self.assertRaises(BufferClosed, test_buffer.put, 'd')
+        self.assertEqual(test_buffer.get_many(5), ['a', 'b', 'c'])
+        self.assertRaises(BufferClosed, test_buffer.get)
+
+
+class TestAsyncBuffer(unittest.TestCase):
+    def test_async_pipeline(self):
+        """测试协程版本的生产者、移动和async for消费"""
+        async def pipeline():
+            source = AsyncBuffer(size=2, id=1)
+            target = AsyncBuffer(size=2, id=2)
+            producer = AsyncProducer(source, put_freq=100)
+            mover = AsyncConsumer(target, move_freq=100)
+            
+            produce = asyncio.create_task(producer.run(count=5))
+            move = asyncio.create_task(mover.run_move(source, count=5))
+            received = []
+            async for item in target:
+                received.append(item)
+                if len(received) == 5:
+                    target.close()
+            return await produce, await move, received
+        
+        produced, moved, received = asyncio.run(pipeline())
+        self.assertEqual((produced, moved), (5, 5))
+        self.assertEqual(len(received), 5)
+        self.assertTrue(all(isinstance(char, str) and len(char) == 1 for char in received))
+    
+    def test_async_timeout_and_close(self):
+        """测试协程版本的超时和关闭唤醒"""
+        async def scenario():
+            test_buffer = AsyncBuffer(size=1)
+            timed_out = await test_buffer.get(timeout=0.05)
+            waiter = asyncio.create_task(test_buffer.get())
+            await asyncio.sleep(0.01)
+            test_buffer.close()
+            with self.assertRaises(BufferClosed):
+                await waiter
+            return timed_out
+        
+        self.assertIsNone(asyncio.run(scenario()))
+    
+    def test_async_move_into_closed_target(self):
+        """测试目标关闭时移动失败，数据留在源缓冲区中；等待目标空位时关闭也不丢数据"""
+        async def scenario():
+            source, target = AsyncBuffer(size=2, id=1), AsyncBuffer(size=1, id=2)
+            mover = AsyncConsumer(target, move_freq=1000)
+            await source.put_many(['a', 'b'])
+            target.close()
+            with self.assertRaises(BufferClosed):
+                await mover.move(source)
+            
+            target.reopen()
+            await target.put('x')
+            waiter = asyncio.create_task(mover.move(source))
+            await asyncio.sleep(0.01)
+            target.close()
+            with self.assertRaises(BufferClosed):
+                await waiter
+            return list(source.data)
+        
+        self.assertEqual(asyncio.run(scenario()), ['a', 'b'])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,386 @@
+import json
+import os
+import inspect
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+
+from buffer import Producer, Consumer, create_buffer
+from payload import RandomChars, BinaryRecords, SequenceRecords, FileReplay
+from scheduler import producer_task, consumer_tasks
+from autoscale import Autoscaler, ConsumerPool
+from backpressure import Backpressure, AIMDController, PIDController
+from dispatcher import Dispatcher, Weighted, POLICIES
+from live_config import LiveConfig
+
+logger = logging.getLogger(__name__)
+
+# 默认拓扑：生产者写入缓冲区1，一个加权分发器把数据分到缓冲区2、3，各自由一个可扩缩容的获取工作者池消费
+DEFAULT_TOPOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'default_topology.json')
+
+PAYLOADS = {
+    'random': RandomChars,
+    'binary': BinaryRecords,
+    'sequence': SequenceRecords,
+    'file': FileReplay,
+}
+
+CONTROLLERS = {
+    'pid': PIDController,
+    'aimd': AIMDController,
+}
+
+# backpressure 配置中属于 Backpressure 本身的参数，其余参数传给控制器
+BACKPRESSURE_OPTIONS = ('interval', 'max_latency', 'smoothing')
+
+
+def _payload_options(spec):
+    """payload 可以是类型名，也可以是带 type 和构造参数的字典，返回 (类型名, 构造参数)"""
+    if isinstance(spec, str):
+        spec = {'type': spec}
+    spec = dict(spec)
+    kind = spec.pop('type')
+    if kind not in PAYLOADS:
+        raise ValueError(f"未知的 payload 类型 {kind}，可选: {', '.join(PAYLOADS)}")
+    return kind, spec
+
+
+def _make_payload(spec):
+    if spec is None:
+        return None
+    kind, options = _payload_options(spec)
+    return PAYLOADS[kind](**options)
+
+
+def _check_options(name, cls, options):
+    """只检查参数名能否传给 cls 的构造函数，不真正构造（FileReplay 构造时会打开文件）"""
+    try:
+        inspect.signature(cls).bind(**options)
+    except TypeError as e:
+        raise ValueError(f"角色 {name} 的 {cls.__name__} 参数有误: {e}") from None
+
+
+def _make_policy(spec):
+    policy = spec.get('policy', 'round_robin')
+    if policy not in POLICIES:
+        raise ValueError(f"未知的分发策略 {policy}，可选: {', '.join(POLICIES)}")
+    if policy == 'weighted':
+        return Weighted(spec['weights'])
+    return POLICIES[policy]()
+
+
+def _backpressure_options(spec):
+    """把生产者的 backpressure 配置拆分为 (控制器名, 控制器参数, Backpressure 参数)"""
+    options = dict(spec)
+    controller = options.pop('controller', 'pid')
+    settings = {key: options.pop(key) for key in BACKPRESSURE_OPTIONS if key in options}
+    return controller, options, settings
+
+
+def _dispatch_rate(spec):
+    """分发速率：未指定时按权重之和，即每个分支的权重就是它每秒分到的数据个数"""
+    return spec.get('rate', sum(spec.get('weights', [])))
+
+
+def load_config(path):
+    """按扩展名读取 JSON 或 TOML 拓扑配置"""
+    if path.endswith('.toml'):
+        import tomllib
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Topology:
+    """
+    按配置构建的缓冲区有向无环图。配置包含四类节点：
+      buffers   缓冲区：id、size，可选 storage、max_size（运行中可调整到的最大容量），
+                以及 priority（PriorityBuffer 的参数，如 classes、policy）
+      producers 生产者：name、buffer、rate，可选 payload、backpressure
+      movers    移动者：name、from、to、rate，可选 workers（移动任务数）
+      sinks     消费者：name、buffer、rate，可选 workers 和 max_workers（大于 workers 时自动扩缩容）
+      dispatchers 分发器：name、from、to（分支缓冲区列表）、policy，可选 weights、rate、batch；
+                每个分支的角色名为 {name}_to_{分支缓冲区 id}，加权策略下修改分支的频率即修改其权重
+    另有可选的 autoscale 段，传给 Autoscaler。
+    各角色（及加权分支）的频率保存在版本化的 live 配置中，运行时修改只在版本变化时推送给相关角色。
+    backpressure 中的 controller（pid / aimd）选择控制器，interval、max_latency、smoothing 传给 Backpressure，
+    其余参数传给控制器。启用背压的生产者由控制器决定频率并写回 live 配置；
+    手动设置的频率立即生效，随后作为控制器下一个周期的起点。
+    每个缓冲区按写者和读者数量选择实现：单写单读时为 SPSCBuffer，其槽位按 max_size 预分配，运行中只能在此范围内调整大小。
+    缓冲区在构造时创建并在多次 start/stop 之间保留；角色在每次 start 时重新创建。
+    """
+    def __init__(self, config):
+        self.config = config
+        self.buffer_specs = {spec['id']: spec for spec in config.get('buffers', [])}
+        self.producer_specs = config.get('producers', [])
+        self.mover_specs = config.get('movers', [])
+        self.sink_specs = config.get('sinks', [])
+        self.dispatcher_specs = config.get('dispatchers', [])
+        self._validate()
+        self.buffers = self._build_buffers()
+        self.branches = {
+            f"{spec['name']}_to_{buffer_id}": (spec, index)
+            for spec in self.dispatcher_specs if spec.get('policy') == 'weighted'
+            for index, buffer_id in enumerate(spec['to'])
+        }
+        # 显式配置了总速率的分发器，其总速率不随分支权重变化
+        self._fixed_rate = {spec['name'] for spec in self.dispatcher_specs if 'rate' in spec}
+        self.live = LiveConfig(self._initial_rates())
+        # 串行化 set_rates，分发器总速率按最新的权重计算
+        self._update_lock = threading.Lock()
+        self.live.subscribe(self._apply)
+        self.producers = {}
+        self.movers = {}
+        self.sinks = {}
+        self.autoscaler = None
+        self.backpressure = {}
+        self.dispatchers = {}
+        self.tracer = None
+        # 生产者及其背压任务，排空时先停止它们
+        self.source_tasks = []
+
+    @classmethod
+    def load(cls, path=DEFAULT_TOPOLOGY):
+        return cls(load_config(path))
+
+    def _validate(self):
+        names = [spec['name'] for spec in self._role_specs()]
+        duplicates = [name for name, count in Counter(names).items() if count > 1]
+        if duplicates:
+            raise ValueError(f"拓扑中角色名重复: {duplicates}")
+        for spec in self.producer_specs + self.sink_specs:
+            self._check_buffer(spec['name'], spec['buffer'])
+        for spec in self.producer_specs:
+            self._check_producer(spec)
+        for spec in self.mover_specs:
+            self._check_buffer(spec['name'], spec['from'])
+            self._check_buffer(spec['name'], spec['to'])
+        for spec in self.dispatcher_specs:
+            for buffer_id in [spec['from']] + spec['to']:
+                self._check_buffer(spec['name'], buffer_id)
+        self.order = self._topological_order()
+
+    def _initial_rates(self):
+        rates = {spec['name']: spec['rate'] for spec in self.producer_specs + self.mover_specs + self.sink_specs}
+        for spec in self.dispatcher_specs:
+            rates[spec['name']] = _dispatch_rate(spec)
+        for name, (spec, index) in self.branches.items():
+            rates[name] = spec['weights'][index]
+        return rates
+
+    def _role_specs(self):
+        return self.producer_specs + self.mover_specs + self.sink_specs + self.dispatcher_specs
+
+    def _edges(self):
+        for spec in self.mover_specs:
+            yield spec['from'], spec['to']
+        for spec in self.dispatcher_specs:
+            for buffer_id in spec['to']:
+                yield spec['from'], buffer_id
+
+    def _check_buffer(self, name, buffer_id):
+        if buffer_id not in self.buffer_specs:
+            raise ValueError(f"角色 {name} 引用了不存在的缓冲区 {buffer_id}")
+
+    def _check_producer(self, spec):
+        """在启动前检查 payload 和反压配置，避免启动到一半才失败"""
+        if spec.get('payload') is not None:
+            kind, options = _payload_options(spec['payload'])
+            _check_options(spec['name'], PAYLOADS[kind], options)
+        if spec.get('backpressure'):
+            kind, options, _ = _backpressure_options(spec['backpressure'])
+            if kind not in CONTROLLERS:
+                raise ValueError(f"未知的反压控制器 {kind}，可选: {', '.join(CONTROLLERS)}")
+            _check_options(spec['name'], CONTROLLERS[kind], options)
+
+    def _topological_order(self):
+        """按移动者连成的边对缓冲区做拓扑排序，存在环时抛出 ValueError"""
+        edges = defaultdict(set)
+        indegree = {buffer_id: 0 for buffer_id in self.buffer_specs}
+        for source, target in self._edges():
+            if target not in edges[source]:
+                edges[source].add(target)
+                indegree[target] += 1
+        ready = deque(buffer_id for buffer_id, degree in indegree.items() if degree == 0)
+        order = []
+        while ready:
+            buffer_id = ready.popleft()
+            order.append(buffer_id)
+            for target in edges[buffer_id]:
+                indegree[target] -= 1
+                if indegree[target] == 0:
+                    ready.append(target)
+        if len(order) < len(indegree):
+            cycle = sorted(buffer_id for buffer_id, degree in indegree.items() if degree > 0)
+            raise ValueError(f"拓扑中存在环，涉及缓冲区: {cycle}")
+        return order
+
+    def _build_buffers(self):
+        writers, readers = Counter(), Counter()
+        for spec in self.producer_specs:
+            writers[spec['buffer']] += 1
+        for spec in self.mover_specs:
+            workers = spec.get('workers', 1)
+            writers[spec['to']] += workers
+            readers[spec['from']] += workers
+        for spec in self.sink_specs:
+            readers[spec['buffer']] += max(spec.get('workers', 1), spec.get('max_workers', 1))
+        for spec in self.dispatcher_specs:
+            readers[spec['from']] += 1
+            for buffer_id in spec['to']:
+                writers[buffer_id] += 1
+        buffers = {}
+        for buffer_id in self.order:
+            spec = self.buffer_specs[buffer_id]
+            buffers[buffer_id] = create_buffer(spec['size'], buffer_id,
+                                               single_writer=writers[buffer_id] == 1,
+                                               single_reader=readers[buffer_id] == 1,
+                                               storage=spec.get('storage', 'deque'),
+                                               priority=spec.get('priority'),
+                                               max_size=spec.get('max_size'))
+        return buffers
+
+    def start(self, executor, on_result=None):
+        """
+        创建所有角色并把任务提交到 executor。
+        on_result(name, data) 在每个角色完成一次操作后调用，name 为配置中的角色名。
+        """
+        def callback(name):
+            return None if on_result is None else (lambda data: on_result(name, data))
+
+        for buffer in self.buffers.values():
+            buffer.reopen()
+        self.producers, self.movers, self.sinks, self.backpressure, self.dispatchers = {}, {}, {}, {}, {}
+        self.source_tasks = []
+        rates = self.live.current.values
+        for spec in self.producer_specs:
+            payload = _make_payload(spec.get('payload'))
+            if self.tracer is not None:
+                payload = self.tracer.payload(payload or RandomChars())
+            producer = Producer(self.buffers[spec['buffer']], rates[spec['name']], payload=payload)
+            self.producers[spec['name']] = producer
+            self.source_tasks.append(executor.submit(producer_task(producer, callback(spec['name']))))
+            if spec.get('backpressure'):
+                kind, options, settings = _backpressure_options(spec['backpressure'])
+                # 控制器的输出写入 live 配置，界面和 set_rate 看到的始终是生产者实际的频率
+                on_rate = lambda rate, name=spec['name']: self.set_rate(name, rate)
+                self.backpressure[spec['name']] = Backpressure(producer, CONTROLLERS[kind](**options),
+                                                               on_rate=on_rate, **settings)
+                self.source_tasks.append(executor.submit(self.backpressure[spec['name']].task()))
+        for spec in self.mover_specs:
+            source, target = self.buffers[spec['from']], self.buffers[spec['to']]
+            self.movers[spec['name']] = []
+            for _ in range(spec.get('workers', 1)):
+                mover = Consumer(target, move_freq=rates[spec['name']])
+                move_task, _ = consumer_tasks(mover, source, on_move=callback(spec['name']))
+                self.movers[spec['name']].append(mover)
+                executor.submit(move_task)
+        for spec in self.sink_specs:
+            workers = spec.get('workers', 1)
+            self.sinks[spec['name']] = ConsumerPool(self.buffers[spec['buffer']], executor, rates[spec['name']],
+                                                    min_workers=workers,
+                                                    max_workers=max(workers, spec.get('max_workers', workers)),
+                                                    on_result=callback(spec['name']))
+        for spec in self.dispatcher_specs:
+            dispatcher = Dispatcher(self.buffers[spec['from']], [self.buffers[i] for i in spec['to']],
+                                    self._make_policy(spec, rates), rates[spec['name']],
+                                    spec.get('batch', 16), spec['name'])
+            self.dispatchers[spec['name']] = dispatcher
+            on_dispatch = None
+            if on_result is not None:
+                def on_dispatch(routed, spec=spec):
+                    for index, item in routed:
+                        on_result(f"{spec['name']}_to_{spec['to'][index]}", item)
+            executor.submit(dispatcher.task(on_dispatch))
+        scaled = [pool for pool in self.sinks.values() if pool.max_workers > pool.min_workers]
+        if scaled:
+            self.autoscaler = Autoscaler(scaled, **self.config.get('autoscale', {}))
+            executor.submit(self.autoscaler.task())
+        logger.info(f"Topology started: {len(self.buffers)} buffers, {len(self.producers)} producers, "
+                    f"{len(self.movers)} movers, {len(self.sinks)} sinks, {len(self.dispatchers)} dispatchers")
+
+    def trace(self, tracer):
+        """
+        启用延迟追踪：之后 start 的生产者产生 Envelope，所有缓冲区记录停留时间；
+        只被消费者读取、没有下游的缓冲区记录端到端延迟。
+        """
+        self.tracer = tracer
+        outgoing = {source for source, _ in self._edges()}
+        sink_buffers = {spec['buffer'] for spec in self.sink_specs}
+        for buffer_id, buffer in self.buffers.items():
+            tracer.attach(buffer, terminal=buffer_id in sink_buffers and buffer_id not in outgoing)
+
+    def stop_producers(self):
+        """停止所有生产者，下游角色继续运行，用于排空流水线"""
+        for task in self.source_tasks:
+            task.cancel()
+
+    def in_flight(self):
+        """还在流水线中的数据个数：各缓冲区中的数据和分发器暂存的数据"""
+        return (sum(buffer._available() for buffer in self.buffers.values())
+                + sum(len(d.pending) for d in self.dispatchers.values()))
+
+    def stop(self):
+        """关闭所有缓冲区，角色的任务随之结束"""
+        for buffer in self.buffers.values():
+            buffer.close()
+
+    def _make_policy(self, spec, rates):
+        if spec.get('policy') == 'weighted':
+            return Weighted(self._weights(spec, rates))
+        return _make_policy(spec)
+
+    def _weights(self, spec, rates):
+        return [rates[f"{spec['name']}_to_{buffer_id}"] for buffer_id in spec['to']]
+
+    def set_rate(self, name, rate):
+        """按角色名修改频率，下次 start 时沿用；运行中的移动者和消费者池作用于其中每个工作者"""
+        self.set_rates({name: rate})
+
+    def set_rates(self, rates):
+        """
+        同时修改多个角色的频率，作为 live 配置的一个版本生效，返回生效的版本号。
+        加权分发器的分支名（{name}_to_{分支缓冲区 id}）对应其权重，未显式配置总速率时总速率随权重之和变化。
+        """
+        with self._update_lock:
+            return self._set_rates(rates)
+
+    def _set_rates(self, rates):
+        current = self.live.current.values
+        for name in rates:
+            if name not in current:
+                dispatcher = next((spec['name'] for spec in self.dispatcher_specs
+                                   if name.startswith(f"{spec['name']}_to_")), None)
+                if dispatcher is not None:
+                    raise KeyError(f"分发器 {dispatcher} 不是加权策略，不能单独设置分支 {name} 的频率")
+                raise KeyError(f"拓扑中没有角色 {name}")
+        changes = dict(rates)
+        merged = {**current, **changes}
+        for spec in self.dispatcher_specs:
+            if spec['name'] in changes:
+                self._fixed_rate.add(spec['name'])
+            elif spec['name'] not in self._fixed_rate and spec.get('policy') == 'weighted':
+                changes[spec['name']] = sum(self._weights(spec, merged))
+        return self.live.update(changes).version
+
+    def _apply(self, old, new):
+        """live 配置的订阅者：只把新旧版本间变化的频率推送给运行中的角色"""
+        changed = {name for name, rate in new.values.items() if old.values.get(name) != rate}
+        for name in changed:
+            rate = new.values[name]
+            if name in self.backpressure:
+                # 启用背压时控制器每个周期都发布新频率，不逐次记录日志
+                self.backpressure[name].apply(rate)
+            elif name in self.producers:
+                self.producers[name].set_put_freq(rate)
+            for mover in self.movers.get(name, []):
+                mover.set_move_freq(rate)
+            if name in self.sinks:
+                self.sinks[name].set_get_freq(rate)
+            if name in self.dispatchers:
+                self.dispatchers[name].set_rate(rate)
+        for spec in {id(spec): spec for name, (spec, _) in self.branches.items() if name in changed}.values():
+            dispatcher = self.dispatchers.get(spec['name'])
+            if dispatcher:
+                dispatcher.policy.set_weights(self._weights(spec, new.values))
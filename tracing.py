@@ -0,0 +1,216 @@
+import time
+import itertools
+import threading
+import logging
+
+from payload import PayloadSource
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = {'p50': 0.5, 'p99': 0.99, 'p999': 0.999}
+
+
+class Envelope:
+    """
+    带追踪信息的数据：id、创建时间，以及经过的每个缓冲区的 (缓冲区 id, 进入时间, 离开时间)。
+    str() 和 priority 转发给原始数据，日志、界面和 PriorityBuffer 的分类不受影响。
+    """
+    __slots__ = ('id', 'data', 'created', 'hops')
+
+    def __init__(self, id, data, created):
+        self.id = id
+        self.data = data
+        self.created = created
+        self.hops = []
+
+    @property
+    def priority(self):
+        return self.data.priority
+
+    def __str__(self):
+        return str(self.data)
+
+    def __repr__(self):
+        return f"Envelope({self.id}, {self.data!r})"
+
+
+class LatencyHistogram:
+    """
+    HDR 风格的对数分桶直方图，内存固定。
+    以 unit 秒为单位取整后，小于 2**sub_bits 的值每个整数一个桶；更大的值按 2 的幂分段，
+    每段再均分为 2**(sub_bits-1) 个桶，相对误差不超过 2**(1-sub_bits)（默认约 1.6%）。
+    超过 max_value 的值计入最后一个桶。
+    """
+    def __init__(self, unit=1e-6, max_value=100.0, sub_bits=7):
+        self.unit = unit
+        self.sub_bits = sub_bits
+        self.max_units = max(int(max_value / unit), 1)
+        self.counts = [0] * (self._index(self.max_units) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def _index(self, units):
+        shift = max(units.bit_length() - self.sub_bits, 0)
+        return (shift << (self.sub_bits - 1)) + (units >> shift)
+
+    def _bucket_value(self, index):
+        """桶的中点（秒）"""
+        half = 1 << (self.sub_bits - 1)
+        shift = max(index // half - 1, 0)
+        top = index - (shift << (self.sub_bits - 1))
+        return ((top << shift) + ((1 << shift) - 1) / 2) * self.unit
+
+    def record(self, value):
+        units = min(max(int(value / self.unit), 0), self.max_units)
+        index = self._index(units)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """第 q 分位（0~1）的估计值，结果限制在实际记录的最小值和最大值之间"""
+        with self.lock:
+            if self.count == 0:
+                return 0.0
+            rank = max(q * self.count, 1)
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    return min(max(self._bucket_value(index), self.min), self.max)
+            return self.max
+
+    def summary(self):
+        """记录数、平均值、最大值和 p50/p99/p999（秒）"""
+        summary = {'count': self.count, 'mean': self.total / self.count if self.count else 0.0, 'max': self.max}
+        for name, q in PERCENTILES.items():
+            summary[name] = self.percentile(q)
+        return summary
+
+
+class TracedPayload(PayloadSource):
+    """把另一个数据源产生的每个数据装进 Envelope，创建时间在生产者取数据时记录"""
+    def __init__(self, source, tracer):
+        super().__init__()
+        self.source = source
+        self.tracer = tracer
+
+    def next(self):
+        return self.tracer.wrap(self.source.next())
+
+    def take(self, n):
+        return [self.tracer.wrap(item) for item in self.source.take(n)]
+
+
+class Tracer:
+    """
+    端到端延迟追踪。attach() 包装缓冲区的放入和取出入口（put、get、_extend、_take），
+    Envelope 进入时记录时间，离开时把停留时间计入该缓冲区的直方图；
+    从 terminal 缓冲区离开时，把自创建以来的总时间计入端到端直方图。
+    不是 Envelope 的数据原样通过，没有 attach 的缓冲区不受影响。
+    """
+    def __init__(self, **histogram_options):
+        self.histogram_options = histogram_options
+        self.buffers = {}
+        self.end_to_end = LatencyHistogram(**histogram_options)
+        self._ids = itertools.count()
+        self._attached = []
+
+    def wrap(self, data):
+        return Envelope(next(self._ids), data, time.monotonic())
+
+    def payload(self, source):
+        return TracedPayload(source, self)
+
+    def attach(self, buffer, terminal=False):
+        histogram = self.buffers.setdefault(buffer.id, LatencyHistogram(**self.histogram_options))
+        end_to_end = self.end_to_end if terminal else None
+
+        def entered(items):
+            now = time.monotonic()
+            for item in items:
+                # PriorityBuffer.put 内部经由 _extend 放入，同一次进入只记录一次
+                if isinstance(item, Envelope) and not _open_in(item, buffer.id):
+                    item.hops.append((buffer.id, now, None))
+
+        def left(items):
+            now = time.monotonic()
+            for item in items:
+                if isinstance(item, Envelope) and item.hops:
+                    buffer_id, start, _ = item.hops[-1]
+                    item.hops[-1] = (buffer_id, start, now)
+                    histogram.record(now - start)
+                    if end_to_end is not None:
+                        end_to_end.record(now - item.created)
+
+        put, get, extend, take = buffer.put, buffer.get, buffer._extend, buffer._take
+
+        def traced_put(data, timeout=None):
+            # 放入前记录进入时间，取出方看到数据时时间戳一定已经写好；放入失败时撤销
+            entered((data,))
+            try:
+                result = put(data, timeout)
+            except BaseException:
+                _undo(data)
+                raise
+            if result is None:
+                _undo(data)
+            return result
+
+        def traced_get(timeout=None):
+            data = get(timeout)
+            if data is not None:
+                left((data,))
+            return data
+
+        def traced_extend(items):
+            entered(items)
+            return extend(items)
+
+        def traced_take(n):
+            items = take(n)
+            left(items)
+            return items
+
+        buffer.put, buffer.get, buffer._extend, buffer._take = traced_put, traced_get, traced_extend, traced_take
+        self._attached.append(buffer)
+        return histogram
+
+    def detach(self):
+        for buffer in self._attached:
+            for name in ('put', 'get', '_extend', '_take'):
+                vars(buffer).pop(name, None)
+        self._attached.clear()
+
+    def stats(self):
+        """各缓冲区停留时间和端到端延迟的分位数（秒）"""
+        return {
+            'buffers': {buffer_id: histogram.summary() for buffer_id, histogram in self.buffers.items()},
+            'end_to_end': self.end_to_end.summary(),
+        }
+
+    def report(self):
+        lines = []
+        rows = [(f"Buffer {buffer_id}", h.summary()) for buffer_id, h in self.buffers.items()]
+        rows.append(("end-to-end", self.end_to_end.summary()))
+        for name, s in rows:
+            lines.append(f"{name:<12} n={s['count']:<8} p50={s['p50'] * 1000:.3f}ms "
+                         f"p99={s['p99'] * 1000:.3f}ms p999={s['p999'] * 1000:.3f}ms max={s['max'] * 1000:.3f}ms")
+        return '\n'.join(lines)
+
+
+def _open_in(envelope, buffer_id):
+    return bool(envelope.hops) and envelope.hops[-1][0] == buffer_id and envelope.hops[-1][2] is None
+
+
+def _undo(data):
+    if isinstance(data, Envelope) and data.hops and data.hops[-1][2] is None:
+        data.hops.pop()